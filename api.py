@@ -0,0 +1,273 @@
+# api.py
+"""
+Async HTTP API over the services, for clients other than the Streamlit UI (browser
+extension, editor plugins). One process serves many in-flight LLM requests: Groq calls go
+through the shared AsyncGroq client and Mongo through the async driver.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Every endpoint has its own concurrency limit (API_LIMIT_<NAME>, default API_CONCURRENCY).
+A request that cannot get a slot within API_QUEUE_TIMEOUT seconds gets 503 + Retry-After;
+one running longer than API_REQUEST_TIMEOUT gets 504.
+
+Auth: "Authorization: Bearer <session token>" (the value of the notes_session cookie the app
+sets after login) acts as that user. Service clients configured with API_TOKEN may instead send "Bearer <API_TOKEN>"
+plus X-User-Id. Anything else is 401; X-User-Id is never trusted on its own.
+"""
+import os
+import re
+import hmac
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
+load_dotenv()
+
+from bson import ObjectId
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from database.async_db import get_async_db, close_async_db
+from services.activity_logger import log_activity, flush_activity
+from services.ai_service import agenerate_summary, aanswer_question, aieee_review
+from services.citation_checker import check_references
+from services.groq_utils import close_async_client
+from services.session_service import resume_session
+from services.qa_session_service import aask
+from services.tag_service import as_user_id, tag_query, parse_tag_query, normalize_tag
+from services.llm_metrics import set_current_user, render_prometheus
+from services import single_flight
+
+logger = logging.getLogger(__name__)
+
+API_TOKEN = os.getenv("API_TOKEN")
+API_CONCURRENCY = int(os.getenv("API_CONCURRENCY", "64"))
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "5"))
+API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", "120"))
+MAX_TEXT_CHARS = int(os.getenv("API_MAX_TEXT_CHARS", "2000000"))
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class EndpointLimit:
+    """Bounded concurrency for one endpoint; waiting requests give up after API_QUEUE_TIMEOUT."""
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = limit
+        self._sem = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.served = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "served": self.served,
+                "rejected": self.rejected, "timed_out": self.timed_out}
+
+
+LIMITS = {}
+
+
+def endpoint(name: str, default_limit: int | None = None):
+    """Wrap a handler with auth, the endpoint's concurrency limit and the request timeout."""
+    env_key = "API_LIMIT_" + name.upper().replace("-", "_")
+    limit = LIMITS[name] = EndpointLimit(name, int(os.getenv(env_key, str(default_limit or API_CONCURRENCY))))
+
+    def wrap(handler):
+        async def run(request):
+            authorized, user_id = await _authenticate(request)
+            if not authorized:
+                return JSONResponse({"error": "unauthorized"}, status_code=401)
+            try:
+                await asyncio.wait_for(limit._sem.acquire(), API_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                limit.rejected += 1
+                return JSONResponse({"error": f"{name} is busy, retry later"}, status_code=503,
+                                    headers={"Retry-After": "1"})
+            limit.in_flight += 1
+            try:
+                set_current_user(user_id)
+                return JSONResponse(await asyncio.wait_for(handler(request, user_id), API_REQUEST_TIMEOUT))
+            except asyncio.TimeoutError:
+                limit.timed_out += 1
+                return JSONResponse({"error": f"{name} timed out after {API_REQUEST_TIMEOUT:g}s"}, status_code=504)
+            except ApiError as e:
+                return JSONResponse({"error": str(e)}, status_code=e.status)
+            except Exception:
+                # details stay in the log; they can include upstream responses and internals
+                logger.exception("api: %s failed", name)
+                return JSONResponse({"error": f"{name} failed upstream"}, status_code=502)
+            finally:
+                limit.in_flight -= 1
+                limit.served += 1
+                limit._sem.release()
+        return run
+    return wrap
+
+
+async def _authenticate(request):
+    """Returns (authorized, user_id). Fails closed: a session token, or API_TOKEN plus X-User-Id."""
+    auth = request.headers.get("authorization", "")
+    bearer = auth[7:].strip() if auth.lower().startswith("bearer ") else ""
+    if not bearer:
+        return False, None
+    if bearer.count(".") == 2:
+        profile = await run_in_threadpool(resume_session, bearer)
+        return (True, profile["_id"]) if profile else (False, None)
+    if API_TOKEN and hmac.compare_digest(bearer.encode("utf-8"), API_TOKEN.encode("utf-8")):
+        return True, as_user_id(request.headers.get("x-user-id") or None)
+    return False, None
+
+
+async def _payload(request) -> dict:
+    try:
+        payload = await request.json()
+    except Exception:
+        raise ApiError(400, "body must be JSON")
+    if not isinstance(payload, dict):
+        raise ApiError(400, "body must be a JSON object")
+    return payload
+
+
+async def _text(payload: dict, user_id, field: str = "text") -> str:
+    """`field` from the payload, or the content of the caller's note given as note_id."""
+    if payload.get("note_id"):
+        if user_id is None or not ObjectId.is_valid(payload["note_id"]):
+            raise ApiError(400, "note_id needs a valid id and X-User-Id")
+        note = await get_async_db().notes.find_one({"_id": ObjectId(payload["note_id"]), "user_id": user_id},
+                                                   {"content": 1})
+        if not note:
+            raise ApiError(404, "note not found")
+        return note.get("content", "")
+    text = payload.get(field) or ""
+    if not isinstance(text, str) or not text.strip():
+        raise ApiError(400, f"'{field}' or 'note_id' is required")
+    if len(text) > MAX_TEXT_CHARS:
+        raise ApiError(413, f"'{field}' exceeds {MAX_TEXT_CHARS} characters")
+    return text
+
+
+@endpoint("summarize")
+async def summarize(request, user_id):
+    payload = await _payload(request)
+    summary = await agenerate_summary(await _text(payload, user_id))
+    if payload.get("save") and payload.get("note_id"):
+        await get_async_db().notes.update_one({"_id": ObjectId(payload["note_id"]), "user_id": user_id},
+                                              {"$set": {"summary": summary}})
+    return {"summary": summary}
+
+
+@endpoint("qa")
+async def qa(request, user_id):
+    payload = await _payload(request)
+    question = payload.get("question") or ""
+    if not question.strip():
+        raise ApiError(400, "'question' is required")
+    context = await _text(payload, user_id, "context")
+    note_id = ObjectId(payload["note_id"]) if payload.get("note_id") else None
+    if payload.get("session"):
+        # follow-up in the caller's conversation about this note (see services/qa_session_service.py)
+        if note_id is None:
+            raise ApiError(400, "'session' needs 'note_id'")
+        result = await aask(get_async_db(), user_id, note_id, context, question)
+        log_activity(user_id, "qa", note_id=note_id, question=question, answer=result["answer"])
+        return {"answer": result["answer"], "turn_count": result["turn_count"], "summary": result["summary"]}
+    answer = await aanswer_question(context, question)
+    log_activity(user_id, "qa", note_id=note_id, question=question, answer=answer)
+    return {"answer": answer}
+
+
+@endpoint("ieee-review")
+async def review(request, user_id):
+    content = await _text(await _payload(request), user_id)
+    suggestions = await aieee_review(content)
+    log_activity(user_id, "ieee_review", note_type="ieee_doc", document=content, review=suggestions)
+    return {"review": suggestions}
+
+
+@endpoint("grammar", default_limit=4)
+async def grammar(request, user_id):
+    from services.grammar_service import grammar_check_report
+    content = await _text(await _payload(request), user_id)
+    # LanguageTool is blocking and shared, so checks run in the thread pool with a small limit
+    report = await run_in_threadpool(grammar_check_report, content)
+    log_activity(user_id, "grammar_check", result=report)
+    return report
+
+
+@endpoint("citations")
+async def citations(request, user_id):
+    content = await _text(await _payload(request), user_id)
+    results = await run_in_threadpool(check_references, content)
+    log_activity(user_id, "citation", note_type="citation_check", document_excerpt=content[:2000], citations=results)
+    return {"issues": results}
+
+
+@endpoint("notes")
+async def notes(request, user_id):
+    if user_id is None:
+        raise ApiError(400, "X-User-Id is required")
+    try:
+        limit = min(int(request.query_params.get("limit", "50")), 500)
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    # ?tags=ml nlp -draft  /  ?tags=ml OR vision  (see tag_service.parse_tag_query)
+    flt = tag_query(user_id, **parse_tag_query(request.query_params.get("tags", "")))
+    cursor = get_async_db().notes.find(flt, {"title": 1, "tags": 1, "summary": 1, "created_at": 1})
+    docs = await cursor.sort("created_at", -1).limit(limit).to_list(length=limit)
+    return {"notes": [{"id": str(d["_id"]), "title": d.get("title"), "tags": d.get("tags", []),
+                       "summary": d.get("summary"), "created_at": d.get("created_at").isoformat()
+                       if d.get("created_at") else None} for d in docs]}
+
+
+@endpoint("tags")
+async def tags(request, user_id):
+    """Tag facets with counts; ?prefix= narrows them for autocomplete."""
+    if user_id is None:
+        raise ApiError(400, "X-User-Id is required")
+    flt = {"user_id": user_id, "count": {"$gt": 0}}
+    prefix = normalize_tag(request.query_params.get("prefix", ""))
+    if prefix:
+        flt["tag"] = {"$regex": "^" + re.escape(prefix)}
+    cursor = get_async_db().tag_facets.find(flt, {"_id": 0, "tag": 1, "count": 1})
+    return {"tags": await cursor.sort([("count", -1), ("tag", 1)]).limit(50).to_list(length=50)}
+
+
+async def health(request):
+    return JSONResponse({"status": "ok", "endpoints": {name: lim.stats() for name, lim in LIMITS.items()},
+                         "single_flight": single_flight.stats()})
+
+
+async def metrics(request):
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    flush_activity()
+    await close_async_client()
+    await close_async_db()
+
+
+app = Starlette(
+    routes=[
+        Route("/summarize", summarize, methods=["POST"]),
+        Route("/qa", qa, methods=["POST"]),
+        Route("/ieee-review", review, methods=["POST"]),
+        Route("/grammar", grammar, methods=["POST"]),
+        Route("/citations", citations, methods=["POST"]),
+        Route("/notes", notes, methods=["GET"]),
+        Route("/tags", tags, methods=["GET"]),
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
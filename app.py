@@ -1,8 +1,8 @@
 # app.py
 import os
+import json
 import streamlit as st
 from dotenv import load_dotenv
-from datetime import datetime
 load_dotenv()
 
 st.set_page_config(page_title="AI Research & Notes Assistant", layout="wide")
@@ -11,24 +11,114 @@ st.title("AI Research & Notes Assistant")
 # --- Light DB & utils imports (kept) ---
 from database.db import insert_note, get_all_notes, db, test_connection
 from models.note_model import create_note
-from utils.file_utils import extract_text_from_pdf, extract_text_from_txt, extract_text_with_ocr
+from utils.upload_utils import extract_upload, UploadRejected
 # removed save_text_as_pdf (not used anymore)
 
 # --- Core remaining services ---
-from services.ai_service import generate_summary, answer_question, ieee_review
-from services.user_service import register_user, login_user
+from services.ai_service import generate_summary, ieee_review
+from services.qa_session_service import (
+    ask, get_session, reset_session, delete_note_qa_sessions, delete_user_qa_sessions
+)
+from services.user_service import register_user, login_user, update_profile
+from services.session_service import (
+    create_session, resume_session, revoke_session, revoke_user_sessions, update_session_profiles,
+    SESSION_COOKIE, SESSION_TTL_HOURS,
+)
 from services.writing_service import generate_abstract, generate_introduction, generate_conclusion, generate_custom_section
 from services.grammar_service import grammar_check_report
-from services.study_service import generate_flashcards, generate_practice_questions
-from services.formatter_service import ieee_auto_format, ieee_sectionify
+from services.study_service import (
+    generate_flashcards, generate_practice_questions, get_cached_study_artifacts,
+    get_or_generate_flashcards, get_or_generate_practice_questions, schedule_study_precompute,
+)
+from services.formatter_service import ieee_auto_format_report, ieee_sectionify
 # removed export_service
-from services.tag_service import add_tags_to_note, get_notes_by_tag
+from services.tag_service import (
+    set_note_tags, record_note_tags_deleted, delete_user_tags, get_tag_facets, find_notes_by_tags, parse_tag_query
+)
+from services.import_service import bulk_import
 import services.citation_checker as citation_checker
+from services.llm_metrics import set_current_user, feature_usage
+from services.activity_logger import log_activity, flush_activity, activity_status
+from services.stats_service import get_user_stats, record_notes_deleted, delete_user_stats
+from services.history_service import delete_user_history
+from utils.profiling import instrument, begin_page, end_page
+
+# service calls below become spans when a rerun is profiled (APP_PROFILE / ?profile=1)
+instrument(globals())
 
 # Ensure session_state user exists
 if "user" not in st.session_state:
     st.session_state.user = None
 
+# Reconnect / new tab: the signed session token in the browser cookie restores the login
+# without bcrypt. st.context.cookies is what the browser sent when this tab connected.
+cookie_token = st.context.cookies.get(SESSION_COOKIE)
+if st.session_state.user is None and cookie_token and cookie_token != st.session_state.get("ended_token"):
+    profile = resume_session(cookie_token)
+    if profile:
+        st.session_state.user = profile
+        st.session_state.session_token = cookie_token
+    else:
+        # expired or revoked: drop it from the browser and stop retrying it on every rerun
+        st.session_state.ended_token = cookie_token
+        st.session_state.cookie_update = ""
+# links from before the cookie still carry ?session=; keep tokens out of the address bar
+st.query_params.pop("session", None)
+
+
+def start_session(profile):
+    st.session_state.user = profile
+    st.session_state.session_token = create_session(profile)
+    st.session_state.cookie_update = st.session_state.session_token
+
+
+def end_session():
+    # the cookie seen at connect time stays in st.context until the tab reconnects
+    st.session_state.ended_token = st.session_state.get("session_token")
+    st.session_state.session_token = None
+    st.session_state.cookie_update = ""
+    st.session_state.user = None
+
+
+def write_session_cookie():
+    """Set (or clear, for "") the session cookie in the browser when a login or logout asked for it."""
+    token = st.session_state.pop("cookie_update", None)
+    if token is None:
+        return
+    max_age = int(SESSION_TTL_HOURS * 3600) if token else 0
+    st.iframe(
+        "<script>const host = window.parent;"
+        f"host.document.cookie = {json.dumps(f'{SESSION_COOKIE}={token}; Path=/; Max-Age={max_age}; SameSite=Strict')}"
+        " + (host.location.protocol === 'https:' ? '; Secure' : '');</script>",
+        height="content",
+    )
+
+
+def read_upload(uploaded_file) -> str:
+    """Text of an uploaded PDF/TXT; a file over the size or page limit is reported and gives ""."""
+    try:
+        return extract_upload(uploaded_file)
+    except UploadRejected as e:
+        st.error(str(e))
+        return ""
+
+
+def show_flashcards(cards) -> None:
+    st.subheader("Flashcards")
+    for i, c in enumerate(cards):
+        if "error" in c:
+            st.error(c["error"])
+        else:
+            st.markdown(f"**Q{i+1}:** {c['question']}")
+            st.markdown(f"**A{i+1}:** {c['answer']}")
+
+
+def show_practice_questions(qs) -> None:
+    st.subheader("Practice Questions")
+    for q in qs:
+        st.write("- " + q)
+
+
 # Sidebar DB connection
 try:
     st.sidebar.success(test_connection())
@@ -55,7 +145,7 @@ if not st.session_state.user:
                     st.sidebar.success(msg)
                     success_login, user = login_user(email, password)
                     if success_login:
-                        st.session_state.user = user
+                        start_session(user)
                         st.sidebar.success("Logged in as " + user["name"])
                 else:
                     st.sidebar.error(msg)
@@ -64,20 +154,29 @@ if not st.session_state.user:
         if st.sidebar.button("Login"):
             success, user = login_user(email, password)
             if success:
-                st.session_state.user = user
+                start_session(user)
                 st.sidebar.success("✅ Logged in successfully")
             else:
                 st.sidebar.error(user)
 else:
     st.sidebar.success(f"Welcome {st.session_state.user['name']}")
     if st.sidebar.button("Logout"):
-        st.session_state.user = None
-        st.experimental_rerun()
+        revoke_session(st.session_state.get("session_token"))
+        end_session()
+        st.rerun()
+
+write_session_cookie()
 
 if not st.session_state.user:
     st.info("Please register or log in (sidebar) to continue.")
     st.stop()
 
+set_current_user(st.session_state.user["_id"])
+
+activity = activity_status(st.session_state.user["_id"])
+if activity["failed"]:
+    st.sidebar.warning(f"Activity history could not be saved: {activity['last_error']}")
+
 # -------------------------
 # MAIN MENU
 # -------------------------
@@ -89,401 +188,429 @@ menu_items = [
     "Advanced Search (Tags)", "My Account"
 ]
 choice = st.sidebar.radio("Go to", menu_items)
+page_profile = begin_page(choice, st.query_params.get("profile"))
 
-# -------------------------
-# UPLOAD NOTES
-# -------------------------
-if choice == "Upload Notes":
-    st.header("📤 Upload Research Notes")
-    title = st.text_input("Title")
-    uploaded_file = st.file_uploader("Upload file (txt, pdf)", type=["txt", "pdf"])
-
-    if uploaded_file and st.button("Upload and Save"):
-        content = ""
-        try:
-            if uploaded_file.type == "application/pdf":
-                content = extract_text_from_pdf(uploaded_file)
-                if not content:
-                    uploaded_file.seek(0)
-                    content = extract_text_with_ocr(uploaded_file)
-            else:
-                content = extract_text_from_txt(uploaded_file)
-        except Exception as e:
-            st.error(f"Error extracting file: {e}")
+try:
+    # -------------------------
+    # UPLOAD NOTES
+    # -------------------------
+    if choice == "Upload Notes":
+        st.header("📤 Upload Research Notes")
+        title = st.text_input("Title")
+        uploaded_file = st.file_uploader("Upload file (txt, pdf)", type=["txt", "pdf"])
+
+        if uploaded_file and st.button("Upload and Save"):
             content = ""
+            try:
+                content = read_upload(uploaded_file)
+            except Exception as e:
+                st.error(f"Error extracting file: {e}")
+                content = ""
 
-        if not content.strip():
-            st.error("Could not extract text from the file.")
-        else:
-            note = create_note(title, content, summary=None)
-            note["user_id"] = st.session_state.user["_id"]
-            note_id = insert_note(note)
-            st.success(f"✅ Note saved with ID: {note_id}")
-
-# -------------------------
-# VIEW NOTES
-# -------------------------
-elif choice == "View Notes":
-    st.header("📚 My Notes")
-    notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}).sort("created_at", -1))
-    if not notes:
-        st.info("No notes found. Upload notes to get started.")
-    else:
-        for note in notes:
-            with st.expander(note["title"]):
-                st.write(note.get("content", "")[:5000])
-                if note.get("summary"):
-                    st.markdown("**AI Summary:**")
-                    st.write(note["summary"])
-                tags = note.get("tags", [])
-                st.write("Tags:", ", ".join(tags) if tags else "No tags")
-                col1, col2, col3 = st.columns(3)
-                if col1.button("📝 Edit title", key=f"edit_{note['_id']}"):
-                    new_title = st.text_input("New title", value=note["title"], key=f"nt_{note['_id']}")
-                    if st.button("Save title", key=f"save_title_{note['_id']}"):
-                        db.notes.update_one({"_id": note["_id"]}, {"$set": {"title": new_title}})
-                        st.success("Title updated.")
-                        st.experimental_rerun()
-                if col2.button("🏷️ Add/Update tags", key=f"tag_{note['_id']}"):
-                    new_tags = st.text_input("Comma-separated tags", value=",".join(tags), key=f"tags_in_{note['_id']}")
-                    if st.button("Save tags", key=f"save_tags_{note['_id']}"):
-                        tag_list = [t.strip() for t in new_tags.split(",") if t.strip()]
-                        add_tags_to_note(note["_id"], tag_list)
-                        st.success("Tags saved.")
-                        st.experimental_rerun()
-                if col3.button("🗑️ Delete note", key=f"del_{note['_id']}"):
-                    db.notes.delete_one({"_id": note["_id"], "user_id": st.session_state.user["_id"]})
-                    st.warning("Note deleted.")
-                    st.experimental_rerun()
-
-# -------------------------
-# GENERATE SUMMARY
-# -------------------------
-elif choice == "Generate Summary":
-    st.header("📝 AI Summarization")
-    notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
-    if not notes:
-        st.info("No notes available.")
-    else:
-        titles = [n["title"] for n in notes]
-        selected = st.selectbox("Select Note", titles)
-        note = next(n for n in notes if n["title"] == selected)
-        if st.button("Generate Summary"):
-            with st.spinner("Generating summary..."):
-                summary = generate_summary(note["content"])
-                db.notes.update_one({"_id": note["_id"]}, {"$set": {"summary": summary}})
-                st.success("Summary saved to note.")
-                st.write(summary)
-
-# -------------------------
-# AI Q&A
-# -------------------------
-elif choice == "AI Q&A":
-    st.header("💡 Ask AI about your Notes")
-    notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
-    if not notes:
-        st.info("No notes available.")
-    else:
-        selected = st.selectbox("Select Note", [n["title"] for n in notes])
-        note = next(n for n in notes if n["title"] == selected)
-        question = st.text_input("Ask a question about this note")
-        if st.button("Get Answer") and question.strip():
-            with st.spinner("Getting answer..."):
-                answer = answer_question(note["content"], question)
-                st.subheader("Answer")
-                st.write(answer)
-                db.queries.insert_one({
-                    "note_id": note["_id"],
-                    "user_id": st.session_state.user["_id"],
-                    "question": question,
-                    "answer": answer,
-                    "type": "qa",
-                    "created_at": datetime.utcnow()
-                })
-
-# -------------------------
-# IEEE DOCUMENTATION REVIEW
-# -------------------------
-elif choice == "IEEE Documentation Review":
-    st.header("📄 IEEE Documentation Review (AI)")
-    uploaded_file = st.file_uploader("Upload Documentation (PDF/TXT)", type=["txt", "pdf"])
-    if uploaded_file and st.button("Review with IEEE Standards"):
-        content = ""
-        if uploaded_file.type == "application/pdf":
-            content = extract_text_from_pdf(uploaded_file)
-            if not content:
-                uploaded_file.seek(0)
-                content = extract_text_with_ocr(uploaded_file)
-        else:
-            content = extract_text_from_txt(uploaded_file)
-
-        if not content.strip():
-            st.error("Could not extract text.")
-        else:
-            with st.spinner("Running IEEE review..."):
-                suggestions = ieee_review(content)
-                st.subheader("Suggestions")
-                st.write(suggestions)
-                db.queries.insert_one({
-                    "user_id": st.session_state.user["_id"],
-                    "note_type": "ieee_doc",
-                    "document": content,
-                    "review": suggestions,
-                    "type": "ieee_review",
-                    "created_at": datetime.utcnow()
-                })
-
-# -------------------------
-# CITATION CHECKER
-# -------------------------
-elif choice == "Citation Checker":
-    st.header("📖 Citation & Reference Checker")
-    uploaded_file = st.file_uploader("Upload Documentation (PDF/TXT)", type=["txt", "pdf"])
-    if uploaded_file and st.button("Check References"):
-        content = ""
-        if uploaded_file.type == "application/pdf":
-            content = extract_text_from_pdf(uploaded_file)
-            if not content:
-                uploaded_file.seek(0)
-                content = extract_text_with_ocr(uploaded_file)
+            if not content.strip():
+                st.error("Could not extract text from the file.")
+            else:
+                note = create_note(title, content, summary=None)
+                note["user_id"] = st.session_state.user["_id"]
+                note_id = insert_note(note)
+                schedule_study_precompute(note["_id"])
+                st.success(f"✅ Note saved with ID: {note_id}")
+
+        st.markdown("---")
+        st.subheader("📦 Bulk Import")
+        archive = st.file_uploader("Upload a .zip of PDF/TXT files", type=["zip"], key="bulk_zip")
+        st.caption("Flashcards and practice questions for imported notes are generated on demand in the study tools.")
+        if archive and st.button("Import All"):
+            bar = st.progress(0.0)
+            status = st.empty()
+
+            def on_progress(done, total, name, error):
+                bar.progress(done / total if total else 1.0)
+                status.write(f"{done}/{total} {'❌' if error else '✅'} {name}")
+
+            try:
+                report = bulk_import(archive, st.session_state.user["_id"], progress=on_progress)
+            except Exception as e:
+                st.error(f"Bulk import failed: {e}")
+            else:
+                st.success(f"Imported {report['imported']} of {report['total']} files "
+                           f"in {report['seconds']} s ({report['files_per_minute']} files/min).")
+                for f in report["failed"]:
+                    st.warning(f"{f['name']}: {f['error']}")
+
+    # -------------------------
+    # VIEW NOTES
+    # -------------------------
+    elif choice == "View Notes":
+        st.header("📚 My Notes")
+        notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}).sort("created_at", -1))
+        if not notes:
+            st.info("No notes found. Upload notes to get started.")
         else:
-            content = extract_text_from_txt(uploaded_file)
-
-        if not content.strip():
-            st.error("Could not extract text.")
+            for note in notes:
+                with st.expander(note["title"]):
+                    st.write(note.get("content", "")[:5000])
+                    if note.get("summary"):
+                        st.markdown("**AI Summary:**")
+                        st.write(note["summary"])
+                    tags = note.get("tags", [])
+                    st.write("Tags:", ", ".join(tags) if tags else "No tags")
+                    col1, col2, col3 = st.columns(3)
+                    if col1.button("📝 Edit title", key=f"edit_{note['_id']}"):
+                        new_title = st.text_input("New title", value=note["title"], key=f"nt_{note['_id']}")
+                        if st.button("Save title", key=f"save_title_{note['_id']}"):
+                            db.notes.update_one({"_id": note["_id"]}, {"$set": {"title": new_title}})
+                            st.success("Title updated.")
+                            st.rerun()
+                    if col2.button("🏷️ Add/Update tags", key=f"tag_{note['_id']}"):
+                        new_tags = st.text_input("Comma-separated tags", value=",".join(tags), key=f"tags_in_{note['_id']}")
+                        if st.button("Save tags", key=f"save_tags_{note['_id']}"):
+                            tag_list = [t.strip() for t in new_tags.split(",") if t.strip()]
+                            set_note_tags(note["_id"], st.session_state.user["_id"], tag_list)
+                            st.success("Tags saved.")
+                            st.rerun()
+                    if col3.button("🗑️ Delete note", key=f"del_{note['_id']}"):
+                        res = db.notes.delete_one({"_id": note["_id"], "user_id": st.session_state.user["_id"]})
+                        record_notes_deleted(st.session_state.user["_id"], res.deleted_count)
+                        if res.deleted_count:
+                            record_note_tags_deleted(st.session_state.user["_id"], tags)
+                            delete_note_qa_sessions(note["_id"])
+                        st.warning("Note deleted.")
+                        st.rerun()
+
+    # -------------------------
+    # GENERATE SUMMARY
+    # -------------------------
+    elif choice == "Generate Summary":
+        st.header("📝 AI Summarization")
+        notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
+        if not notes:
+            st.info("No notes available.")
         else:
-            results = citation_checker.check_references(content)
-            st.subheader("Reference Issues")
-            for r in results:
-                st.write("- " + r)
-            db.queries.insert_one({
-                "user_id": st.session_state.user["_id"],
-                "note_type": "citation_check",
-                "document_excerpt": content[:2000],
-                "citations": results,
-                "type": "citation",
-                "created_at": datetime.utcnow()
-            })
-
-# -------------------------
-# AI WRITING ASSISTANT
-# -------------------------
-elif choice == "AI Writing Assistant":
-    st.header("🖊️ AI Writing Assistant (IEEE-style)")
-    notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
-    source_option = st.radio("Source", ["Paste text", "Use saved note"])
-    source_text = ""
-    if source_option == "Paste text":
-        source_text = st.text_area("Paste your paper/notes here", height=250)
-    else:
+            titles = [n["title"] for n in notes]
+            selected = st.selectbox("Select Note", titles)
+            note = next(n for n in notes if n["title"] == selected)
+            if st.button("Generate Summary"):
+                with st.spinner("Generating summary..."):
+                    summary = generate_summary(note["content"])
+                    db.notes.update_one({"_id": note["_id"]}, {"$set": {"summary": summary}})
+                    st.success("Summary saved to note.")
+                    st.write(summary)
+
+    # -------------------------
+    # AI Q&A
+    # -------------------------
+    elif choice == "AI Q&A":
+        st.header("💡 Ask AI about your Notes")
+        notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
         if not notes:
-            st.info("No saved notes.")
+            st.info("No notes available.")
         else:
-            sel = st.selectbox("Select note", [n["title"] for n in notes])
-            note = next(n for n in notes if n["title"] == sel)
-            source_text = note["content"]
+            selected = st.selectbox("Select Note", [n["title"] for n in notes])
+            note = next(n for n in notes if n["title"] == selected)
+            # the conversation (summary of older turns + recent window) comes from one qa_sessions read
+            session = get_session(st.session_state.user["_id"], note["_id"])
+            if session["summary"]:
+                with st.expander(f"Earlier in this conversation ({session['compacted']} turns, summarized)"):
+                    st.write(session["summary"])
+            for turn in session["turns"]:
+                st.markdown(f"**You:** {turn['q']}")
+                st.write(turn["a"])
+            question = st.text_input("Ask a question about this note", key=f"qa_{note['_id']}_{session['turn_count']}")
+            col1, col2 = st.columns(2)
+            if col1.button("Get Answer") and question.strip():
+                with st.spinner("Getting answer..."):
+                    result = ask(st.session_state.user["_id"], note["_id"], note["content"], question)
+                    log_activity(st.session_state.user["_id"], "qa",
+                                 note_id=note["_id"], question=question, answer=result["answer"])
+                    st.rerun()
+            if session["turn_count"] and col2.button("New conversation"):
+                reset_session(st.session_state.user["_id"], note["_id"])
+                st.rerun()
+
+    # -------------------------
+    # IEEE DOCUMENTATION REVIEW
+    # -------------------------
+    elif choice == "IEEE Documentation Review":
+        st.header("📄 IEEE Documentation Review (AI)")
+        uploaded_file = st.file_uploader("Upload Documentation (PDF/TXT)", type=["txt", "pdf"])
+        if uploaded_file and st.button("Review with IEEE Standards"):
+            content = read_upload(uploaded_file)
 
-    section_choice = st.selectbox("Section to generate", ["Abstract", "Introduction", "Conclusion", "Custom Section"])
-    if section_choice == "Custom Section":
-        custom_title = st.text_input("Custom section title")
-    else:
-        custom_title = None
-
-    if st.button("Generate Section") and source_text.strip():
-        with st.spinner("Generating..."):
-            if section_choice == "Abstract":
-                out = generate_abstract(source_text, max_words=200)
-            elif section_choice == "Introduction":
-                out = generate_introduction(source_text, max_paragraphs=3)
-            elif section_choice == "Conclusion":
-                out = generate_conclusion(source_text, max_sentences=6)
+            if not content.strip():
+                st.error("Could not extract text.")
             else:
-                out = generate_custom_section(custom_title or "Section", source_text)
-
-            st.subheader("Generated Text")
-            st.write(out)
-            db.queries.insert_one({
-                "user_id": st.session_state.user["_id"],
-                "type": "writing_assistant",
-                "section": section_choice if section_choice != "Custom Section" else custom_title,
-                "result": out,
-                "created_at": datetime.utcnow()
-            })
+                with st.spinner("Running IEEE review..."):
+                    suggestions = ieee_review(content)
+                    st.subheader("Suggestions")
+                    st.write(suggestions)
+                    log_activity(st.session_state.user["_id"], "ieee_review",
+                                 note_type="ieee_doc", document=content, review=suggestions)
+
+    # -------------------------
+    # CITATION CHECKER
+    # -------------------------
+    elif choice == "Citation Checker":
+        st.header("📖 Citation & Reference Checker")
+        uploaded_file = st.file_uploader("Upload Documentation (PDF/TXT)", type=["txt", "pdf"])
+        if uploaded_file and st.button("Check References"):
+            content = read_upload(uploaded_file)
 
-# -------------------------
-# GRAMMAR & READABILITY
-# -------------------------
-elif choice == "Grammar & Readability Checker":
-    st.header("✍️ Grammar & Readability Checker")
-    uploaded_file = st.file_uploader("Upload doc (PDF/TXT) or paste text", type=["txt", "pdf"])
-    paste_text = st.text_area("OR paste text here", height=200)
-    if st.button("Check & Improve"):
-        content = paste_text.strip()
-        if not content and uploaded_file:
-            content = extract_text_from_pdf(uploaded_file) if uploaded_file.type == "application/pdf" else extract_text_from_txt(uploaded_file)
             if not content.strip():
-                uploaded_file.seek(0)
-                content = extract_text_with_ocr(uploaded_file) if uploaded_file.type == "application/pdf" else ""
-        if not content.strip():
-            st.error("No text provided.")
+                st.error("Could not extract text.")
+            else:
+                results = citation_checker.check_references(content)
+                st.subheader("Reference Issues")
+                for r in results:
+                    st.write("- " + r)
+                log_activity(st.session_state.user["_id"], "citation",
+                             note_type="citation_check", document_excerpt=content[:2000], citations=results)
+
+    # -------------------------
+    # AI WRITING ASSISTANT
+    # -------------------------
+    elif choice == "AI Writing Assistant":
+        st.header("🖊️ AI Writing Assistant (IEEE-style)")
+        notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
+        source_option = st.radio("Source", ["Paste text", "Use saved note"])
+        source_text = ""
+        if source_option == "Paste text":
+            source_text = st.text_area("Paste your paper/notes here", height=250)
         else:
-            with st.spinner("Checking..."):
-                report = grammar_check_report(content)
-                st.subheader("Grammar Issues (LanguageTool)")
-                if report["grammar_issues"]:
-                    for m in report["grammar_issues"]:
-                        suggestions = ", ".join(m["suggestions"][:3]) if m["suggestions"] else "No suggestions"
-                        st.write(f"- {m['error']} — Suggestions: {suggestions}")
-                else:
-                    st.success("No grammar issues found.")
-                st.subheader("Improved Version (AI)")
-                st.write(report["improved_text"])
-                db.queries.insert_one({
-                    "user_id": st.session_state.user["_id"],
-                    "type": "grammar_check",
-                    "result": report,
-                    "created_at": datetime.utcnow()
-                })
+            if not notes:
+                st.info("No saved notes.")
+            else:
+                sel = st.selectbox("Select note", [n["title"] for n in notes])
+                note = next(n for n in notes if n["title"] == sel)
+                source_text = note["content"]
 
-# -------------------------
-# STUDY MODE (FLASHCARDS)
-# -------------------------
-elif choice == "Study Mode (Flashcards)":
-    st.header("📚 Study Mode - Flashcards & Practice Questions")
-    uploaded_file = st.file_uploader("Upload notes (TXT/PDF) or select saved note", type=["txt", "pdf"])
-    notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
-    note_text = ""
-    if notes:
-        use_saved = st.checkbox("Use saved note")
-        if use_saved:
+        section_choice = st.selectbox("Section to generate", ["Abstract", "Introduction", "Conclusion", "Custom Section"])
+        if section_choice == "Custom Section":
+            custom_title = st.text_input("Custom section title")
+        else:
+            custom_title = None
+
+        if st.button("Generate Section") and source_text.strip():
+            with st.spinner("Generating..."):
+                if section_choice == "Abstract":
+                    out = generate_abstract(source_text, max_words=200)
+                elif section_choice == "Introduction":
+                    out = generate_introduction(source_text, max_paragraphs=3)
+                elif section_choice == "Conclusion":
+                    out = generate_conclusion(source_text, max_sentences=6)
+                else:
+                    out = generate_custom_section(custom_title or "Section", source_text)
+
+                st.subheader("Generated Text")
+                st.write(out)
+                log_activity(st.session_state.user["_id"], "writing_assistant",
+                             section=section_choice if section_choice != "Custom Section" else custom_title,
+                             result=out)
+
+    # -------------------------
+    # GRAMMAR & READABILITY
+    # -------------------------
+    elif choice == "Grammar & Readability Checker":
+        st.header("✍️ Grammar & Readability Checker")
+        uploaded_file = st.file_uploader("Upload doc (PDF/TXT) or paste text", type=["txt", "pdf"])
+        paste_text = st.text_area("OR paste text here", height=200)
+        if st.button("Check & Improve"):
+            content = paste_text.strip()
+            if not content and uploaded_file:
+                content = read_upload(uploaded_file)
+            if not content.strip():
+                st.error("No text provided.")
+            else:
+                with st.spinner("Checking..."):
+                    report = grammar_check_report(content)
+                    st.subheader("Grammar Issues (LanguageTool)")
+                    if report["grammar_issues"]:
+                        for m in report["grammar_issues"]:
+                            suggestions = ", ".join(m["suggestions"][:3]) if m["suggestions"] else "No suggestions"
+                            st.write(f"- {m['error']} — Suggestions: {suggestions}")
+                    else:
+                        st.success("No grammar issues found.")
+                    st.subheader("Improved Version (AI)")
+                    st.write(report["improved_text"])
+                    log_activity(st.session_state.user["_id"], "grammar_check", result=report)
+
+    # -------------------------
+    # STUDY MODE (FLASHCARDS)
+    # -------------------------
+    elif choice == "Study Mode (Flashcards)":
+        st.header("📚 Study Mode - Flashcards & Practice Questions")
+        uploaded_file = st.file_uploader("Upload notes (TXT/PDF) or select saved note", type=["txt", "pdf"])
+        notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
+        note_text = ""
+        saved_note = None
+        if notes:
+            use_saved = st.checkbox("Use saved note")
+            if use_saved:
+                sel = st.selectbox("Select saved note", [n["title"] for n in notes])
+                saved_note = next(n for n in notes if n["title"] == sel)
+                note_text = saved_note["content"]
+        cached = get_cached_study_artifacts(saved_note) if saved_note else {}
+        if uploaded_file and not note_text:
+            note_text = read_upload(uploaded_file)
+        if cached.get("flashcards"):
+            cards = cached["flashcards"]
+            if st.button("Regenerate Flashcards"):
+                with st.spinner("Generating flashcards..."):
+                    cards = get_or_generate_flashcards(saved_note, num_cards=8, regenerate=True)
+                log_activity(st.session_state.user["_id"], "flashcards", result=cards)
+            show_flashcards(cards)
+        elif st.button("Generate Flashcards") and note_text.strip():
+            with st.spinner("Generating flashcards..."):
+                if saved_note:
+                    cards = get_or_generate_flashcards(saved_note, num_cards=8)
+                else:
+                    cards = generate_flashcards(note_text, num_cards=8)
+                show_flashcards(cards)
+                log_activity(st.session_state.user["_id"], "flashcards", result=cards)
+        if cached.get("practice_questions"):
+            qs = cached["practice_questions"]
+            if st.button("Regenerate Practice Questions"):
+                with st.spinner("Generating questions..."):
+                    qs = get_or_generate_practice_questions(saved_note, num_questions=8, regenerate=True)
+                log_activity(st.session_state.user["_id"], "practice_questions", result=qs)
+            show_practice_questions(qs)
+        elif st.button("Generate Practice Questions") and note_text.strip():
+            with st.spinner("Generating questions..."):
+                if saved_note:
+                    qs = get_or_generate_practice_questions(saved_note, num_questions=8)
+                else:
+                    qs = generate_practice_questions(note_text, num_questions=8)
+                show_practice_questions(qs)
+                log_activity(st.session_state.user["_id"], "practice_questions", result=qs)
+
+    # -------------------------
+    # IEEE AUTO-FORMATTER
+    # -------------------------
+    elif choice == "IEEE Auto-Formatter":
+        st.header("📄 IEEE Auto-Formatter")
+        uploaded_file = st.file_uploader("Upload project doc (PDF/TXT)", type=["txt", "pdf"])
+        notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
+        use_saved = st.checkbox("Or use saved note")
+        content = ""
+        if use_saved and notes:
             sel = st.selectbox("Select saved note", [n["title"] for n in notes])
-            note_text = next(n for n in notes if n["title"] == sel)["content"]
-    if uploaded_file and not note_text:
-        note_text = extract_text_from_pdf(uploaded_file) if uploaded_file.type == "application/pdf" else extract_text_from_txt(uploaded_file)
-        if not note_text.strip():
-            uploaded_file.seek(0)
-            note_text = extract_text_with_ocr(uploaded_file)
-    if st.button("Generate Flashcards") and note_text.strip():
-        with st.spinner("Generating flashcards..."):
-            cards = generate_flashcards(note_text, num_cards=8)
-            st.subheader("Flashcards")
-            for i, c in enumerate(cards):
-                if "error" in c:
-                    st.error(c["error"])
+            content = next(n for n in notes if n["title"] == sel)["content"]
+        elif uploaded_file:
+            content = read_upload(uploaded_file)
+        if st.button("Auto-Format to IEEE") and content.strip():
+            with st.spinner("Formatting..."):
+                report = ieee_auto_format_report(content)
+                st.subheader("Formatted Draft")
+                st.write(report["formatted"])
+                if report["consistency_notes"]:
+                    with st.expander("Consistency notes (not part of the draft)"):
+                        st.write(report["consistency_notes"])
+                log_activity(st.session_state.user["_id"], "ieee_format", result=report["formatted"],
+                             consistency_notes=report["consistency_notes"])
+
+    # -------------------------
+    # ADVANCED SEARCH (TAGS)
+    # -------------------------
+    elif choice == "Advanced Search (Tags)":
+        st.header("🔎 Advanced Search (Tags)")
+        facets = get_tag_facets(st.session_state.user["_id"])
+        if not facets:
+            st.info("No tags yet. Add tags to your notes in View Notes.")
+        else:
+            st.caption("Your tags: " + ", ".join(f"{f['tag']} ({f['count']})" for f in facets[:30]))
+            options = [f["tag"] for f in facets]
+            query = st.text_input("Tag query", placeholder='ml nlp -draft   |   ml OR vision   |   "deep learning"')
+            parsed = parse_tag_query(query)
+            all_of = st.multiselect("Has all of", options, default=[t for t in parsed["all_of"] if t in options])
+            any_of = st.multiselect("Has any of", options, default=[t for t in parsed["any_of"] if t in options])
+            none_of = st.multiselect("Has none of", options, default=[t for t in parsed["none_of"] if t in options])
+            if st.button("Search by tags") and (all_of or any_of or none_of):
+                hits = find_notes_by_tags(st.session_state.user["_id"], all_of, any_of, none_of,
+                                          projection={"title": 1, "content": 1, "tags": 1}, limit=200)
+                if not hits:
+                    st.info("No notes match those tags.")
                 else:
-                    st.markdown(f"**Q{i+1}:** {c['question']}")
-                    st.markdown(f"**A{i+1}:** {c['answer']}")
-            db.queries.insert_one({
-                "user_id": st.session_state.user["_id"],
-                "type": "flashcards",
-                "result": cards,
-                "created_at": datetime.utcnow()
-            })
-    if st.button("Generate Practice Questions") and note_text.strip():
-        with st.spinner("Generating questions..."):
-            qs = generate_practice_questions(note_text, num_questions=8)
-            st.subheader("Practice Questions")
-            for q in qs:
-                st.write("- " + q)
-            db.queries.insert_one({
-                "user_id": st.session_state.user["_id"],
-                "type": "practice_questions",
-                "result": qs,
-                "created_at": datetime.utcnow()
-            })
-
-# -------------------------
-# IEEE AUTO-FORMATTER
-# -------------------------
-elif choice == "IEEE Auto-Formatter":
-    st.header("📄 IEEE Auto-Formatter")
-    uploaded_file = st.file_uploader("Upload project doc (PDF/TXT)", type=["txt", "pdf"])
-    notes = list(db.notes.find({"user_id": st.session_state.user["_id"]}))
-    use_saved = st.checkbox("Or use saved note")
-    content = ""
-    if use_saved and notes:
-        sel = st.selectbox("Select saved note", [n["title"] for n in notes])
-        content = next(n for n in notes if n["title"] == sel)["content"]
-    elif uploaded_file:
-        content = extract_text_from_pdf(uploaded_file) if uploaded_file.type == "application/pdf" else extract_text_from_txt(uploaded_file)
-        if not content.strip():
-            uploaded_file.seek(0)
-            content = extract_text_with_ocr(uploaded_file)
-    if st.button("Auto-Format to IEEE") and content.strip():
-        with st.spinner("Formatting..."):
-            formatted = ieee_auto_format(content)
-            st.subheader("Formatted Draft")
-            st.write(formatted)
-            db.queries.insert_one({
-                "user_id": st.session_state.user["_id"],
-                "type": "ieee_format",
-                "result": formatted,
-                "created_at": datetime.utcnow()
-            })
+                    st.write(f"{len(hits)} note(s)")
+                    for h in hits:
+                        st.markdown(f"**{h['title']}** — " + ", ".join(h.get("tags", [])))
+                        st.write(h.get("content", "")[:1000])
+
+    # -------------------------
+    # MY ACCOUNT
+    # -------------------------
+    elif choice == "My Account":
+        st.header("⚙️ My Dashboard")
+        st.write("Manage profile, view stats, and control your account.")
+
+        st.subheader("👤 Profile Settings")
+        name = st.text_input("Name", value=st.session_state.user["name"])
+        email = st.text_input("Email", value=st.session_state.user["email"])
+        new_password = st.text_input("New Password (leave blank to keep current)", type="password")
+        if st.button("Update Profile"):
+            changed = update_profile(st.session_state.user["_id"], name, email, new_password.strip() or None)
+            st.session_state.user.update(changed)
+            update_session_profiles(st.session_state.user["_id"], changed)
+            if new_password.strip():
+                # other devices must log in again with the new password
+                revoke_user_sessions(st.session_state.user["_id"], keep_token=st.session_state.get("session_token"))
+            st.success("Profile updated")
+
+        st.markdown("---")
+        st.subheader("📊 Statistics")
+        flush_activity()
+        stats = get_user_stats(st.session_state.user["_id"])
+        st.metric("Notes Uploaded", stats["notes"])
+        st.metric("Queries Made", stats["queries"])
+
+        st.markdown("---")
+        st.subheader("📜 Recent Activity")
+        activities = stats["recent"]
+        if activities:
+            for a in activities:
+                st.write(f"- [{a.get('created_at')}] {a.get('type')} — {a.get('desc')}")
+        else:
+            st.info("No recent activity.")
 
-# -------------------------
-# ADVANCED SEARCH (TAGS)
-# -------------------------
-elif choice == "Advanced Search (Tags)":
-    st.header("🔎 Advanced Search (Tags)")
-    tag = st.text_input("Search by tag (exact match)")
-    if st.button("Search by tag") and tag.strip():
-        hits = get_notes_by_tag(str(st.session_state.user["_id"]), tag.strip())
-        if not hits:
-            st.info("No notes found with that tag.")
+        st.markdown("---")
+        st.subheader("⏱️ AI Usage")
+        usage = feature_usage(st.session_state.user["_id"])
+        if usage:
+            st.dataframe(usage, use_container_width=True)
         else:
-            for h in hits:
-                st.markdown(f"**{h['title']}**")
-                st.write(h.get("content", "")[:1000])
+            st.info("No AI calls recorded yet.")
+
+        st.markdown("---")
+        st.subheader("🗑️ Danger Zone")
+        if st.button("Delete All My Notes"):
+            res = db.notes.delete_many({"user_id": st.session_state.user["_id"]})
+            record_notes_deleted(st.session_state.user["_id"], res.deleted_count)
+            delete_user_tags(st.session_state.user["_id"])
+            delete_user_qa_sessions(st.session_state.user["_id"])
+            st.warning("All notes deleted.")
+        if st.button("Delete My Account (Permanent)"):
+            db.users.delete_one({"_id": st.session_state.user["_id"]})
+            db.notes.delete_many({"user_id": st.session_state.user["_id"]})
+            flush_activity()
+            delete_user_history(st.session_state.user["_id"])
+            delete_user_stats(st.session_state.user["_id"])
+            delete_user_tags(st.session_state.user["_id"])
+            delete_user_qa_sessions(st.session_state.user["_id"])
+            revoke_user_sessions(st.session_state.user["_id"])
+            end_session()
+            st.rerun()
+finally:
+    # st.stop / st.rerun / an error end the page early; the profile (and tracemalloc) must still close
+    end_page(page_profile)
 
 # -------------------------
-# MY ACCOUNT
+# PROFILE PANEL (APP_PROFILE / ?profile=1)
 # -------------------------
-elif choice == "My Account":
-    st.header("⚙️ My Dashboard")
-    st.write("Manage profile, view stats, and control your account.")
-
-    st.subheader("👤 Profile Settings")
-    name = st.text_input("Name", value=st.session_state.user["name"])
-    email = st.text_input("Email", value=st.session_state.user["email"])
-    new_password = st.text_input("New Password (leave blank to keep current)", type="password")
-    if st.button("Update Profile"):
-        update_data = {"name": name, "email": email}
-        if new_password.strip():
-            import bcrypt
-            hashed = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt())
-            update_data["password"] = hashed
-        db.users.update_one({"_id": st.session_state.user["_id"]}, {"$set": update_data})
-        st.session_state.user.update(update_data)
-        st.success("Profile updated")
-
-    st.markdown("---")
-    st.subheader("📊 Statistics")
-    num_notes = db.notes.count_documents({"user_id": st.session_state.user["_id"]})
-    num_queries = db.queries.count_documents({"user_id": st.session_state.user["_id"]})
-    st.metric("Notes Uploaded", num_notes)
-    st.metric("Queries Made", num_queries)
-
-    st.markdown("---")
-    st.subheader("📜 Recent Activity")
-    activities = list(db.queries.find({"user_id": st.session_state.user["_id"]}).sort("created_at", -1).limit(8))
-    if activities:
-        for a in activities:
-            t = a.get("created_at")
-            typ = a.get("type", "action")
-            desc = a.get("question") or a.get("note_type") or a.get("type") or ""
-            st.write(f"- [{t}] {typ} — {desc}")
-    else:
-        st.info("No recent activity.")
-
-    st.markdown("---")
-    st.subheader("🗑️ Danger Zone")
-    if st.button("Delete All My Notes"):
-        db.notes.delete_many({"user_id": st.session_state.user["_id"]})
-        st.warning("All notes deleted.")
-    if st.button("Delete My Account (Permanent)"):
-        db.users.delete_one({"_id": st.session_state.user["_id"]})
-        db.notes.delete_many({"user_id": st.session_state.user["_id"]})
-        db.queries.delete_many({"user_id": st.session_state.user["_id"]})
-        st.session_state.user = None
-        st.experimental_rerun()
+if page_profile is not None:
+    with st.sidebar.expander(f"⏱️ Profile: {page_profile.total_ms:.0f} ms", expanded=True):
+        st.dataframe(page_profile.by_category(), use_container_width=True)
+        st.dataframe(page_profile.by_span(), use_container_width=True)
+        if page_profile.peak_kb is not None:
+            st.caption(f"Peak traced memory: {page_profile.peak_kb:.0f} KB")
+            st.dataframe(page_profile.top_allocations, use_container_width=True)
+        if page_profile.files:
+            st.caption("Saved: " + ", ".join(page_profile.files))
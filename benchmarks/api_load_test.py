@@ -0,0 +1,118 @@
+# benchmarks/api_load_test.py
+"""
+Load test for the async HTTP API (api.py) on a single process and event loop. Clients fire
+summarize / Q&A / IEEE review requests with `--concurrency` requests in flight, against the
+fake Groq server and the in-memory Mongo. Reports throughput, latency percentiles, status
+codes, per-endpoint limiter stats and how many Groq calls were in flight at once.
+By default requests share 10 notes, so identical prompts in flight are coalesced
+(LLM_SINGLE_FLIGHT); `--distinct` gives every request its own note to measure the raw path.
+
+    python -m benchmarks.api_load_test --requests 600 --concurrency 200 --latency 0.5
+    python -m benchmarks.api_load_test --requests 600 --concurrency 200 --distinct
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import httpx
+
+from benchmarks.corpus import research_text
+from benchmarks.harness import OfflineEnvironment
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def run(args, env):
+    import database.async_db  # noqa: F401  (so install() patches its handle)
+    env.install()
+    import api
+    from database.async_db import get_async_db
+    api.API_TOKEN = "load-test-token"
+
+    user_id = "bench-user"
+    notes = [{"title": f"Paper {i}", "content": research_text(args.paragraphs, seed=i), "user_id": user_id}
+             for i in range(args.requests if args.distinct else 10)]
+    note_ids = [str((await get_async_db().notes.insert_one(n)).inserted_id) for n in notes]
+
+    def request_for(i):
+        rng = random.Random(i)
+        kind = rng.choice(["summarize", "qa", "ieee-review"])
+        body = {"note_id": note_ids[i] if args.distinct else rng.choice(note_ids)}
+        if kind == "qa":
+            body["question"] = "What is the main contribution?"
+        return kind, body
+
+    latencies, statuses = [], {}
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=None,
+                                 headers={"Authorization": f"Bearer {api.API_TOKEN}",
+                                          "X-User-Id": user_id}) as client:
+        async def worker():
+            while not queue.empty():
+                kind, body = request_for(queue.get_nowait())
+                start = time.perf_counter()
+                resp = await client.post(f"/{kind}", json=body)
+                latencies.append(time.perf_counter() - start)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        health = (await client.get("/health")).json()
+
+    from services.groq_utils import close_async_client
+    await close_async_client()
+    groq = env.groq_stats()
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "distinct": args.distinct,
+        "groq_latency_s": args.latency,
+        "seconds": round(elapsed, 2),
+        "requests_per_s": round(args.requests / elapsed, 1),
+        "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+        "latency_p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+        "statuses": statuses,
+        "groq_requests": groq.get("requests"),
+        "groq_max_in_flight": groq.get("max_in_flight"),
+        "single_flight": health["single_flight"],
+        "endpoints": health["endpoints"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the async HTTP API")
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake Groq latency (s)")
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--distinct", action="store_true",
+                        help="one note per request, so no prompts are coalesced or served from cache")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    with OfflineEnvironment(latency=args.latency) as env:
+        report = asyncio.run(run(args, env))
+    print(f"{report['requests']} requests, {report['concurrency']} concurrent: {report['seconds']} s "
+          f"({report['requests_per_s']} req/s), p50 {report['latency_p50_ms']} ms, "
+          f"p95 {report['latency_p95_ms']} ms, Groq max in flight {report['groq_max_in_flight']}")
+    print(f"statuses {report['statuses']}; {report['groq_requests']} Groq requests, "
+          f"{report['single_flight']['coalesced']} coalesced")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
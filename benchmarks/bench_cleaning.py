@@ -0,0 +1,73 @@
+# benchmarks/bench_cleaning.py
+"""
+Token reduction and throughput of the ingestion cleaning stage (utils.file_utils.clean_pages).
+
+Throughput is measured on raw page text shaped like pdfplumber output (running header,
+hyphenated line breaks, page-number footer), so it times the cleaning itself rather than
+PDF parsing. Token reduction is also reported end to end on real synthetic PDFs.
+
+    python -m benchmarks.bench_cleaning --docs 50 --paragraphs 60
+"""
+import argparse
+import io
+import json
+import time
+
+from benchmarks.corpus import make_pdf, pages_for, research_text
+from services.token_budget import estimate_tokens
+from utils.file_utils import clean_pages, extract_text_from_pdf
+
+
+def raw_pages(text: str, header: str = "Journal of Synthetic Research, Vol. 12"):
+    pages = []
+    for n, lines in enumerate(pages_for(text), start=1):
+        body = [line for line in lines if line]
+        pages.append("\n".join([header] + body + [str(n)]))
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the text cleaning stage")
+    parser.add_argument("--docs", type=int, default=30)
+    parser.add_argument("--paragraphs", type=int, default=60)
+    parser.add_argument("--pdf-docs", type=int, default=3, help="documents for the end-to-end PDF check")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    corpus = [raw_pages(research_text(args.paragraphs, seed=i)) for i in range(args.docs)]
+    raw_bytes = sum(len(p.encode("utf-8")) for doc in corpus for p in doc)
+    raw_tokens = sum(estimate_tokens("".join(doc)) for doc in corpus)
+
+    start = time.perf_counter()
+    cleaned = ["\n".join(p for p in clean_pages(doc) if p) for doc in corpus]
+    elapsed = time.perf_counter() - start
+    clean_tokens = sum(estimate_tokens(doc) for doc in cleaned)
+
+    pdf_raw = pdf_clean = 0
+    for i in range(args.pdf_docs):
+        data = make_pdf(research_text(args.paragraphs, seed=100 + i))
+        pdf_raw += estimate_tokens(extract_text_from_pdf(io.BytesIO(data), clean=False))
+        pdf_clean += estimate_tokens(extract_text_from_pdf(io.BytesIO(data)))
+
+    report = {
+        "docs": args.docs,
+        "raw_mb": round(raw_bytes / 1e6, 3),
+        "seconds": round(elapsed, 4),
+        "mb_per_s": round(raw_bytes / 1e6 / elapsed, 2),
+        "raw_tokens": raw_tokens,
+        "clean_tokens": clean_tokens,
+        "token_reduction": round(1 - clean_tokens / raw_tokens, 4),
+        "pdf_raw_tokens": pdf_raw,
+        "pdf_clean_tokens": pdf_clean,
+        "pdf_token_reduction": round(1 - pdf_clean / pdf_raw, 4) if pdf_raw else 0.0,
+    }
+    print(f"cleaned {report['raw_mb']} MB in {report['seconds']} s ({report['mb_per_s']} MB/s)")
+    print(f"tokens {raw_tokens} -> {clean_tokens} ({report['token_reduction']:.1%} fewer); "
+          f"PDF end-to-end {pdf_raw} -> {pdf_clean} ({report['pdf_token_reduction']:.1%} fewer)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
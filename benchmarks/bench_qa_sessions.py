@@ -0,0 +1,74 @@
+# benchmarks/bench_qa_sessions.py
+"""
+Prompt size per turn of a long Q&A conversation about one note: the session
+(services.qa_session_service: recent window + compacted summary) against resending the
+whole transcript with every follow-up, the naive way to give Q&A memory.
+
+    python -m benchmarks.bench_qa_sessions --turns 40 --paragraphs 8
+"""
+import argparse
+import json
+import time
+
+from bson import ObjectId
+
+from benchmarks.corpus import research_text
+from benchmarks.harness import OfflineEnvironment
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark bounded Q&A conversation memory")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    note = research_text(args.paragraphs, seed=5)
+    questions = [f"Follow-up {i}: how does point {i % 7 + 1} relate to the method?" for i in range(args.turns)]
+
+    with OfflineEnvironment(latency=args.latency) as env:
+        import services.qa_session_service as qa
+        from services.ai_service import qa_request
+        from services.token_budget import estimate_tokens
+        env.install()
+        user_id, note_id = ObjectId(), ObjectId()
+
+        session_tokens, start = [], time.perf_counter()
+        for q in questions:
+            session_tokens.append(qa.ask(user_id, note_id, note, q)["prompt_tokens"])
+        session_s = time.perf_counter() - start
+        stored = qa.get_session(user_id, note_id)
+
+        # naive memory: every earlier Q/A pair appended to the context
+        naive_tokens, transcript = [], ""
+        for turn_no, q in enumerate(questions):
+            plan, messages = qa_request(note + transcript, q)
+            naive_tokens.append(estimate_tokens(messages[0]["content"]))
+            transcript += f"\n\nQ: {q}\nA: (answer {turn_no})" + " lorem" * 60
+
+        report = {
+            "turns": args.turns,
+            "note_tokens": estimate_tokens(note),
+            "window_turns": qa.QA_WINDOW_TURNS,
+            "session_prompt_tokens_first": session_tokens[0],
+            "session_prompt_tokens_max": max(session_tokens),
+            "session_prompt_tokens_last": session_tokens[-1],
+            "naive_prompt_tokens_last": naive_tokens[-1],
+            "stored_turns": len(stored["turns"]),
+            "compacted_turns": stored["compacted"],
+            "session_s": round(session_s, 2),
+            "groq_requests": env.groq_stats()["requests"],
+        }
+    print(f"{report['turns']} turns over a {report['note_tokens']}-token note")
+    print(f"session prompt: first {report['session_prompt_tokens_first']}, max {report['session_prompt_tokens_max']}, "
+          f"last {report['session_prompt_tokens_last']} tokens; naive transcript: last {report['naive_prompt_tokens_last']}")
+    print(f"stored: {report['stored_turns']} turns + summary of {report['compacted_turns']}; "
+          f"{report['groq_requests']} Groq requests")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
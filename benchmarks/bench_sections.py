@@ -0,0 +1,75 @@
+# benchmarks/bench_sections.py
+"""
+Section-parallel IEEE review / auto-format (services.section_service) against the
+single-prompt path, on a long generated report. The fake Groq server streams output at
+`--tokens-per-sec`, so rewrites (which are as long as their input) dominate wall time.
+A revised draft with one changed section is then re-submitted to show cache reuse.
+
+    python -m benchmarks.bench_sections --paragraphs 60 --tokens-per-sec 400
+"""
+import argparse
+import json
+import time
+
+from benchmarks.corpus import research_text
+from benchmarks.harness import OfflineEnvironment
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return round(time.perf_counter() - start, 2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark section-parallel review and formatting")
+    parser.add_argument("--paragraphs", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-sec", type=float, default=400.0)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    text = research_text(args.paragraphs, seed=3)
+    paragraphs = text.split("\n\n")
+    revised = "\n\n".join(paragraphs[:-3] + [paragraphs[-3] + " We also report a new ablation."] + paragraphs[-2:])
+
+    with OfflineEnvironment(latency=args.latency, tokens_per_sec=args.tokens_per_sec) as env:
+        import services.section_service as section_service
+        from services.ai_service import ieee_review, ieee_review_request
+        from services.formatter_service import ieee_auto_format
+        from services.groq_utils import call_chat_with_fallback
+        env.install()
+        sections = section_service.split_sections(text)
+
+        def single_format():
+            # the pre-sectioning path: one prompt for the whole document
+            call_chat_with_fallback([{"role": "user", "content": "Reformat the following project documentation "
+                                      "into an IEEE-style draft.\n\n" + text}], task="ieee_format")
+
+        def single_review():
+            plan, messages = ieee_review_request(text)
+            call_chat_with_fallback(messages, model=plan.model, task=plan.task)
+
+        report = {
+            "sections": len(sections),
+            "workers": section_service.SECTION_WORKERS,
+            "format_single_s": _timed(single_format),
+            "format_sections_s": _timed(ieee_auto_format, text),
+            "format_revised_s": _timed(ieee_auto_format, revised),
+            "review_single_s": _timed(single_review),
+            "review_sections_s": _timed(ieee_review, text),
+            "review_revised_s": _timed(ieee_review, revised),
+            "groq_requests": env.groq_stats()["requests"],
+        }
+    print(f"{report['sections']} sections, {report['workers']} workers")
+    print(f"format: single {report['format_single_s']} s, sectioned {report['format_sections_s']} s, "
+          f"revised draft {report['format_revised_s']} s")
+    print(f"review: single {report['review_single_s']} s, sectioned {report['review_sections_s']} s, "
+          f"revised draft {report['review_revised_s']} s")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
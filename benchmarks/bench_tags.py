@@ -0,0 +1,75 @@
+# benchmarks/bench_tags.py
+"""
+Latency of the tag subsystem (services.tag_service) as a user's note count grows.
+Facet listing and prefix autocomplete read only tag_facets, so they should stay flat;
+for comparison the old way of building the tag list (scanning the user's notes) is timed.
+Boolean note queries are timed too, but the in-memory Mongo scans instead of using the
+(user_id, tags) multikey index, so only the facet numbers carry over to Atlas.
+
+    python -m benchmarks.bench_tags --notes 1000 10000
+"""
+import argparse
+import json
+import random
+import time
+
+from bson import ObjectId
+
+from benchmarks.harness import OfflineEnvironment
+
+
+def _time_ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return round((time.perf_counter() - start) * 1000 / repeat, 3)
+
+
+def measure(n_notes: int, n_tags: int, repeat: int) -> dict:
+    with OfflineEnvironment() as env:
+        import services.tag_service as tag_service
+        env.install()
+        user_id = ObjectId()
+        rng = random.Random(n_notes)
+        vocab = [f"topic-{i}" for i in range(n_tags)]
+        env.db.notes.insert_many([{"user_id": user_id, "title": f"Note {i}", "created_at": i,
+                                   "tags": rng.sample(vocab, 3)} for i in range(n_notes)])
+        tag_service.rebuild_tag_facets(user_id)
+
+        def scan_tags():
+            counts = {}
+            for note in env.db.notes.find({"user_id": user_id}, {"tags": 1}):
+                for t in note.get("tags", []):
+                    counts[t] = counts.get(t, 0) + 1
+            return counts
+
+        return {
+            "notes": n_notes,
+            "facets_ms": _time_ms(lambda: tag_service.get_tag_facets(user_id), repeat),
+            "suggest_ms": _time_ms(lambda: tag_service.suggest_tags(user_id, "topic-1"), repeat),
+            "scan_tags_ms": _time_ms(scan_tags, max(1, repeat // 10)),
+            "query_ms": _time_ms(lambda: tag_service.find_notes_by_tags(
+                user_id, all_of=["topic-1"], any_of=["topic-2", "topic-3"], none_of=["topic-4"], limit=50),
+                max(1, repeat // 10)),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tag facets, autocomplete and tag queries")
+    parser.add_argument("--notes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--tags", type=int, default=200, help="distinct tags per user")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    rows = [measure(n, args.tags, args.repeat) for n in args.notes]
+    for r in rows:
+        print(f"{r['notes']:>7} notes: facets {r['facets_ms']} ms, suggest {r['suggest_ms']} ms, "
+              f"scan {r['scan_tags_ms']} ms, query {r['query_ms']} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# benchmarks/bench_uploads.py
+"""
+Peak RSS of one upload's extraction, before and after the upload layer
+(utils.upload_utils). Each measurement runs in a fresh interpreter: the child loads the
+file the way its caller holds it, records ru_maxrss, extracts, and reports how far the
+peak rose. "upload" cases start from an in-memory upload (Streamlit's UploadedFile);
+"path" cases from a file on disk (CLI, folder import).
+
+    python -m benchmarks.bench_uploads --txt-mb 40 --pdf-paragraphs 600
+"""
+import argparse
+import io
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import make_pdf, research_text
+
+CASES = ("txt_upload_before", "txt_upload_after", "pdf_upload_before", "pdf_upload_after",
+         "pdf_path_before", "pdf_path_after")
+
+
+def _maxrss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _before_txt(f):
+    # the previous extract_text_from_txt: whole file as bytes, then decoded
+    return f.read().decode("utf-8", errors="ignore")
+
+
+def _before_pdf(f):
+    # the previous extract_text_from_pdf: pdfplumber keeps every page's layout cache
+    import pdfplumber
+    from utils.file_utils import clean_pages
+    with pdfplumber.open(f) as pdf:
+        pages = (page.extract_text() or "" for page in pdf.pages)
+        return "\n".join(p for p in clean_pages(pages) if p).strip()
+
+
+def child(case: str, path: str) -> dict:
+    import pdfplumber  # noqa: F401  (import cost is not part of the upload)
+    from utils.file_utils import extract_file
+    from utils.upload_utils import extract_upload
+    kind, source, stage = case.split("_")
+    upload = None
+    if source == "upload":
+        with open(path, "rb") as fh:
+            upload = io.BytesIO(fh.read())
+    baseline = _maxrss_kb()
+    start = time.perf_counter()
+    if source == "upload" and stage == "before":
+        text = _before_txt(upload) if kind == "txt" else _before_pdf(upload)
+    elif source == "upload":
+        text = extract_upload(upload, name=f"upload.{kind}")
+    elif stage == "before":
+        # previously the CLI and folder import read the whole file into bytes
+        with open(path, "rb") as fh:
+            data = fh.read()
+        text = _before_txt(io.BytesIO(data)) if kind == "txt" else _before_pdf(io.BytesIO(data))
+    else:
+        text = extract_file(path, path=path)["content"]
+    return {"case": case, "peak_rise_mb": round((_maxrss_kb() - baseline) / 1024, 1),
+            "seconds": round(time.perf_counter() - start, 2), "chars": len(text)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark peak RSS per upload")
+    parser.add_argument("--txt-mb", type=float, default=40)
+    parser.add_argument("--pdf-paragraphs", type=int, default=600)
+    parser.add_argument("--output", help="write the report as JSON")
+    parser.add_argument("--child", nargs=2, metavar=("CASE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        print(json.dumps(child(*args.child)))
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_uploads_")
+    txt_path, pdf_path = os.path.join(workdir, "notes.txt"), os.path.join(workdir, "paper.pdf")
+    block = research_text(60, seed=11)
+    with open(txt_path, "w", encoding="utf-8") as f:
+        for _ in range(int(args.txt_mb * 1024 * 1024 / len(block)) + 1):
+            f.write(block + "\f")
+    with open(pdf_path, "wb") as f:
+        f.write(make_pdf(research_text(args.pdf_paragraphs, seed=12), title="Long Paper"))
+
+    report = {"txt_mb": round(os.path.getsize(txt_path) / 1024 / 1024, 1),
+              "pdf_mb": round(os.path.getsize(pdf_path) / 1024 / 1024, 1)}
+    with open(pdf_path, "rb") as f:
+        report["pdf_pages"] = len(re.findall(rb"/Type /Page\b", f.read()))
+    print(f"txt {report['txt_mb']} MB, pdf {report['pdf_mb']} MB / {report['pdf_pages']} pages")
+    for case in CASES:
+        path = txt_path if case.startswith("txt") else pdf_path
+        out = subprocess.run([sys.executable, "-m", "benchmarks.bench_uploads", "--child", case, path],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        report[case] = result
+        print(f"{case:<20} peak +{result['peak_rise_mb']:>7} MB  {result['seconds']:>6} s  {result['chars']} chars")
+    for name in (txt_path, pdf_path):
+        os.remove(name)
+    os.rmdir(workdir)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
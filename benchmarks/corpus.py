@@ -0,0 +1,135 @@
+# benchmarks/corpus.py
+"""
+Deterministic synthetic corpora: research-note style text and multi-page PDFs that look
+like pdfplumber input from real papers (running header, page-number footer, words
+hyphenated across lines, an IEEE-ish reference list).
+"""
+import io
+import random
+
+_VOCAB = (
+    "model method data analysis approach system evaluation performance research study proposed "
+    "framework network experiment dataset accuracy training baseline results learning algorithm "
+    "distributed optimization latency throughput architecture inference representation transformer "
+    "retrieval benchmark convergence regularization generalization robustness efficiency"
+).split()
+
+SECTIONS = ["Abstract", "Introduction", "Related Work", "Methodology", "Results", "Discussion", "Conclusion"]
+
+
+def sentence(rng: random.Random, words: int = 14) -> str:
+    return " ".join(rng.choice(_VOCAB) for _ in range(words)).capitalize() + "."
+
+
+def paragraph(rng: random.Random, sentences: int = 5) -> str:
+    return " ".join(sentence(rng, rng.randint(8, 20)) for _ in range(sentences))
+
+
+def references(rng: random.Random, n: int = 8, broken_every: int = 3) -> list:
+    refs = []
+    for i in range(1, n + 1):
+        if broken_every and i % broken_every == 0:
+            refs.append(f"[{i}] {sentence(rng, 6)} missing quotes and year")
+        else:
+            refs.append(f'[{i}] A. Author, "{sentence(rng, 6)[:-1]}," IEEE Trans., vol. {i}, pp. 1-10, {2000 + i}.')
+    return refs
+
+
+def research_text(paragraphs: int = 20, seed: int = 0, with_references: bool = True) -> str:
+    """A sectioned research document of roughly 90 words per paragraph."""
+    rng = random.Random(seed)
+    parts = []
+    per_section = max(1, paragraphs // len(SECTIONS))
+    for i, name in enumerate(SECTIONS):
+        parts.append(f"{i + 1}. {name}" if i else name)
+        for _ in range(per_section):
+            parts.append(paragraph(rng))
+    if with_references:
+        parts.append("References")
+        parts.extend(references(rng))
+    return "\n\n".join(parts)
+
+
+def text_corpus(n_docs: int = 10, paragraphs: int = 20, seed: int = 0) -> list:
+    return [research_text(paragraphs, seed + i) for i in range(n_docs)]
+
+
+def _wrap(text: str, width: int, hyphenate: bool):
+    """Wrap to `width` chars; long words at the margin are split with a trailing hyphen."""
+    lines, cur = [], ""
+    for word in text.split():
+        if cur and len(cur) + 1 + len(word) > width:
+            room = width - len(cur) - 2
+            if hyphenate and len(word) > 7 and room >= 3:
+                lines.append(f"{cur} {word[:room]}-")
+                cur = word[room:]
+                continue
+            lines.append(cur)
+            cur = word
+        else:
+            cur = f"{cur} {word}" if cur else word
+    if cur:
+        lines.append(cur)
+    return lines
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pages_for(text: str, lines_per_page: int = 45, width: int = 90, hyphenate: bool = True):
+    lines = []
+    for para in text.split("\n\n"):
+        lines.extend(_wrap(para, width, hyphenate))
+        lines.append("")
+    return [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+
+
+def make_pdf(text: str, header: str = "Journal of Synthetic Research, Vol. 12", lines_per_page: int = 45,
+             hyphenate: bool = True, title: str | None = None) -> bytes:
+    """Minimal PDF 1.4 writer (Helvetica text only) with a running header and page footer."""
+    pages = pages_for(text, lines_per_page, hyphenate=hyphenate)
+    objects = []  # object bodies, 1-indexed in the file
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # filled in once the kids are known
+    kids = []
+    for n, page_lines in enumerate(pages, start=1):
+        ops = ["BT", "/F1 9 Tf", "72 770 Td", f"({_escape(header)}) Tj", "ET", "BT", "/F1 10 Tf", "14 TL", "72 740 Td"]
+        for line in page_lines:
+            ops.append(f"({_escape(line)}) '")
+        ops += ["ET", "BT", "/F1 9 Tf", "290 40 Td", f"({n}) Tj", "ET"]
+        stream = "\n".join(ops).encode("latin-1", errors="replace")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content_id, font_id)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    info_id = add(b"<< /Title (%s) >>" % _escape(title).encode("latin-1", errors="replace")) if title else None
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % i + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    trailer = b"<< /Size %d /Root %d 0 R" % (len(objects) + 1, catalog_id)
+    if info_id:
+        trailer += b" /Info %d 0 R" % info_id
+    out.write(b"trailer\n" + trailer + b" >>\nstartxref\n%d\n%%%%EOF\n" % xref)
+    return out.getvalue()
+
+
+def pdf_corpus(n_docs: int = 5, paragraphs: int = 30, seed: int = 0) -> list:
+    return [make_pdf(research_text(paragraphs, seed + i), title=f"Synthetic Paper {seed + i}") for i in range(n_docs)]
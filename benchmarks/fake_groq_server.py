@@ -0,0 +1,208 @@
+# benchmarks/fake_groq_server.py
+"""
+Local OpenAI-compatible chat completions server standing in for Groq.
+
+Point the Groq SDK at it with GROQ_BASE_URL=http://127.0.0.1:<port> (the SDK appends
+/openai/v1/chat/completions). Each response waits `latency` seconds plus
+completion_tokens / `tokens_per_sec`, and a fraction `error_rate` of requests fail with
+`error_status`. Replies are shaped like the real model's (numbered Q/A for flashcards,
+numbered lines for practice questions, a JSON array when JSON is requested) so the
+service parsers take their normal paths.
+
+    python -m benchmarks.fake_groq_server --port 8765 --latency 0.4 --tokens-per-sec 300
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_WORDS = (
+    "the model results method data analysis approach system evaluation performance research "
+    "study proposed framework network experiment dataset accuracy training baseline section"
+).split()
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _reply_for(prompt: str, rng: random.Random) -> str:
+    count = re.search(r"(?:Create|Generate|create|generate)\s+(\d+)", prompt)
+    n = int(count.group(1)) if count else 5
+    lower = prompt.lower()
+
+    def sentence(k=12):
+        return " ".join(rng.choice(_WORDS) for _ in range(k)).capitalize() + "."
+
+    if "json" in lower and "flashcard" in lower:
+        return json.dumps([{"question": sentence(8)[:-1] + "?", "answer": sentence(10)} for _ in range(n)])
+    if "json" in lower and "question" in lower:
+        return json.dumps([sentence(10)[:-1] + "?" for _ in range(n)])
+    if "flashcard" in lower:
+        return "\n".join(f"Q{i}: {sentence(8)[:-1]}?\nA{i}: {sentence(10)}" for i in range(1, n + 1))
+    if "practice question" in lower:
+        return "\n".join(f"{i}. {sentence(10)[:-1]}?" for i in range(1, n + 1))
+    if "reformat" in lower:
+        # rewrites are about as long as their input
+        return " ".join(sentence() for _ in range(max(5, _estimate_tokens(prompt) // 20)))
+    if "bullet" in lower:
+        return "\n".join(f"- {sentence()}" for _ in range(6))
+    return " ".join(sentence() for _ in range(5))
+
+
+class FakeGroqState:
+    def __init__(self, latency=0.05, tokens_per_sec=0.0, error_rate=0.0, error_status=500, seed=0):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.prompt_tokens = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests, "errors": self.errors, "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight, "prompt_tokens": self.prompt_tokens,
+            }
+
+
+def _make_handler(state: FakeGroqState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.endswith("/stats"):
+                self._send(200, state.stats())
+            elif self.path.endswith("/models"):
+                self._send(200, {"object": "list", "data": [{"id": "llama-3.3-70b-versatile"},
+                                                            {"id": "llama-3.1-8b-instant"}]})
+            else:
+                self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []))
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                prompt_tokens = _estimate_tokens(prompt)
+                state.prompt_tokens += prompt_tokens
+                fail = state.rng.random() < state.error_rate
+                reply = _reply_for(prompt, state.rng)
+            try:
+                completion_tokens = _estimate_tokens(reply)
+                delay = state.latency
+                if state.tokens_per_sec:
+                    delay += completion_tokens / state.tokens_per_sec
+                time.sleep(delay)
+                if fail:
+                    with state.lock:
+                        state.errors += 1
+                    self._send(state.error_status, {"error": {"message": "injected failure", "type": "server_error"}})
+                    return
+                self._send(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                              "total_tokens": prompt_tokens + completion_tokens},
+                })
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default listen backlog of 5 drops connects (1 s SYN retry) under bursts of clients
+    request_queue_size = 512
+
+    def handle_error(self, request, client_address):
+        # clients that time out (e.g. the API's request timeout) close mid-response
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class FakeGroqServer:
+    """Runs the fake server on a background thread; use as a context manager."""
+
+    def __init__(self, host="127.0.0.1", port=0, **state_kwargs):
+        self.state = FakeGroqState(**state_kwargs)
+        self.httpd = _HTTPServer((host, port), _make_handler(self.state))
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-groq", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible Groq server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="base seconds per request")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="generation speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    args = parser.parse_args()
+    server = FakeGroqServer(args.host, args.port, latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+                            error_rate=args.error_rate, error_status=args.error_status)
+    print(f"Fake Groq listening on {server.base_url} (export GROQ_BASE_URL={server.base_url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
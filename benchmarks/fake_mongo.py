@@ -0,0 +1,528 @@
+# benchmarks/fake_mongo.py
+"""
+In-memory stand-in for the subset of pymongo the app uses, so benchmarks and load tests
+run without Atlas. Documents are deep-copied in and out like a real driver, every
+operation takes the collection lock, and `op_latency` (seconds) can simulate a network
+round-trip. `pool_size` bounds concurrent operations like pymongo's maxPoolSize; time spent
+waiting for a slot is accumulated in `FakeDatabase.pool_wait_seconds`.
+"""
+import asyncio
+import copy
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from bson import ObjectId
+
+
+def _get_path(doc, path):
+    cur = doc
+    for part in path.split("."):
+        if isinstance(cur, dict) and part in cur:
+            cur = cur[part]
+        elif isinstance(cur, list) and part.isdigit() and int(part) < len(cur):
+            cur = cur[int(part)]
+        else:
+            return _MISSING
+    return cur
+
+
+class _Missing:
+    pass
+
+
+_MISSING = _Missing()
+
+
+def _values(value):
+    """A field matches a condition if it, or any array element of it, matches."""
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _cmp(op, a, b):
+    try:
+        if op == "$gt":
+            return a > b
+        if op == "$gte":
+            return a >= b
+        if op == "$lt":
+            return a < b
+        if op == "$lte":
+            return a <= b
+    except TypeError:
+        return False
+    return False
+
+
+def _match_cond(value, cond):
+    if isinstance(cond, dict) and cond and all(k.startswith("$") for k in cond):
+        for op, arg in cond.items():
+            if op == "$in":
+                if value is _MISSING:
+                    if None not in arg:
+                        return False
+                elif not any(v == a or (isinstance(a, re.Pattern) and isinstance(v, str) and a.search(v))
+                             for v in _values(value) for a in arg):
+                    return False
+            elif op == "$nin":
+                if value is not _MISSING and any(v in arg for v in _values(value)):
+                    return False
+            elif op == "$all":
+                vals = value if isinstance(value, list) else [value]
+                if not all(a in vals for a in arg):
+                    return False
+            elif op == "$ne":
+                if value is not _MISSING and any(v == arg for v in _values(value)):
+                    return False
+            elif op == "$eq":
+                if not any(v == arg for v in _values(value)):
+                    return False
+            elif op == "$exists":
+                if (value is not _MISSING) != bool(arg):
+                    return False
+            elif op == "$regex":
+                flags = re.I if "i" in cond.get("$options", "") else 0
+                if not any(isinstance(v, str) and re.search(arg, v, flags) for v in _values(value)):
+                    return False
+            elif op == "$options":
+                continue
+            elif op in ("$gt", "$gte", "$lt", "$lte"):
+                if value is _MISSING or not any(_cmp(op, v, arg) for v in _values(value)):
+                    return False
+            elif op == "$size":
+                if not isinstance(value, list) or len(value) != arg:
+                    return False
+            elif op == "$type":
+                types = {"string": str, "objectId": ObjectId, "array": list, "object": dict}
+                if value is _MISSING or not isinstance(value, types[arg]):
+                    return False
+            elif op == "$not":
+                if _match_cond(value, arg):
+                    return False
+            else:
+                raise NotImplementedError(f"fake_mongo: operator {op}")
+        return True
+    if isinstance(cond, re.Pattern):
+        return any(isinstance(v, str) and cond.search(v) for v in _values(value))
+    if value is _MISSING:
+        return cond is None
+    return any(v == cond for v in _values(value))
+
+
+def match(doc, flt) -> bool:
+    for key, cond in (flt or {}).items():
+        if key == "$and":
+            if not all(match(doc, f) for f in cond):
+                return False
+        elif key == "$or":
+            if not any(match(doc, f) for f in cond):
+                return False
+        elif key == "$nor":
+            if any(match(doc, f) for f in cond):
+                return False
+        elif not _match_cond(_get_path(doc, key), cond):
+            return False
+    return True
+
+
+def _set_path(doc, path, value):
+    parts = path.split(".")
+    cur = doc
+    for part in parts[:-1]:
+        cur = cur.setdefault(part, {})
+    cur[parts[-1]] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split(".")
+    cur = doc
+    for part in parts[:-1]:
+        cur = cur.get(part, {})
+    if isinstance(cur, dict):
+        cur.pop(parts[-1], None)
+
+
+def apply_update(doc, update, inserting=False):
+    if not any(k.startswith("$") for k in update):
+        keep = doc.get("_id")
+        doc.clear()
+        doc.update(copy.deepcopy(update))
+        if keep is not None:
+            doc["_id"] = keep
+        return
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            current = _get_path(doc, path)
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op == "$max":
+                if current is _MISSING or arg > current:
+                    _set_path(doc, path, arg)
+            elif op == "$min":
+                if current is _MISSING or arg < current:
+                    _set_path(doc, path, arg)
+            elif op == "$push":
+                arr = [] if current is _MISSING else current
+                if isinstance(arg, dict) and "$each" in arg:
+                    items = copy.deepcopy(arg["$each"])
+                    pos = arg.get("$position")
+                    if pos is None:
+                        arr.extend(items)
+                    else:
+                        arr[pos:pos] = items
+                    if "$slice" in arg:
+                        n = arg["$slice"]
+                        arr = arr[n:] if n < 0 else arr[:n]
+                else:
+                    arr.append(copy.deepcopy(arg))
+                _set_path(doc, path, arr)
+            elif op == "$addToSet":
+                arr = [] if current is _MISSING else current
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                for item in items:
+                    if item not in arr:
+                        arr.append(copy.deepcopy(item))
+                _set_path(doc, path, arr)
+            elif op == "$pull":
+                if current is not _MISSING:
+                    if isinstance(arg, dict):
+                        _set_path(doc, path, [v for v in current if not _match_cond(v, arg)])
+                    else:
+                        _set_path(doc, path, [v for v in current if v != arg])
+            elif op == "$pullAll":
+                if current is not _MISSING:
+                    _set_path(doc, path, [v for v in current if v not in arg])
+            else:
+                raise NotImplementedError(f"fake_mongo: update operator {op}")
+
+
+def _project(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        out = {}
+        for k in include:
+            v = _get_path(doc, k)
+            if v is not _MISSING:
+                _set_path(out, k, copy.deepcopy(v))
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    out = copy.deepcopy(doc)
+    for k, v in projection.items():
+        if not v:
+            _unset_path(out, k)
+    return out
+
+
+class FakeCursor:
+    def __init__(self, collection, flt, projection):
+        self._collection = collection
+        self._filter = flt
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key, direction=1):
+        if isinstance(key, list):
+            self._sort = key
+        else:
+            self._sort = [(key, direction)]
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def __iter__(self):
+        docs = self._collection._select(self._filter)
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda d: _sort_key(_get_path(d, key)), reverse=direction < 0)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return iter([_project(d, self._projection) for d in docs])
+
+
+def _sort_key(v):
+    if v is _MISSING or v is None:
+        return (0, "")
+    if isinstance(v, (int, float)):
+        return (1, v)
+    return (2, v) if not isinstance(v, ObjectId) else (3, str(v))
+
+
+class FakeCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}
+        self._lock = threading.RLock()
+        self.indexes = []
+
+    def _op(self):
+        return self.database._op()
+
+    def _select(self, flt):
+        with self._lock:
+            return [copy.deepcopy(d) for d in self._docs.values() if match(d, flt)]
+
+    def insert_one(self, doc):
+        with self._op(), self._lock:
+            if "_id" not in doc:
+                doc["_id"] = ObjectId()
+            if doc["_id"] in self._docs:
+                raise ValueError(f"duplicate key {doc['_id']}")
+            self._docs[doc["_id"]] = copy.deepcopy(doc)
+            return SimpleNamespace(inserted_id=doc["_id"], acknowledged=True)
+
+    def insert_many(self, docs, ordered=True):
+        docs = list(docs)
+        with self._op(), self._lock:
+            ids = []
+            for doc in docs:
+                if "_id" not in doc:
+                    doc["_id"] = ObjectId()
+                self._docs[doc["_id"]] = copy.deepcopy(doc)
+                ids.append(doc["_id"])
+            return SimpleNamespace(inserted_ids=ids, acknowledged=True)
+
+    def find(self, flt=None, projection=None):
+        self.database._op_sleep()
+        return FakeCursor(self, flt or {}, projection)
+
+    def find_one(self, flt=None, projection=None, sort=None):
+        cursor = self.find(flt, projection)
+        if sort:
+            cursor.sort(sort)
+        for doc in cursor.limit(1):
+            return doc
+        return None
+
+    def _update_unlocked(self, flt, update, upsert, many):
+        matched = 0
+        upserted_id = None
+        for doc in list(self._docs.values()):
+            if match(doc, flt):
+                apply_update(doc, update)
+                matched += 1
+                if not many:
+                    break
+        if not matched and upsert:
+            doc = {k: v for k, v in flt.items() if not k.startswith("$") and not isinstance(v, dict)}
+            apply_update(doc, update, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            self._docs[doc["_id"]] = doc
+            upserted_id = doc["_id"]
+        return SimpleNamespace(matched_count=matched, modified_count=matched, upserted_id=upserted_id)
+
+    def _update(self, flt, update, upsert, many):
+        with self._op(), self._lock:
+            return self._update_unlocked(flt, update, upsert, many)
+
+    def update_one(self, flt, update, upsert=False):
+        return self._update(flt, update, upsert, many=False)
+
+    def update_many(self, flt, update, upsert=False):
+        return self._update(flt, update, upsert, many=True)
+
+    def replace_one(self, flt, doc, upsert=False):
+        return self._update(flt, doc, upsert, many=False)
+
+    def find_one_and_update(self, flt, update, upsert=False, projection=None, return_document=False):
+        with self._op(), self._lock:
+            found = [d for d in self._docs.values() if match(d, flt)][:1]
+            before = copy.deepcopy(found[0]) if found else None
+            res = self._update_unlocked(flt, update, upsert, many=False)
+            _id = before["_id"] if before else res.upserted_id
+            after = self._docs.get(_id) if _id is not None else None
+            doc = after if return_document else before
+            return _project(doc, projection) if doc is not None else None
+
+    def delete_one(self, flt):
+        with self._op(), self._lock:
+            for key, doc in list(self._docs.items()):
+                if match(doc, flt):
+                    del self._docs[key]
+                    return SimpleNamespace(deleted_count=1)
+            return SimpleNamespace(deleted_count=0)
+
+    def delete_many(self, flt):
+        with self._op(), self._lock:
+            keys = [k for k, d in self._docs.items() if match(d, flt)]
+            for k in keys:
+                del self._docs[k]
+            return SimpleNamespace(deleted_count=len(keys))
+
+    def count_documents(self, flt, limit=0):
+        with self._op(), self._lock:
+            n = sum(1 for d in self._docs.values() if match(d, flt))
+            return min(n, limit) if limit else n
+
+    def estimated_document_count(self):
+        return len(self._docs)
+
+    def distinct(self, key, flt=None):
+        out = []
+        for doc in self._select(flt or {}):
+            v = _get_path(doc, key)
+            for item in (v if isinstance(v, list) else [v]):
+                if item is not _MISSING and item not in out:
+                    out.append(item)
+        return out
+
+    def bulk_write(self, requests, ordered=True):
+        """Accepts pymongo InsertOne/UpdateOne/UpdateMany/DeleteOne/DeleteMany as one round-trip."""
+        with self._op(), self._lock:
+            for req in requests:
+                kind = type(req).__name__
+                if kind == "InsertOne":
+                    doc = req._doc
+                    doc.setdefault("_id", ObjectId())
+                    self._docs[doc["_id"]] = copy.deepcopy(doc)
+                elif kind in ("UpdateOne", "UpdateMany", "ReplaceOne"):
+                    self._update_unlocked(req._filter, req._doc, bool(req._upsert), many=kind == "UpdateMany")
+                elif kind in ("DeleteOne", "DeleteMany"):
+                    keys = [k for k, d in self._docs.items() if match(d, req._filter)]
+                    for k in keys[:1] if kind == "DeleteOne" else keys:
+                        del self._docs[k]
+                else:
+                    raise NotImplementedError(f"fake_mongo: bulk op {kind}")
+        return SimpleNamespace(acknowledged=True)
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+        return kwargs.get("name") or str(keys)
+
+    def drop(self):
+        with self._lock:
+            self._docs.clear()
+
+
+class FakeDatabase:
+    def __init__(self, op_latency: float = 0.0, pool_size: int = 0):
+        self.op_latency = op_latency
+        self._collections = {}
+        self._lock = threading.Lock()
+        self._pool = threading.BoundedSemaphore(pool_size) if pool_size else None
+        self.pool_wait_seconds = 0.0
+        self.pool_waits = 0
+        self.ops = 0
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = FakeCollection(self, name)
+            return self._collections[name]
+
+    def list_collection_names(self):
+        return list(self._collections)
+
+    def command(self, name, *args, **kwargs):
+        self._op_sleep()
+        return {"ok": 1.0}
+
+    def _op_sleep(self):
+        with self._op():
+            pass
+
+    def _op(self):
+        return _PoolSlot(self)
+
+
+class _PoolSlot:
+    def __init__(self, database):
+        self.database = database
+
+    def __enter__(self):
+        database = self.database
+        if database._pool is not None:
+            start = time.perf_counter()
+            if not database._pool.acquire(blocking=False):
+                database._pool.acquire()
+                with database._lock:
+                    database.pool_waits += 1
+                    database.pool_wait_seconds += time.perf_counter() - start
+        database.ops += 1
+        if database.op_latency:
+            time.sleep(database.op_latency)
+        return self
+
+    def __exit__(self, *exc):
+        if self.database._pool is not None:
+            self.database._pool.release()
+        return False
+
+
+class AsyncFakeCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, key, direction=1):
+        self._cursor.sort(key, direction)
+        return self
+
+    def skip(self, n):
+        self._cursor.skip(n)
+        return self
+
+    def limit(self, n):
+        self._cursor.limit(n)
+        return self
+
+    async def to_list(self, length=None):
+        docs = await asyncio.to_thread(list, self._cursor)
+        return docs[:length] if length else docs
+
+
+class AsyncFakeCollection:
+    """Awaitable view of a FakeCollection, shaped like pymongo's AsyncCollection."""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def find(self, flt=None, projection=None):
+        return AsyncFakeCursor(self._collection.find(flt, projection))
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+
+class AsyncFakeDatabase:
+    """Async access to the same documents as a FakeDatabase (for database.async_db)."""
+
+    def __init__(self, database):
+        self._database = database
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return AsyncFakeCollection(self._database[name])
+
+    def __getitem__(self, name):
+        return AsyncFakeCollection(self._database[name])
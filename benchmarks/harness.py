@@ -0,0 +1,90 @@
+# benchmarks/harness.py
+"""
+Wires the services to local stand-ins: the fake Groq server, an in-memory Mongo and an
+offline LanguageTool replacement (set BENCH_REAL_LANGUAGETOOL=1 to use the real one).
+
+    with OfflineEnvironment(latency=0.2) as env:
+        from services.ai_service import generate_summary
+        generate_summary(text)
+"""
+import os
+import re
+import sys
+from types import ModuleType, SimpleNamespace
+
+from benchmarks.fake_groq_server import FakeGroqServer
+from benchmarks.fake_mongo import AsyncFakeDatabase, FakeDatabase
+
+
+class OfflineLanguageTool:
+    """Flags repeated words and lowercase sentence starts, shaped like language_tool_python matches."""
+
+    def check(self, text):
+        matches = []
+        for m in re.finditer(r"\b(\w+)\s+\1\b", text, flags=re.I):
+            matches.append(SimpleNamespace(message=f"Possible typo: repeated word '{m.group(1)}'",
+                                           replacements=[m.group(1)]))
+        for m in re.finditer(r"(?:^|[.!?]\s+)([a-z]\w*)", text):
+            matches.append(SimpleNamespace(message="Sentence should start with a capital letter",
+                                           replacements=[m.group(1).capitalize()]))
+        return matches
+
+
+def _install_db(fake_db):
+    """Point every loaded app module that holds a module-level `db` at the fake database."""
+    import database.db as database_db
+    database_db.db = fake_db
+    async_db = sys.modules.get("database.async_db")
+    if async_db is not None:
+        async_db.adb = AsyncFakeDatabase(fake_db)
+    for name, module in list(sys.modules.items()):
+        if module is None or name.split(".")[0] not in ("services", "database", "utils"):
+            continue
+        if hasattr(module, "db") and not isinstance(module.db, ModuleType):
+            setattr(module, "db", fake_db)
+
+
+class OfflineEnvironment:
+    def __init__(self, latency: float = 0.05, tokens_per_sec: float = 0.0, error_rate: float = 0.0,
+                 mongo_latency: float = 0.0, mongo_pool: int = 0, seed: int = 0):
+        self.server = FakeGroqServer(latency=latency, tokens_per_sec=tokens_per_sec,
+                                     error_rate=error_rate, seed=seed)
+        self.db = FakeDatabase(op_latency=mongo_latency, pool_size=mongo_pool)
+        self._saved_env = {}
+
+    def _setenv(self, key, value):
+        self._saved_env.setdefault(key, os.environ.get(key))
+        os.environ[key] = value
+
+    def __enter__(self):
+        self.server.start()
+        self._setenv("GROQ_BASE_URL", self.server.base_url)
+        self._setenv("GROQ_API_KEY", os.environ.get("GROQ_API_KEY") or "offline-benchmark")
+        self._setenv("LLM_METRICS_SINK", os.environ.get("LLM_METRICS_SINK") or "off")
+        self._setenv("SESSION_SECRET", os.environ.get("SESSION_SECRET") or "offline-benchmark")
+
+        from groq import Groq
+        import services.groq_utils as groq_utils
+        groq_utils.client = Groq(api_key=os.environ["GROQ_API_KEY"], base_url=self.server.base_url)
+        groq_utils._async_pool = None  # recreated from GROQ_BASE_URL on first async call
+        self.install()
+        return self
+
+    def install(self):
+        """(Re)patch modules; call again after importing more services."""
+        _install_db(self.db)
+        if os.getenv("BENCH_REAL_LANGUAGETOOL") != "1":
+            import services.grammar_service as grammar_service
+            grammar_service._tool = OfflineLanguageTool()
+
+    def groq_stats(self) -> dict:
+        return self.server.state.stats()
+
+    def __exit__(self, *exc):
+        self.server.stop()
+        for key, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        return False
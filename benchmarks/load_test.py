@@ -0,0 +1,237 @@
+# benchmarks/load_test.py
+"""
+Multi-user load test for the service layer. N simulated researchers run the app's flows
+concurrently (login, upload, view notes, summarize, Q&A, grammar), issuing the same
+service calls and `db` access patterns as app.py, against the fake Groq server and the
+in-memory Mongo with a bounded connection pool.
+
+Reports throughput, per-step latency percentiles and the usual contention points:
+waits on the single shared LanguageTool instance, Mongo pool waits and Groq concurrency.
+
+    python -m benchmarks.load_test --users 50 --flows 3 --latency 0.5 --mongo-pool 20
+"""
+import argparse
+import io
+import json
+import threading
+import time
+from datetime import datetime
+
+import bcrypt
+
+from benchmarks.corpus import make_pdf, research_text
+from benchmarks.harness import OfflineEnvironment
+
+
+class ContendedTool:
+    """
+    Wraps the shared LanguageTool instance. language_tool_python sends every check to one
+    local LanguageTool server, so by default checks are serialized here and the time callers
+    spend queued is recorded. `check_latency` adds per-check cost to the offline stand-in.
+    """
+
+    def __init__(self, inner, serialize: bool = True, check_latency: float = 0.0):
+        self.inner = inner
+        self.check_latency = check_latency
+        self._lock = threading.Lock() if serialize else None
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.wait_seconds = 0.0
+        self.max_waiting = 0
+        self._waiting = 0
+
+    def check(self, text):
+        if self._lock is None:
+            return self._check(text)
+        with self._stats_lock:
+            self._waiting += 1
+            self.max_waiting = max(self.max_waiting, self._waiting)
+        start = time.perf_counter()
+        with self._lock:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self._waiting -= 1
+                self.calls += 1
+                self.wait_seconds += waited
+            return self._check(text)
+
+    def _check(self, text):
+        if self.check_latency:
+            time.sleep(self.check_latency)
+        return self.inner.check(text)
+
+
+def _percentiles(values):
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pct(p):
+        return round(values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))], 2)
+
+    return {"count": len(values), "p50_ms": pct(50), "p90_ms": pct(90), "p95_ms": pct(95),
+            "p99_ms": pct(99), "max_ms": round(values[-1], 2)}
+
+
+class LoadTest:
+    def __init__(self, env, users: int, flows: int, doc_paragraphs: int, bcrypt_rounds: int):
+        from database.db import insert_note
+        from models.note_model import create_note
+        from utils.file_utils import extract_text_from_pdf, extract_text_from_txt
+        from services.ai_service import generate_summary, answer_question
+        from services.grammar_service import grammar_check_report
+        from services.user_service import login_user
+        from services.session_service import create_session, resume_session
+        import services.user_service as user_service
+        from services.activity_logger import log_activity
+        env.install()
+
+        self.env = env
+        self.db = env.db
+        self.users = users
+        self.flows = flows
+        self.fn = {
+            "insert_note": insert_note, "create_note": create_note, "extract_pdf": extract_text_from_pdf,
+            "extract_txt": extract_text_from_txt, "summary": generate_summary, "qa": answer_question,
+            "grammar": grammar_check_report, "login": login_user, "log_activity": log_activity,
+            "create_session": create_session, "resume_session": resume_session,
+        }
+        self.text = research_text(doc_paragraphs, seed=7)
+        self.pdf = make_pdf(self.text, title="Load Test Paper")
+        self.txt = self.text.encode("utf-8")
+        self.timings = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+        user_service.BCRYPT_ROUNDS = bcrypt_rounds  # no rehash-on-login during the run
+        salt = bcrypt.gensalt(rounds=bcrypt_rounds)
+        hashed = bcrypt.hashpw(b"password", salt)
+        self.db.users.insert_many([{"name": f"User {i}", "email": f"user{i}@example.org", "password": hashed,
+                                    "created_at": datetime.utcnow()} for i in range(users)])
+
+    def _timed(self, step, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self.errors[step] = self.errors.get(step, 0) + 1
+                self.errors.setdefault(f"{step}:last", repr(e))
+            return None
+        finally:
+            with self._lock:
+                self.timings.setdefault(step, []).append((time.perf_counter() - start) * 1000)
+
+    def user_session(self, i: int):
+        db = self.db
+        fn = self.fn
+        ok, user = self._timed("login", fn["login"], f"user{i}@example.org", "password")
+        if not ok:
+            return
+        token = self._timed("create_session", fn["create_session"], user)
+        for flow in range(self.flows):
+            # Browser reconnect / new tab: restore the login from the session token
+            user = self._timed("reconnect", fn["resume_session"], token) or user
+            # Upload Notes
+            def upload():
+                if (i + flow) % 2:
+                    content = fn["extract_pdf"](io.BytesIO(self.pdf))
+                else:
+                    content = fn["extract_txt"](io.BytesIO(self.txt))
+                note = fn["create_note"](f"Paper {i}-{flow}", content)
+                note["user_id"] = user["_id"]
+                return fn["insert_note"](note)
+            self._timed("upload", upload)
+
+            # View Notes
+            notes = self._timed("view_notes", lambda: list(
+                db.notes.find({"user_id": user["_id"]}).sort("created_at", -1))) or []
+            if not notes:
+                continue
+            note = notes[0]
+
+            # Generate Summary
+            def summarize():
+                summary = fn["summary"](note["content"])
+                db.notes.update_one({"_id": note["_id"]}, {"$set": {"summary": summary}})
+            self._timed("summarize", summarize)
+
+            # AI Q&A
+            def qa():
+                answer = fn["qa"](note["content"], "What is the proposed method?")
+                fn["log_activity"](user["_id"], "qa", note_id=note["_id"], question="method?", answer=answer)
+            self._timed("qa", qa)
+
+            # Grammar & Readability
+            def grammar():
+                report = fn["grammar"](note["content"][:4000])
+                fn["log_activity"](user["_id"], "grammar_check", result=report)
+            self._timed("grammar", grammar)
+
+    def run(self) -> dict:
+        threads = [threading.Thread(target=self.user_session, args=(i,), name=f"user-{i}") for i in range(self.users)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        ops = sum(len(v) for v in self.timings.values())
+        return {"elapsed_s": round(elapsed, 3), "ops": ops, "ops_per_s": round(ops / elapsed, 2),
+                "flows_per_s": round(self.users * self.flows / elapsed, 2),
+                "steps": {k: _percentiles(v) for k, v in sorted(self.timings.items())},
+                "errors": self.errors}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent multi-user load test of the service layer")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--flows", type=int, default=2, help="upload->view->summarize->qa->grammar loops per user")
+    parser.add_argument("--paragraphs", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake Groq base latency (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--mongo-latency", type=float, default=0.005, help="simulated Mongo round-trip (s)")
+    parser.add_argument("--mongo-pool", type=int, default=100, help="pymongo maxPoolSize (default 100)")
+    parser.add_argument("--lt-latency", type=float, default=0.05, help="per-check LanguageTool cost (s)")
+    parser.add_argument("--lt-parallel", action="store_true", help="don't serialize LanguageTool checks")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    with OfflineEnvironment(latency=args.latency, tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate,
+                            mongo_latency=args.mongo_latency, mongo_pool=args.mongo_pool) as env:
+        test = LoadTest(env, args.users, args.flows, args.paragraphs, args.bcrypt_rounds)
+        import services.grammar_service as grammar_service
+        tool = ContendedTool(grammar_service._get_languagetool(), serialize=not args.lt_parallel,
+                             check_latency=args.lt_latency)
+        grammar_service._tool = tool
+        report = test.run()
+        groq = env.groq_stats()
+
+    report["contention"] = {
+        "languagetool": {"checks": tool.calls, "total_wait_s": round(tool.wait_seconds, 3),
+                         "avg_wait_ms": round(tool.wait_seconds / tool.calls * 1000, 2) if tool.calls else 0,
+                         "max_queued": tool.max_waiting},
+        "mongo_pool": {"size": args.mongo_pool, "ops": env.db.ops, "waits": env.db.pool_waits,
+                       "total_wait_s": round(env.db.pool_wait_seconds, 3)},
+        "groq": {"requests": groq["requests"], "errors": groq["errors"], "max_in_flight": groq["max_in_flight"]},
+    }
+    report["config"] = vars(args)
+
+    print(f"{args.users} users x {args.flows} flows in {report['elapsed_s']} s "
+          f"({report['flows_per_s']} flows/s, {report['ops_per_s']} ops/s)")
+    for step, stats in report["steps"].items():
+        print(f"  {step:12s} n={stats['count']:4d} p50={stats['p50_ms']:9.1f} p95={stats['p95_ms']:9.1f} "
+              f"p99={stats['p99_ms']:9.1f} ms")
+    for name, stats in report["contention"].items():
+        print(f"  contention[{name}]: {stats}")
+    if report["errors"]:
+        print(f"  errors: {report['errors']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
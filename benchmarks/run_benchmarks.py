@@ -0,0 +1,184 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmarks for every service entry point, against the fake Groq server and the
+in-memory Mongo. Results are written as JSON (default: benchmarks/results/<git sha>.json)
+so runs can be compared across commits:
+
+    python -m benchmarks.run_benchmarks --iterations 20 --latency 0.1
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/<old sha>.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.corpus import make_pdf, research_text
+from benchmarks.harness import OfflineEnvironment
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _git_sha() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def build_benchmarks(env, paragraphs: int):
+    """name -> zero-arg callable. Imports happen here so the harness has patched the env first."""
+    from utils.file_utils import extract_text_from_pdf, extract_text_from_txt
+    from services.ai_service import generate_summary, answer_question, ieee_review
+    from services.grammar_service import grammar_check_report
+    from services.study_service import generate_flashcards, generate_practice_questions
+    from services.formatter_service import ieee_auto_format
+    from services.writing_service import generate_abstract
+    from services.citation_checker import check_references
+    from services.tag_service import get_notes_by_tag, get_tag_facets, suggest_tags, find_notes_by_tags, rebuild_tag_facets
+    env.install()
+
+    text = research_text(paragraphs, seed=1)
+    pdf_bytes = make_pdf(text, title="Benchmark Paper")
+    txt_bytes = text.encode("utf-8")
+
+    user_id = "bench-user"
+    notes = [{"title": f"Note {i}", "content": research_text(4, seed=i), "user_id": user_id,
+              "tags": [f"topic{i % 10}", "bench"], "created_at": datetime.utcnow()} for i in range(500)]
+    env.db.notes.insert_many(notes)
+    rebuild_tag_facets()
+    note_id = notes[0]["_id"]
+    env.db.queries.insert_many([{"note_id": note_id, "user_id": user_id, "question": "What?", "answer": "That.",
+                                 "type": "qa", "created_at": datetime.utcnow()} for _ in range(5)])
+
+    benches = {
+        "extract_pdf": lambda: extract_text_from_pdf(io.BytesIO(pdf_bytes)),
+        "extract_txt": lambda: extract_text_from_txt(io.BytesIO(txt_bytes)),
+        "summarize": lambda: generate_summary(text),
+        "qa": lambda: answer_question(text, "What method is proposed?"),
+        "ieee_review": lambda: ieee_review(text),
+        "grammar": lambda: grammar_check_report(text[:5000]),
+        "flashcards": lambda: generate_flashcards(text, num_cards=8),
+        "practice_questions": lambda: generate_practice_questions(text, num_questions=8),
+        "ieee_format": lambda: ieee_auto_format(text),
+        "abstract": lambda: generate_abstract(text),
+        "citation_check": lambda: check_references(text),
+        "tag_search": lambda: get_notes_by_tag(user_id, "topic3"),
+        "tag_facets": lambda: get_tag_facets(user_id),
+        "tag_suggest": lambda: suggest_tags(user_id, "top"),
+        "tag_query": lambda: find_notes_by_tags(user_id, all_of=["bench"], any_of=["topic1", "topic2"],
+                                                none_of=["topic3"]),
+    }
+    try:
+        from services.export_service import export_note_bundle
+        env.install()
+        benches["export"] = lambda: export_note_bundle(user_id, note_id)
+    except ImportError as e:
+        benches["export"] = e
+    return benches
+
+
+def run(iterations: int, warmup: int, paragraphs: int, only=None, **env_kwargs) -> dict:
+    results = {}
+    with OfflineEnvironment(**env_kwargs) as env:
+        benches = build_benchmarks(env, paragraphs)
+        for name, fn in benches.items():
+            if only and name not in only:
+                continue
+            if isinstance(fn, Exception):
+                results[name] = {"skipped": f"{type(fn).__name__}: {fn}"}
+                print(f"{name:20s} skipped ({results[name]['skipped']})")
+                continue
+            timings, errors = [], 0
+            for i in range(warmup + iterations):
+                start = time.perf_counter()
+                try:
+                    fn()
+                except Exception:
+                    errors += 1
+                elapsed = (time.perf_counter() - start) * 1000
+                if i >= warmup:
+                    timings.append(elapsed)
+            results[name] = {
+                "iterations": iterations,
+                "errors": errors,
+                "mean_ms": round(sum(timings) / len(timings), 3),
+                "p50_ms": round(_percentile(timings, 50), 3),
+                "p95_ms": round(_percentile(timings, 95), 3),
+                "min_ms": round(min(timings), 3),
+                "max_ms": round(max(timings), 3),
+            }
+            print(f"{name:20s} p50={results[name]['p50_ms']:9.2f} ms  p95={results[name]['p95_ms']:9.2f} ms"
+                  f"  errors={errors}")
+        groq_stats = env.groq_stats()
+    return {"results": results, "groq": groq_stats}
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> bool:
+    """Print p50 deltas vs. a baseline run; returns True if any benchmark regressed past threshold."""
+    regressed = False
+    print(f"\nvs. {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, cur in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or "p50_ms" not in old or "p50_ms" not in cur:
+            continue
+        delta = (cur["p50_ms"] - old["p50_ms"]) / old["p50_ms"] if old["p50_ms"] else 0.0
+        flag = ""
+        if delta > threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{name:20s} {old['p50_ms']:9.2f} -> {cur['p50_ms']:9.2f} ms ({delta:+.1%}){flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline service benchmarks")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--paragraphs", type=int, default=40, help="size of the synthetic document")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Groq base latency (s)")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--mongo-latency", type=float, default=0.0, help="simulated Mongo round-trip (s)")
+    parser.add_argument("--only", nargs="*", help="run only these benchmarks")
+    parser.add_argument("--output", help="JSON path (default benchmarks/results/<sha>.json)")
+    parser.add_argument("--compare", help="baseline JSON to diff against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold for --compare")
+    args = parser.parse_args(argv)
+
+    run_data = run(args.iterations, args.warmup, args.paragraphs, only=args.only, latency=args.latency,
+                   tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate,
+                   mongo_latency=args.mongo_latency)
+    commit = _git_sha()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        **run_data,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            if compare(report, json.load(f), args.threshold):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# cli.py
+"""
+Headless entry point for batch jobs (no Streamlit import).
+
+    python cli.py summarize papers/ notes.txt --workers 4 --output summaries.jsonl
+    python cli.py check-citations --mongo-query '{"user_id": {"$oid": "..."}}' --checkpoint cites.ckpt
+    python cli.py grammar drafts/ --output grammar.jsonl
+    python cli.py format report.pdf
+    python cli.py export --mongo-query '{"tags": "thesis"}' --checkpoint export.ckpt
+    python cli.py import papers/ archive.zip --user-id 64f0c0ffee...   # bulk import as notes
+
+Inputs are files or directories (PDF/TXT) and/or notes selected with --mongo-query (a JSON
+filter on db.notes; Extended JSON such as {"$oid": ...} is accepted). Each result is one
+JSON line. With --checkpoint, finished inputs are recorded and skipped on the next run.
+`import` is the only way to import a server-side folder; the web app accepts uploaded zips only.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+def _run_summarize(item):
+    from services.ai_service import generate_summary
+    return generate_summary(item["content"])
+
+
+def _run_citations(item):
+    from services.citation_checker import check_references
+    return check_references(item["content"])
+
+
+def _run_grammar(item):
+    from services.grammar_service import grammar_check_report
+    report = grammar_check_report(item["content"])
+    report.pop("original", None)
+    return report
+
+
+def _run_format(item):
+    from services.formatter_service import ieee_auto_format_report
+    return ieee_auto_format_report(item["content"])
+
+
+def _run_export(item):
+    from services.export_service import export_note_bundle
+    if item.get("note_id") is None:
+        raise ValueError("export needs notes selected with --mongo-query")
+    return export_note_bundle(item["user_id"], item["note_id"])
+
+
+COMMANDS = {
+    "summarize": (_run_summarize, "Summarize each input (generate_summary)"),
+    "check-citations": (_run_citations, "Check IEEE references (check_references)"),
+    "grammar": (_run_grammar, "Grammar & readability report (grammar_check_report)"),
+    "format": (_run_format, "Reformat to an IEEE draft (ieee_auto_format_report)"),
+    "export": (_run_export, "Export PDF bundles for notes (export_note_bundle)"),
+}
+
+
+def iter_file_items(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, f) for root, _, names in os.walk(path) for f in names)
+        else:
+            files = [path]
+        for f in files:
+            if f.lower().endswith((".pdf", ".txt")):
+                yield {"key": os.path.abspath(f), "path": f, "title": None, "error": None}
+
+
+def iter_note_items(query: str, limit: int):
+    from bson import json_util
+    from database.db import db
+    cursor = db.notes.find(json_util.loads(query), {"title": 1, "content": 1, "user_id": 1})
+    if limit:
+        cursor = cursor.limit(limit)
+    for note in cursor:
+        yield {"key": f"note:{note['_id']}", "title": note.get("title"), "content": note.get("content", ""),
+               "note_id": note["_id"], "user_id": note.get("user_id"), "error": None}
+
+
+def _load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def process(item, fn):
+    start = time.perf_counter()
+    if item.get("path"):
+        # extraction runs on the worker too, so skipped (checkpointed) files are never parsed
+        from utils.file_utils import extract_file
+        extracted = extract_file(item["path"], path=item["path"])
+        item.update(title=extracted["title"], content=extracted["content"], error=extracted["error"])
+    record = {"source": item["key"], "title": item.get("title")}
+    if item.get("error"):
+        record["error"] = item["error"]
+    else:
+        try:
+            record["result"] = fn(item)
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return item, record
+
+
+def _run_import(args) -> int:
+    from bson import ObjectId
+    from services.import_service import bulk_import
+    failed = 0
+    for source in args.sources:
+        report = bulk_import(source, ObjectId(args.user_id), workers=args.workers,
+                             precompute=args.precompute)
+        report.pop("note_ids")
+        failed += len(report["failed"])
+        print(json.dumps(dict(report, source=source, command="import")))
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Batch pipelines over the research notes services")
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="Import folders / zip archives of PDF/TXT files as a user's notes")
+    imp.add_argument("sources", nargs="+", help="directories or .zip files")
+    imp.add_argument("--user-id", required=True, help="ObjectId of the owning user")
+    imp.add_argument("--workers", type=int, default=None, help="extraction processes (default IMPORT_WORKERS)")
+    imp.add_argument("--precompute", action="store_true",
+                     help="generate flashcards/questions for every note in the background (default: on first use)")
+    for name, (_, help_text) in COMMANDS.items():
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("paths", nargs="*", help="PDF/TXT files or directories")
+        p.add_argument("--mongo-query", help="JSON filter on db.notes selecting notes to process")
+        p.add_argument("--limit", type=int, default=0, help="max notes from --mongo-query")
+        p.add_argument("--workers", type=int, default=4, help="parallel calls (default 4)")
+        p.add_argument("--output", help="JSON Lines output file (default stdout)")
+        p.add_argument("--checkpoint", help="file of finished inputs; they are skipped on rerun")
+        p.add_argument("--save", action="store_true", help="summarize: store the summary on the note")
+    args = parser.parse_args(argv)
+    if args.command == "import":
+        return _run_import(args)
+
+    if not args.paths and not args.mongo_query:
+        parser.error("give input paths and/or --mongo-query")
+
+    fn = COMMANDS[args.command][0]
+    done = _load_checkpoint(args.checkpoint)
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    ckpt = open(args.checkpoint, "a", encoding="utf-8") if args.checkpoint else None
+
+    def items():
+        sources = []
+        if args.paths:
+            sources.append(iter_file_items(args.paths))
+        if args.mongo_query:
+            sources.append(iter_note_items(args.mongo_query, args.limit))
+        for source in sources:
+            for item in source:
+                if item["key"] not in done:
+                    yield item
+
+    processed = failed = 0
+
+    def emit(item, record):
+        nonlocal processed, failed
+        processed += 1
+        if "error" in record:
+            failed += 1
+        elif args.save and args.command == "summarize" and item.get("note_id") is not None:
+            from database.db import db
+            db.notes.update_one({"_id": item["note_id"]}, {"$set": {"summary": record["result"]}})
+        out.write(json.dumps(dict(record, command=args.command), default=str) + "\n")
+        out.flush()
+        if ckpt and "error" not in record:
+            ckpt.write(item["key"] + "\n")
+            ckpt.flush()
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            in_flight = set()
+            for item in items():
+                in_flight.add(pool.submit(process, item, fn))
+                if len(in_flight) >= args.workers * 2:
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        emit(*fut.result())
+            for fut in wait(in_flight).done:
+                emit(*fut.result())
+    finally:
+        if args.output:
+            out.close()
+        if ckpt:
+            ckpt.close()
+    print(f"{args.command}: {processed} processed, {failed} failed, {len(done)} skipped (checkpoint) "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
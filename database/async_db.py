@@ -0,0 +1,30 @@
+# database/async_db.py
+import os
+from pymongo import AsyncMongoClient
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database.db import MONGODB_URI, DB_NAME
+
+# Async driver (PyMongo >= 4.9) used by the HTTP API; the Streamlit app keeps database.db.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+
+client = None
+adb = None
+
+
+def get_async_db():
+    """Database handle for the running event loop, created on first use."""
+    global client, adb
+    if adb is None:
+        client = AsyncMongoClient(MONGODB_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+        adb = client[DB_NAME]
+    return adb
+
+
+async def close_async_db():
+    global client, adb
+    if client is not None:
+        await client.close()
+    client = adb = None
@@ -2,18 +2,39 @@ import os
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from utils.profiling import MongoSpans
+
 load_dotenv()
 
 MONGODB_URI = os.getenv("MONGODB_URI")
 DB_NAME = "research_notes"
 
-client = MongoClient(MONGODB_URI)
+# MongoSpans only does work while a rerun is being profiled (utils/profiling.py)
+client = MongoClient(MONGODB_URI, event_listeners=[MongoSpans()])
 db = client[DB_NAME]
 
 def insert_note(note):
     result = db.notes.insert_one(note)
+    if note.get("user_id") is not None:
+        from services.stats_service import record_notes_added
+        record_notes_added(note["user_id"])
     return str(result.inserted_id)
 
+def insert_notes(notes):
+    """Insert many notes in one round-trip (bulk import); returns the new ids as strings."""
+    if not notes:
+        return []
+    result = db.notes.insert_many(notes, ordered=False)
+    per_user = {}
+    for note in notes:
+        if note.get("user_id") is not None:
+            per_user[note["user_id"]] = per_user.get(note["user_id"], 0) + 1
+    if per_user:
+        from services.stats_service import record_notes_added
+        for user_id, n in per_user.items():
+            record_notes_added(user_id, n)
+    return [str(i) for i in result.inserted_ids]
+
 def get_all_notes():
     return list(db.notes.find())
 
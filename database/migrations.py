@@ -0,0 +1,57 @@
+# database/migrations.py
+"""
+Maintenance jobs for the research_notes database.
+
+    python -m database.migrations compact-history   # move large history payloads into history_blobs
+    python -m database.migrations apply-retention   # enforce HISTORY_MAX_PER_USER / HISTORY_TTL_DAYS
+    python -m database.migrations gc-blobs          # drop blobs no history record references
+    python -m database.migrations ensure-indexes
+    python -m database.migrations reconcile-stats   # rebuild user_stats from notes/queries
+    python -m database.migrations rebuild-tags      # recount tag_facets, normalize note tags
+"""
+import argparse
+import json
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="research_notes maintenance jobs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compact = sub.add_parser("compact-history")
+    compact.add_argument("--batch-size", type=int, default=500)
+    sub.add_parser("apply-retention")
+    sub.add_parser("gc-blobs")
+    sub.add_parser("ensure-indexes")
+    sub.add_parser("reconcile-stats")
+    sub.add_parser("rebuild-tags")
+    args = parser.parse_args(argv)
+
+    from services import history_service
+
+    if args.command == "compact-history":
+        history_service.ensure_indexes()
+        result = history_service.compact_history(args.batch_size)
+    elif args.command == "apply-retention":
+        result = history_service.apply_retention()
+    elif args.command == "gc-blobs":
+        result = {"removed": history_service.gc_orphan_blobs()}
+    elif args.command == "reconcile-stats":
+        from services.stats_service import reconcile_user_stats
+        result = {"repaired": reconcile_user_stats()}
+    elif args.command == "rebuild-tags":
+        from services.tag_service import ensure_indexes, rebuild_tag_facets
+        ensure_indexes()
+        result = {"facets": rebuild_tag_facets()}
+    else:
+        from services import tag_service, session_service, section_service, qa_session_service, llm_metrics
+        history_service.ensure_indexes()
+        tag_service.ensure_indexes()
+        session_service.ensure_indexes()
+        section_service.ensure_indexes()
+        qa_session_service.ensure_indexes()
+        llm_metrics.ensure_indexes()
+        result = {"ok": True}
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
+import hashlib
 from datetime import datetime
 
+
+def note_content_hash(content: str) -> str:
+    return hashlib.sha256((content or "").encode("utf-8")).hexdigest()
+
+
 def create_note(title, content, summary=None):
     return {
         "title": title,
         "content": content,
+        "content_hash": note_content_hash(content),
         "summary": summary,
         "created_at": datetime.utcnow()
     }
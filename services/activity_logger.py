@@ -0,0 +1,70 @@
+# services/activity_logger.py
+import os
+import logging
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+load_dotenv()
+
+from utils.batch_writer import BatchWriter
+from services.history_service import write_history
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "50"))
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "2.0"))
+
+# user_id -> {"failed", "last_error"} for records dropped since that user's last successful write
+_failures_lock = threading.Lock()
+_failures = {}
+
+
+def _write(batch):
+    # large payloads are stored once in db.history_blobs and referenced from the record
+    write_history(batch)
+    with _failures_lock:
+        for r in batch:
+            _failures.pop(r.get("user_id"), None)
+
+
+def _report_failure(exc, batch):
+    types = sorted({r.get("type", "?") for r in batch})
+    logger.error("activity_logger: dropped %d activity records (%s): %s", len(batch), ", ".join(types), exc)
+    with _failures_lock:
+        for r in batch:
+            entry = _failures.setdefault(r.get("user_id"), {"failed": 0, "last_error": None})
+            entry["failed"] += 1
+            entry["last_error"] = str(exc)
+
+
+_writer = BatchWriter(_write, max_batch=ACTIVITY_BATCH_SIZE, interval=ACTIVITY_FLUSH_INTERVAL,
+                      on_error=_report_failure, name="activity-logger")
+
+
+def log_activity(user_id, activity_type: str, **fields) -> dict:
+    """
+    Queue one db.queries record (Q&A, review, grammar check, ...) without waiting for Mongo.
+    Records are written with insert_many from a background thread; pending ones are
+    flushed at shutdown.
+    """
+    record = {"user_id": user_id, "type": activity_type, **fields, "created_at": datetime.utcnow()}
+    _writer.add(record)
+    return record
+
+
+def flush_activity() -> int:
+    """Write queued records now, e.g. before reading the user's history back."""
+    return _writer.flush()
+
+
+def activity_status(user_id=None) -> dict:
+    """
+    Process-wide writer counters, or, for `user_id`, that user's records dropped since their
+    last successful write (reset once one of their records is saved again).
+    """
+    if user_id is None:
+        return {"pending": _writer.pending(), "written": _writer.written, "failed": _writer.failed,
+                "last_error": str(_writer.last_error) if _writer.last_error else None}
+    with _failures_lock:
+        entry = dict(_failures.get(user_id) or {"failed": 0, "last_error": None})
+    return {"pending": _writer.pending(), **entry}
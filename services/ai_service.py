@@ -1,48 +1,117 @@
 # services/ai_service.py
 import os
+import asyncio
 from dotenv import load_dotenv
 load_dotenv()
 
-from services.groq_utils import call_chat_with_fallback, extract_message_content
+from services.groq_utils import call_chat_with_fallback, acall_chat_with_fallback, extract_message_content
+from services.token_budget import plan_prompt, estimate_tokens
+from services.section_service import sections_for, run_sections, consistency_pass
 
 MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
 
+# Each *_request builder returns (plan, messages); the sync functions below are used by the
+# Streamlit app and the CLI, the async a* variants by the HTTP API (api.py).
 
-def generate_summary(text: str) -> str:
-    if not text or not text.strip():
-        return "Error: No text supplied for summarization."
+
+def summary_request(text: str):
+    plan = plan_prompt(text, "summary", MODEL)
     prompt = (
         "Summarize the following text in a concise academic summary (3-6 sentences). "
         "Do not invent facts. Return only the summary.\n\n"
-        f"{text}"
+        f"{plan.text}"
     )
-    messages = [{"role": "user", "content": prompt}]
-    resp = call_chat_with_fallback(messages, model=MODEL)
-    return extract_message_content(resp)
+    return plan, [{"role": "user", "content": prompt}]
 
 
-def answer_question(context: str, question: str) -> str:
-    if not question or not question.strip():
-        return "Error: No question supplied."
+def qa_request(context: str, question: str):
+    plan = plan_prompt(context, "qa", MODEL, reserve=estimate_tokens(question))
     prompt = (
         "You are an academic assistant. Use the context below to answer the question concisely "
         "and without inventing facts.\n\n"
-        f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+        f"Context:\n{plan.text}\n\nQuestion: {question}\n\nAnswer:"
     )
-    messages = [{"role": "user", "content": prompt}]
-    resp = call_chat_with_fallback(messages, model=MODEL)
-    return extract_message_content(resp)
+    return plan, [{"role": "user", "content": prompt}]
 
 
-def ieee_review(text: str) -> str:
-    if not text or not text.strip():
-        return "Error: No document provided for IEEE review."
+def ieee_review_request(text: str):
+    plan = plan_prompt(text, "ieee_review", MODEL)
     prompt = (
         "You are an IEEE-format reviewer. Provide actionable suggestions to make the following "
         "project documentation conform to IEEE style and structure. Do not invent results or citations. "
         "Return a bullet list of suggestions.\n\n"
-        f"{text}"
+        f"{plan.text}"
     )
-    messages = [{"role": "user", "content": prompt}]
-    resp = call_chat_with_fallback(messages, model=MODEL)
+    return plan, [{"role": "user", "content": prompt}]
+
+
+def generate_summary(text: str) -> str:
+    if not text or not text.strip():
+        return "Error: No text supplied for summarization."
+    plan, messages = summary_request(text)
+    resp = call_chat_with_fallback(messages, model=plan.model, task=plan.task)
+    return extract_message_content(resp)
+
+
+def answer_question(context: str, question: str) -> str:
+    if not question or not question.strip():
+        return "Error: No question supplied."
+    plan, messages = qa_request(context, question)
+    resp = call_chat_with_fallback(messages, model=plan.model, task=plan.task)
+    return extract_message_content(resp)
+
+
+def _review_section_prompt(section, text):
+    return (
+        "You are an IEEE-format reviewer. Below is one section of a longer project document. Provide "
+        "actionable suggestions to make this section conform to IEEE style and structure. Do not invent "
+        "results or citations. Return a bullet list of suggestions.\n\n"
+        f"Section: {section['heading'] or '(front matter)'}\n\n{text}"
+    )
+
+
+def ieee_review_sections(sections: list) -> str:
+    """Long documents (sections from sections_for): review each in parallel (cached per section), then a consistency pass."""
+    results = run_sections(sections, "ieee_review", _review_section_prompt)
+    parts = [f"### {r['heading'] or 'Front matter'}\n{r['result']}" for r in results]
+    parts.append(f"### Whole document\n{consistency_pass(results, 'review')}")
+    return "\n\n".join(parts)
+
+
+def ieee_review(text: str) -> str:
+    if not text or not text.strip():
+        return "Error: No document provided for IEEE review."
+    sections = sections_for(text)
+    if sections:
+        return ieee_review_sections(sections)
+    plan, messages = ieee_review_request(text)
+    resp = call_chat_with_fallback(messages, model=plan.model, task=plan.task)
+    return extract_message_content(resp)
+
+
+async def agenerate_summary(text: str) -> str:
+    if not text or not text.strip():
+        return "Error: No text supplied for summarization."
+    plan, messages = summary_request(text)
+    resp = await acall_chat_with_fallback(messages, model=plan.model, task=plan.task)
+    return extract_message_content(resp)
+
+
+async def aanswer_question(context: str, question: str) -> str:
+    if not question or not question.strip():
+        return "Error: No question supplied."
+    plan, messages = qa_request(context, question)
+    resp = await acall_chat_with_fallback(messages, model=plan.model, task=plan.task)
+    return extract_message_content(resp)
+
+
+async def aieee_review(text: str) -> str:
+    if not text or not text.strip():
+        return "Error: No document provided for IEEE review."
+    sections = sections_for(text)
+    if sections:
+        # the section stage has its own bounded pool; keep it off the event loop
+        return await asyncio.to_thread(ieee_review_sections, sections)
+    plan, messages = ieee_review_request(text)
+    resp = await acall_chat_with_fallback(messages, model=plan.model, task=plan.task)
     return extract_message_content(resp)
@@ -7,6 +7,8 @@ from pymongo import MongoClient
 from dotenv import load_dotenv
 from typing import Optional
 
+from services.history_service import resolve
+
 load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
 DB_NAME = "research_notes"
@@ -32,7 +34,7 @@ def export_note_bundle(user_id: str, note_id: str) -> Optional[str]:
     if not note:
         return None
 
-    queries = list(db.queries.find({"note_id": note_id, "user_id": user_id}))
+    queries = [resolve(q) for q in db.queries.find({"note_id": note_id, "user_id": user_id})]
 
     filename = os.path.join(EXPORTS_DIR, f"note_report_{note_id}.pdf")
     c = canvas.Canvas(filename, pagesize=A4)
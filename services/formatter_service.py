@@ -1,35 +1,98 @@
 # services/formatter_service.py
 import os
+import re
 from dotenv import load_dotenv
 load_dotenv()
 
 from services.groq_utils import call_chat_with_fallback, extract_message_content
+from services.token_budget import plan_prompt
+from services.section_service import sections_for, run_sections, consistency_pass
 
 MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+DEFAULT_SECTIONS = ["Abstract", "Introduction", "Methodology", "Results", "Conclusion"]
 
 
-def ieee_auto_format(text: str) -> str:
+def _format_section_prompt(section, text):
+    return (
+        "Below is one section of a longer project document. Reformat it in IEEE style, keeping its "
+        "heading (renamed to the usual IEEE section name if appropriate) and its content. "
+        "Do not invent references or results. Return only the reformatted section.\n\n"
+        f"Section: {section['heading'] or '(front matter)'}\n\n{text}"
+    )
+
+
+def ieee_auto_format_report(text: str) -> dict:
+    """
+    {"formatted": draft, "consistency_notes": str | None}. Long documents are reformatted
+    section by section and get cross-section notes, kept apart from the draft itself.
+    """
     if not text.strip():
-        return "Error: No input text provided."
+        return {"formatted": "Error: No input text provided.", "consistency_notes": None}
+    sections = sections_for(text)
+    if sections:
+        # long document: sections are reformatted in parallel and re-joined in order
+        results = run_sections(sections, "ieee_format", _format_section_prompt)
+        return {"formatted": "\n\n".join(r["result"] for r in results),
+                "consistency_notes": consistency_pass(results, "reformatting")}
+    return {"formatted": _format_whole(text), "consistency_notes": None}
+
+
+def ieee_auto_format(text: str) -> str:
+    """The formatted draft only (see ieee_auto_format_report for the consistency notes)."""
+    return ieee_auto_format_report(text)["formatted"]
+
+
+def _format_whole(text: str) -> str:
+    plan = plan_prompt(text, "ieee_format", MODEL)
     prompt = (
         "Reformat the following project documentation into an IEEE-style draft. "
         "Include sections like Abstract, Introduction, Methodology, Results/Discussion, Conclusion, References. "
         "Do not invent references or results.\n\n"
-        f"{text}"
+        f"{plan.text}"
     )
-    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=MODEL)
+    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=plan.model, task=plan.task)
     return extract_message_content(resp)
 
 
+def _sectionify_long(sections: list, custom_sections) -> str:
+    section_str = ", ".join(custom_sections)
+
+    def build(section, part):
+        return (
+            f"Below is one part of a longer document. Assign its content to the most relevant of these "
+            f"headings: {section_str}. Output each used heading as a line '## <Heading>' followed by the "
+            f"content placed under it. Do not invent facts.\n\n{part}"
+        )
+
+    results = run_sections(sections, "ieee_format", build, version="sectionify:" + section_str)
+    grouped = {h: [] for h in custom_sections}
+    extra = []
+    for r in results:
+        blocks = re.split(r"^##\s*(.+?)\s*$", r["result"], flags=re.M)
+        if blocks[0].strip():
+            extra.append(blocks[0].strip())
+        for heading, body in zip(blocks[1::2], blocks[2::2]):
+            target = next((h for h in custom_sections if h.lower() == heading.strip().lower()), None)
+            (grouped[target] if target else extra).append(body.strip())
+    out = [f"## {h}\n\n" + "\n\n".join(grouped[h]) for h in custom_sections if grouped[h]]
+    if extra:
+        out.append("## Other\n\n" + "\n\n".join(extra))
+    return "\n\n".join(out)
+
+
 def ieee_sectionify(text: str, custom_sections=None) -> str:
     if not text.strip():
         return "Error: No input text provided."
     if not custom_sections:
-        custom_sections = ["Abstract", "Introduction", "Methodology", "Results", "Conclusion"]
+        custom_sections = DEFAULT_SECTIONS
+    sections = sections_for(text)
+    if sections:
+        return _sectionify_long(sections, custom_sections)
     section_str = ", ".join(custom_sections)
+    plan = plan_prompt(text, "ieee_format", MODEL)
     prompt = (
         f"Reformat the following text into sections: {section_str}. "
-        f"Assign relevant content under each heading. Do not invent facts.\n\n{text}"
+        f"Assign relevant content under each heading. Do not invent facts.\n\n{plan.text}"
     )
-    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=MODEL)
+    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=plan.model, task=plan.task)
     return extract_message_content(resp)
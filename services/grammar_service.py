@@ -7,10 +7,13 @@ import language_tool_python
 from typing import Dict, Any, List
 
 from services.groq_utils import call_chat_with_fallback, extract_message_content
+from services.token_budget import plan_prompt
+from utils.profiling import traced
 
 MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
 
 _tool = None
+@traced("languagetool", "start LanguageTool")
 def _get_languagetool():
     global _tool
     if _tool is None:
@@ -18,6 +21,7 @@ def _get_languagetool():
     return _tool
 
 
+@traced("languagetool")
 def check_with_languagetool(text: str) -> List[Dict[str, Any]]:
     if not text.strip():
         return []
@@ -29,11 +33,12 @@ def check_with_languagetool(text: str) -> List[Dict[str, Any]]:
 def improve_with_groq(text: str, max_words: int = 300) -> str:
     if not text.strip():
         return "Error: No text provided."
+    plan = plan_prompt(text, "grammar", MODEL)
     prompt = (
         f"Improve the following academic text for grammar, readability, and clarity. "
-        f"Do not change the meaning. Limit to about {max_words} words.\n\n{text}"
+        f"Do not change the meaning. Limit to about {max_words} words.\n\n{plan.text}"
     )
-    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=MODEL)
+    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=plan.model, task=plan.task)
     return extract_message_content(resp)
 
 
@@ -1,14 +1,32 @@
 # services/groq_utils.py
 import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
 import requests
 from dotenv import load_dotenv
 load_dotenv()
 
-from groq import Groq, BadRequestError
+from groq import Groq, AsyncGroq, BadRequestError, DefaultAsyncHttpxClient
+import httpx
+
+from services.token_budget import estimate_messages_tokens, log_usage
+from services.llm_metrics import record_call
+from services import single_flight
+from utils.profiling import span
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 client = Groq(api_key=GROQ_API_KEY)
 
+# async clients for the HTTP API (api.py), see AsyncGroqPool
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+GROQ_POOL_SHARD_SIZE = int(os.getenv("GROQ_POOL_SHARD_SIZE", "16"))
+_async_pool = None
+
+# identical prompts already in flight are sent once and shared (services/single_flight.py)
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "1") != "0"
+
 
 def extract_message_content(resp) -> str:
     """
@@ -83,36 +101,183 @@ def extract_message_content(resp) -> str:
         return ""
 
 
-def call_chat_with_fallback(messages, model: str | None = None, **kwargs):
-    """
-    Call Groq chat.completions with preferred model.
-    If it fails with BadRequestError (e.g., model decommissioned) try fallback model(s).
-    Returns the raw resp object on success or raises the last exception.
-    """
+def _record_success(resp, model, task, predicted, fallback, start):
+    usage = getattr(resp, "usage", None)
+    record_call(task, model, (time.perf_counter() - start) * 1000,
+                prompt_tokens=getattr(usage, "prompt_tokens", None),
+                completion_tokens=getattr(usage, "completion_tokens", None),
+                fallback=fallback, predicted_tokens=predicted)
+    log_usage(task, model, predicted, resp)
+
+
+def _record_failure(exc, model, task, predicted, fallback, start):
+    record_call(task, model, (time.perf_counter() - start) * 1000, error=type(exc).__name__,
+                fallback=fallback, predicted_tokens=predicted)
+
+
+def _timed_create(messages, model: str, task: str | None, predicted: int, fallback: bool, **kwargs):
+    """One chat.completions call, logged for token usage and recorded in llm_metrics."""
+    start = time.perf_counter()
+    try:
+        with span(f"{task or 'chat'} {model}", "groq"):
+            resp = client.chat.completions.create(messages=messages, model=model, **kwargs)
+    except Exception as e:
+        _record_failure(e, model, task, predicted, fallback, start)
+        raise
+    _record_success(resp, model, task, predicted, fallback, start)
+    return resp
+
+
+def _model_chain(model: str | None) -> list:
+    """Preferred model followed by the fallback model(s)."""
     preferred = model or os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
-    fallbacks = []
+    chain = [preferred]
     env_fb = os.getenv("GROQ_FALLBACK_MODEL")
-    if env_fb:
-        fallbacks.append(env_fb)
+    if env_fb and env_fb not in chain:
+        chain.append(env_fb)
     default_fb = "llama-3.1-8b-instant"
-    if default_fb not in fallbacks and preferred != default_fb:
-        fallbacks.append(default_fb)
+    if default_fb not in chain:
+        chain.append(default_fb)
+    return chain
+
+
+def _single_flight_key(messages, model, kwargs):
+    if not LLM_SINGLE_FLIGHT or kwargs.get("stream"):
+        return None
+    return single_flight.make_key(model, messages, kwargs)
+
+
+def _record_coalesced(task, model, predicted, start):
+    record_call(task, model, (time.perf_counter() - start) * 1000, cache="coalesced", predicted_tokens=predicted)
+
 
+def _call_with_fallback(messages, chain, task, predicted, **kwargs):
+    preferred, *fallbacks = chain
     last_exc = None
     try:
-        return client.chat.completions.create(messages=messages, model=preferred, **kwargs)
+        return _timed_create(messages, preferred, task, predicted, False, **kwargs)
     except BadRequestError as e:
         last_exc = e
         # try fallbacks
         for fb in fallbacks:
             try:
-                return client.chat.completions.create(messages=messages, model=fb, **kwargs)
+                return _timed_create(messages, fb, task, predicted, True, **kwargs)
             except Exception as e2:
                 last_exc = e2
         # nothing worked
         raise last_exc
-    except Exception as e:
-        raise e
+
+
+def call_chat_with_fallback(messages, model: str | None = None, task: str | None = None, **kwargs):
+    """
+    Call Groq chat.completions with preferred model.
+    If it fails with BadRequestError (e.g., model decommissioned) try fallback model(s).
+    `task` labels the call in the token usage log and the llm_metrics records.
+    Concurrent identical requests (same model, messages and options) share one call;
+    the callers that waited are recorded with cache="coalesced".
+    Returns the raw resp object on success or raises the last exception.
+    """
+    chain = _model_chain(model)
+    predicted = estimate_messages_tokens(messages)
+    key = _single_flight_key(messages, chain[0], kwargs)
+    if key is None:
+        return _call_with_fallback(messages, chain, task, predicted, **kwargs)
+    start = time.perf_counter()
+    resp, coalesced = single_flight.do(key, lambda: _call_with_fallback(messages, chain, task, predicted, **kwargs))
+    if coalesced:
+        _record_coalesced(task, chain[0], predicted, start)
+    return resp
+
+
+class AsyncGroqPool:
+    """
+    Keep-alive connections to Groq shared by every request on the event loop, spread over
+    AsyncGroq clients of GROQ_POOL_SHARD_SIZE connections each: httpx rescans its whole pool
+    on every request, which costs more CPU than the I/O once one pool holds ~100 connections.
+    At most GROQ_MAX_CONNECTIONS calls run at once; further callers wait in `slot()`.
+    """
+
+    def __init__(self, max_connections: int = GROQ_MAX_CONNECTIONS, shard_size: int = GROQ_POOL_SHARD_SIZE):
+        shard_size = max(1, min(shard_size, max_connections))
+        limits = httpx.Limits(max_connections=shard_size, max_keepalive_connections=shard_size)
+        self.clients = [
+            AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), timeout=GROQ_TIMEOUT,
+                      http_client=DefaultAsyncHttpxClient(limits=limits, timeout=GROQ_TIMEOUT))
+            for _ in range(-(-max_connections // shard_size))
+        ]
+        self._in_flight = [0] * len(self.clients)
+        self._slots = asyncio.Semaphore(max_connections)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Yields the least busy client once a connection slot is free."""
+        async with self._slots:
+            i = min(range(len(self.clients)), key=self._in_flight.__getitem__)
+            self._in_flight[i] += 1
+            try:
+                yield self.clients[i]
+            finally:
+                self._in_flight[i] -= 1
+
+    async def close(self):
+        for c in self.clients:
+            await c.close()
+
+
+def get_async_pool() -> AsyncGroqPool:
+    """Shared pool for async callers (api.py), created on first use inside the running event loop."""
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = AsyncGroqPool()
+    return _async_pool
+
+
+async def close_async_client() -> None:
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+
+
+async def _timed_create_async(messages, model: str, task: str | None, predicted: int, fallback: bool, **kwargs):
+    async with get_async_pool().slot() as async_client:
+        start = time.perf_counter()
+        try:
+            resp = await async_client.chat.completions.create(messages=messages, model=model, **kwargs)
+        except Exception as e:
+            _record_failure(e, model, task, predicted, fallback, start)
+            raise
+    _record_success(resp, model, task, predicted, fallback, start)
+    return resp
+
+
+async def _acall_with_fallback(messages, chain, task, predicted, **kwargs):
+    preferred, *fallbacks = chain
+    try:
+        return await _timed_create_async(messages, preferred, task, predicted, False, **kwargs)
+    except BadRequestError as e:
+        last_exc = e
+        for fb in fallbacks:
+            try:
+                return await _timed_create_async(messages, fb, task, predicted, True, **kwargs)
+            except Exception as e2:
+                last_exc = e2
+        raise last_exc
+
+
+async def acall_chat_with_fallback(messages, model: str | None = None, task: str | None = None, **kwargs):
+    """Async twin of call_chat_with_fallback (same fallback, coalescing and metrics behaviour)."""
+    chain = _model_chain(model)
+    predicted = estimate_messages_tokens(messages)
+    key = _single_flight_key(messages, chain[0], kwargs)
+    if key is None:
+        return await _acall_with_fallback(messages, chain, task, predicted, **kwargs)
+    start = time.perf_counter()
+    resp, coalesced = await single_flight.ado(
+        key, lambda: _acall_with_fallback(messages, chain, task, predicted, **kwargs))
+    if coalesced:
+        _record_coalesced(task, chain[0], predicted, start)
+    return resp
 
 
 def list_groq_models():
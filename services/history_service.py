@@ -0,0 +1,228 @@
+# services/history_service.py
+import os
+import gzip
+import json
+import zlib
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+load_dotenv()
+
+from pymongo import UpdateOne
+
+from database.db import db
+from services.stats_service import record_activity, record_queries_removed
+
+logger = logging.getLogger(__name__)
+
+# Strings longer than this (bytes) are stored once in db.history_blobs and referenced by hash.
+HISTORY_INLINE_LIMIT = int(os.getenv("HISTORY_INLINE_LIMIT", "4096"))
+# Retention: drop history older than N days (TTL index), and/or keep at most N records per user,
+# archiving the overflow to gzip JSONL files. 0 disables either policy.
+HISTORY_TTL_DAYS = int(os.getenv("HISTORY_TTL_DAYS", "0"))
+HISTORY_MAX_PER_USER = int(os.getenv("HISTORY_MAX_PER_USER", "0"))
+HISTORY_ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", "archive/history")
+# gc_orphan_blobs leaves blobs referenced this recently alone: write_history upserts a blob
+# before inserting the record that points at it
+HISTORY_BLOB_GC_GRACE_MINUTES = float(os.getenv("HISTORY_BLOB_GC_GRACE_MINUTES", "60"))
+
+PREVIEW_CHARS = 200
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _blob_ref(text: str):
+    h = content_hash(text)
+    ref = {"blob_ref": h, "size": len(text), "preview": text[:PREVIEW_CHARS]}
+    now = datetime.utcnow()
+    op = UpdateOne(
+        {"_id": h},
+        {"$setOnInsert": {"data": zlib.compress(text.encode("utf-8")), "size": len(text), "created_at": now},
+         "$set": {"last_ref": now},
+         "$inc": {"refs": 1}},
+        upsert=True,
+    )
+    return ref, op
+
+
+def externalize(record: dict):
+    """
+    Replace large strings in a history record (top level, or one level down in `result`)
+    with {"blob_ref", "size", "preview"} and list every hash it references in `blob_refs`.
+    Returns (record, blob upserts for db.history_blobs).
+    """
+    ops = []
+    for key, value in list(record.items()):
+        if isinstance(value, str) and len(value.encode("utf-8")) > HISTORY_INLINE_LIMIT:
+            record[key], op = _blob_ref(value)
+            ops.append(op)
+        elif key == "result" and isinstance(value, dict):
+            for sub, subval in list(value.items()):
+                if isinstance(subval, str) and len(subval.encode("utf-8")) > HISTORY_INLINE_LIMIT:
+                    value[sub], op = _blob_ref(subval)
+                    ops.append(op)
+    record["blob_refs"] = _blob_refs(record)
+    return record, ops
+
+
+def write_history(records: list) -> None:
+    """Store blobs (one bulk upsert), the history records (one insert_many), then bump user_stats."""
+    ops = []
+    for r in records:
+        ops.extend(externalize(r)[1])
+    if ops:
+        db.history_blobs.bulk_write(ops, ordered=False)
+    db.queries.insert_many(records, ordered=False)
+    record_activity(records)
+
+
+def _is_ref(value) -> bool:
+    return isinstance(value, dict) and "blob_ref" in value
+
+
+def _blob_refs(record: dict) -> list:
+    refs = [v["blob_ref"] for v in record.values() if _is_ref(v)]
+    if isinstance(record.get("result"), dict):
+        refs += [v["blob_ref"] for v in record["result"].values() if _is_ref(v)]
+    return refs
+
+
+def _referenced(flt: dict) -> list:
+    """Blob hashes referenced by the history records matching `flt`, reading only `blob_refs` where present."""
+    refs = []
+    for record in db.queries.find({**flt, "blob_refs": {"$exists": True}}, {"blob_refs": 1}):
+        refs += record["blob_refs"]
+    # records written before blob_refs existed (compact-history backfills the field)
+    for record in db.queries.find({**flt, "blob_refs": {"$exists": False}}):
+        refs += _blob_refs(record)
+    return refs
+
+
+def load_blob(h: str) -> str | None:
+    blob = db.history_blobs.find_one({"_id": h})
+    return zlib.decompress(blob["data"]).decode("utf-8") if blob else None
+
+
+def resolve(record: dict) -> dict:
+    """Inline referenced blobs back into a history record (falls back to the preview)."""
+    for key, value in list(record.items()):
+        if _is_ref(value):
+            record[key] = load_blob(value["blob_ref"]) or value.get("preview", "")
+        elif key == "result" and isinstance(value, dict):
+            for sub, subval in list(value.items()):
+                if _is_ref(subval):
+                    value[sub] = load_blob(subval["blob_ref"]) or subval.get("preview", "")
+    return record
+
+
+def _release_blobs(hashes: list) -> None:
+    if not hashes:
+        return
+    counts = {}
+    for h in hashes:
+        counts[h] = counts.get(h, 0) + 1
+    db.history_blobs.bulk_write([UpdateOne({"_id": h}, {"$inc": {"refs": -n}}) for h, n in counts.items()],
+                                ordered=False)
+    db.history_blobs.delete_many({"_id": {"$in": list(counts)}, "refs": {"$lte": 0}})
+
+
+def ensure_indexes() -> None:
+    db.queries.create_index([("user_id", 1), ("created_at", -1)])
+    if HISTORY_TTL_DAYS:
+        db.queries.create_index("created_at", expireAfterSeconds=HISTORY_TTL_DAYS * 86400, name="history_ttl")
+
+
+def _archive(user_id, records: list) -> str:
+    os.makedirs(HISTORY_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(HISTORY_ARCHIVE_DIR, f"{user_id}.jsonl.gz")
+    # appending a new gzip member keeps the file readable as one stream
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(resolve(dict(r)), default=str) + "\n")
+    return path
+
+
+def apply_retention(user_id=None) -> dict:
+    """
+    Enforce HISTORY_MAX_PER_USER (archive + delete the oldest overflow) and, when the TTL
+    index cannot be relied on, HISTORY_TTL_DAYS. Blobs no longer referenced are removed.
+    """
+    archived = expired = 0
+    users = [user_id] if user_id is not None else db.queries.distinct("user_id")
+    for uid in users:
+        if HISTORY_MAX_PER_USER:
+            overflow = list(db.queries.find({"user_id": uid}).sort("created_at", -1).skip(HISTORY_MAX_PER_USER))
+            if overflow:
+                _archive(uid, overflow)
+                db.queries.delete_many({"_id": {"$in": [r["_id"] for r in overflow]}})
+                _release_blobs([h for r in overflow for h in _blob_refs(r)])
+                record_queries_removed(uid, len(overflow))
+                archived += len(overflow)
+        if HISTORY_TTL_DAYS:
+            cutoff = datetime.utcnow() - timedelta(days=HISTORY_TTL_DAYS)
+            old = list(db.queries.find({"user_id": uid, "created_at": {"$lt": cutoff}}))
+            if old:
+                db.queries.delete_many({"_id": {"$in": [r["_id"] for r in old]}})
+                _release_blobs([h for r in old for h in _blob_refs(r)])
+                record_queries_removed(uid, len(old))
+                expired += len(old)
+    return {"archived": archived, "expired": expired}
+
+
+def delete_user_history(user_id) -> int:
+    """Delete a user's history records (account deletion) and release the blobs they referenced."""
+    refs = _referenced({"user_id": user_id})
+    deleted = db.queries.delete_many({"user_id": user_id}).deleted_count
+    _release_blobs(refs)
+    return deleted
+
+
+def gc_orphan_blobs(grace_minutes: float = HISTORY_BLOB_GC_GRACE_MINUTES) -> int:
+    """
+    Remove blobs whose history records are gone (e.g. expired by the TTL index). Blobs
+    referenced within the last `grace_minutes` are kept, and the delete re-checks that, so a
+    write_history racing the scan cannot lose its blob.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=grace_minutes)
+    stale = [{"last_ref": {"$lt": cutoff}}, {"last_ref": {"$exists": False}, "created_at": {"$lt": cutoff}}]
+    live = set(_referenced({}))
+    orphans = [b["_id"] for b in db.history_blobs.find({"$or": stale}, {"_id": 1}) if b["_id"] not in live]
+    if not orphans:
+        return 0
+    return db.history_blobs.delete_many({"_id": {"$in": orphans}, "$or": stale}).deleted_count
+
+
+def compact_history(batch_size: int = 500) -> dict:
+    """Migration: move large inline payloads of existing history records into history_blobs."""
+    scanned = compacted = saved = 0
+    batch = []
+    for record in db.queries.find({}):
+        scanned += 1
+        before = len(json.dumps(record, default=str))
+        indexed = "blob_refs" in record
+        updated, ops = externalize(record)
+        if ops:
+            compacted += 1
+            saved += before - len(json.dumps(updated, default=str))
+        elif indexed:
+            continue
+        # (records compacted before blob_refs existed only get their references recorded)
+        batch.append((updated, ops))
+        if len(batch) >= batch_size:
+            _commit_compaction(batch)
+            batch = []
+    if batch:
+        _commit_compaction(batch)
+    logger.info("compact_history: scanned=%d compacted=%d bytes_saved~=%d", scanned, compacted, saved)
+    return {"scanned": scanned, "compacted": compacted, "bytes_saved": saved}
+
+
+def _commit_compaction(batch) -> None:
+    blob_ops = [op for _, ops in batch for op in ops]
+    if blob_ops:
+        db.history_blobs.bulk_write(blob_ops, ordered=False)
+    db.queries.bulk_write([UpdateOne({"_id": rec["_id"]}, {"$set": {k: v for k, v in rec.items() if k != "_id"}})
+                           for rec, _ in batch], ordered=False)
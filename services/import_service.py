@@ -0,0 +1,144 @@
+# services/import_service.py
+import os
+import time
+import zipfile
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dotenv import load_dotenv
+load_dotenv()
+
+from database.db import insert_notes
+from models.note_model import create_note
+from services.study_service import schedule_study_precompute
+from utils.file_utils import extract_file
+from utils.upload_utils import UploadRejected, check_size, within_limit
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(os.cpu_count() or 2)))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "50"))
+# whole-archive caps for zip uploads (each member is also bounded by UPLOAD_MAX_MB)
+IMPORT_MAX_FILES = int(os.getenv("IMPORT_MAX_FILES", "500"))
+IMPORT_MAX_TOTAL_MB = float(os.getenv("IMPORT_MAX_TOTAL_MB", "500"))
+
+
+def _supported(name: str) -> bool:
+    base = os.path.basename(name)
+    return name.lower().endswith(SUPPORTED_EXTENSIONS) and not base.startswith(".") and "__MACOSX" not in name
+
+
+def iter_sources(source):
+    """
+    Yield (name, size, data, path) for every PDF/TXT in a zip archive (path or file-like
+    object, e.g. a Streamlit upload) or a directory tree. Directory files are passed by
+    path (the worker maps them); zip members are read one at a time, and only when their
+    declared size is within the upload limit (data is None otherwise).
+    """
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for fname in sorted(files):
+                path = os.path.join(root, fname)
+                if _supported(path):
+                    yield os.path.relpath(path, source), os.path.getsize(path), None, path
+        return
+    with zipfile.ZipFile(source) as zf:
+        for info in zf.infolist():
+            if not info.is_dir() and _supported(info.filename):
+                # zipfile stops decompressing at the declared size, so it bounds what read() returns
+                data = zf.read(info) if within_limit(info.file_size) else None
+                yield info.filename, info.file_size, data, None
+
+
+def count_sources(source) -> int:
+    """
+    Number of files to import. A zip archive is checked against IMPORT_MAX_FILES and
+    IMPORT_MAX_TOTAL_MB from its central directory (declared sizes), before anything is
+    decompressed; UploadRejected when it is over either.
+    """
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        return sum(1 for root, _, files in os.walk(source) for f in files if _supported(os.path.join(root, f)))
+    with zipfile.ZipFile(source) as zf:
+        members = [i for i in zf.infolist() if not i.is_dir() and _supported(i.filename)]
+    if hasattr(source, "seek"):
+        source.seek(0)
+    if len(members) > IMPORT_MAX_FILES:
+        raise UploadRejected(f"Archive has {len(members)} files; the limit is {IMPORT_MAX_FILES}.")
+    total_mb = sum(i.file_size for i in members) / 1024 / 1024
+    if total_mb > IMPORT_MAX_TOTAL_MB:
+        raise UploadRejected(f"Archive unpacks to {total_mb:.0f} MB; the limit is {IMPORT_MAX_TOTAL_MB:g} MB.")
+    return len(members)
+
+
+def bulk_import(source, user_id, workers: int | None = None, batch_size: int | None = None,
+                progress=None, use_processes: bool = True, precompute: bool = False) -> dict:
+    """
+    Import every PDF/TXT from a zip archive or directory as notes for user_id.
+    Extraction runs in a process pool (at most 2x workers files in flight, to bound memory);
+    notes are written with insert_many every `batch_size` files. Unlike single uploads, their
+    study artifacts are generated on first use; precompute=True queues them all in the
+    background instead (two LLM calls per note).
+    Directories are for trusted callers only (cli.py); the web app passes uploaded zips.
+    progress(done, total, name, error) is called after each file.
+    Returns {"total", "imported", "failed": [{"name", "error"}], "seconds", "files_per_minute", "note_ids"}.
+    """
+    workers = workers or IMPORT_WORKERS
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    total = count_sources(source)
+    start = time.perf_counter()
+    done = 0
+    failed, note_ids, pending_notes = [], [], []
+
+    def flush():
+        if pending_notes:
+            note_ids.extend(insert_notes(pending_notes))
+            if precompute:
+                for note in pending_notes:
+                    schedule_study_precompute(note["_id"])
+            pending_notes.clear()
+
+    def handle(result):
+        nonlocal done
+        done += 1
+        if result["error"]:
+            failed.append({"name": result["name"], "error": result["error"]})
+        else:
+            note = create_note(result["title"], result["content"], summary=None)
+            note["user_id"] = user_id
+            note["source_file"] = result["name"]
+            pending_notes.append(note)
+            if len(pending_notes) >= batch_size:
+                flush()
+        if progress:
+            progress(done, total, result["name"], result["error"])
+
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        in_flight = set()
+        for name, size, data, path in iter_sources(source):
+            try:
+                check_size(size)
+            except UploadRejected as e:
+                handle({"name": name, "title": None, "content": "", "error": f"{type(e).__name__}: {e}"})
+                continue
+            in_flight.add(pool.submit(extract_file, name, data, path))
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    handle(fut.result())
+        for fut in wait(in_flight).done:
+            handle(fut.result())
+    flush()
+
+    seconds = time.perf_counter() - start
+    report = {
+        "total": total,
+        "imported": len(note_ids),
+        "failed": failed,
+        "seconds": round(seconds, 2),
+        "files_per_minute": round(done / seconds * 60, 1) if seconds else 0.0,
+        "note_ids": note_ids,
+    }
+    logger.info("bulk_import: %d/%d files imported in %.1fs (%.1f files/min), %d failed",
+                report["imported"], total, seconds, report["files_per_minute"], len(failed))
+    return report
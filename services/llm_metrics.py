@@ -0,0 +1,199 @@
+# services/llm_metrics.py
+import os
+import json
+import threading
+import contextvars
+from datetime import datetime
+from dotenv import load_dotenv
+load_dotenv()
+
+from utils.batch_writer import BatchWriter
+
+# "mongo" writes to db.llm_calls, "file" appends JSON lines to LLM_METRICS_FILE, "off" disables.
+LLM_METRICS_SINK = os.getenv("LLM_METRICS_SINK", "mongo")
+LLM_METRICS_FILE = os.getenv("LLM_METRICS_FILE", "metrics/llm_calls.jsonl")
+
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_current_user = contextvars.ContextVar("llm_metrics_user", default=None)
+_hooks = []
+_lock = threading.Lock()
+# (feature, model, status) -> {"count", "latency_sum", "tokens_in", "tokens_out", "buckets"}
+_aggregates = {}
+# (feature, model) -> calls answered by an identical in-flight request (no tokens spent)
+_coalesced = {}
+
+
+def set_current_user(user_id) -> None:
+    """Attribute LLM calls made from this thread/task to user_id (called once per rerun in app.py)."""
+    _current_user.set(user_id)
+
+
+def register_hook(fn) -> None:
+    """fn(record) is called synchronously for every LLM call record, e.g. to feed an exporter."""
+    _hooks.append(fn)
+
+
+_indexes_ready = False
+
+
+def ensure_indexes() -> None:
+    global _indexes_ready
+    from database.db import db
+    # feature_usage: a user's most recent calls
+    db.llm_calls.create_index([("user_id", 1), ("created_at", -1)], name="llm_calls_user_recent")
+    _indexes_ready = True
+
+
+def _write_mongo(batch):
+    from database.db import db
+    if not _indexes_ready:
+        ensure_indexes()
+    db.llm_calls.insert_many(batch)
+
+
+def _write_file(batch):
+    os.makedirs(os.path.dirname(LLM_METRICS_FILE) or ".", exist_ok=True)
+    with open(LLM_METRICS_FILE, "a", encoding="utf-8") as f:
+        for rec in batch:
+            f.write(json.dumps(rec, default=str) + "\n")
+
+
+_writer = None
+if LLM_METRICS_SINK != "off":
+    _writer = BatchWriter(
+        _write_mongo if LLM_METRICS_SINK == "mongo" else _write_file,
+        max_batch=100, interval=5.0, name="llm-metrics",
+    )
+
+
+def record_call(feature, model, latency_ms, prompt_tokens=None, completion_tokens=None,
+                cache="miss", error=None, fallback=False, predicted_tokens=None) -> dict:
+    record = {
+        "user_id": _current_user.get(),
+        "feature": feature or "unknown",
+        "model": model,
+        "fallback": fallback,
+        "latency_ms": round(latency_ms, 1),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "predicted_tokens": predicted_tokens,
+        "cache": cache,
+        "error": error,
+        "created_at": datetime.utcnow(),
+    }
+    if cache == "coalesced":
+        with _lock:
+            key = (record["feature"], model)
+            _coalesced[key] = _coalesced.get(key, 0) + 1
+    else:
+        _aggregate(record)
+    for hook in _hooks:
+        try:
+            hook(record)
+        except Exception:
+            pass
+    if _writer is not None:
+        _writer.add(record)
+    return record
+
+
+def _aggregate(record) -> None:
+    key = (record["feature"], record["model"], "error" if record["error"] else "ok")
+    with _lock:
+        agg = _aggregates.setdefault(
+            key, {"count": 0, "latency_sum": 0.0, "tokens_in": 0, "tokens_out": 0,
+                  "buckets": [0] * len(LATENCY_BUCKETS_MS)}
+        )
+        agg["count"] += 1
+        agg["latency_sum"] += record["latency_ms"]
+        agg["tokens_in"] += record["prompt_tokens"] or 0
+        agg["tokens_out"] += record["completion_tokens"] or 0
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if record["latency_ms"] <= bound:
+                agg["buckets"][i] += 1
+
+
+def snapshot() -> dict:
+    """Copy of the in-process counters keyed by (feature, model, status)."""
+    with _lock:
+        return {k: dict(v, buckets=list(v["buckets"])) for k, v in _aggregates.items()}
+
+
+def _label(value) -> str:
+    """Escape a Prometheus label value (backslash, double quote, newline)."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus() -> str:
+    """Prometheus text exposition of the in-process counters, for a /metrics scrape endpoint."""
+    snap = sorted(snapshot().items())
+    calls = ["# TYPE llm_calls_total counter"]
+    latency = ["# TYPE llm_call_latency_ms histogram"]
+    tokens = ["# TYPE llm_tokens_total counter"]
+    coalesced = ["# TYPE llm_calls_coalesced_total counter"]
+    with _lock:
+        for (feature, model), n in sorted(_coalesced.items()):
+            coalesced.append(f'llm_calls_coalesced_total{{feature="{_label(feature)}",model="{_label(model)}"}} {n}')
+    for (feature, model, status), agg in snap:
+        labels = f'feature="{_label(feature)}",model="{_label(model)}",status="{_label(status)}"'
+        calls.append(f"llm_calls_total{{{labels}}} {agg['count']}")
+        for bound, n in zip(LATENCY_BUCKETS_MS, agg["buckets"]):
+            latency.append(f'llm_call_latency_ms_bucket{{{labels},le="{bound}"}} {n}')
+        latency.append(f'llm_call_latency_ms_bucket{{{labels},le="+Inf"}} {agg["count"]}')
+        latency.append(f"llm_call_latency_ms_sum{{{labels}}} {agg['latency_sum']}")
+        latency.append(f"llm_call_latency_ms_count{{{labels}}} {agg['count']}")
+        tokens.append(f'llm_tokens_total{{{labels},kind="prompt"}} {agg["tokens_in"]}')
+        tokens.append(f'llm_tokens_total{{{labels},kind="completion"}} {agg["tokens_out"]}')
+    return "\n".join(calls + latency + tokens + coalesced) + "\n"
+
+
+def flush() -> int:
+    return _writer.flush() if _writer is not None else 0
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    idx = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def _recent_records(user_id, limit):
+    if LLM_METRICS_SINK == "mongo":
+        from database.db import db
+        return list(
+            db.llm_calls.find({"user_id": user_id}, {"feature": 1, "latency_ms": 1, "prompt_tokens": 1,
+                                                     "completion_tokens": 1, "error": 1, "cache": 1})
+            .sort("created_at", -1).limit(limit)
+        )
+    if LLM_METRICS_SINK == "file" and os.path.exists(LLM_METRICS_FILE):
+        with open(LLM_METRICS_FILE, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        return [r for r in rows if r.get("user_id") == str(user_id)][-limit:]
+    return []
+
+
+def feature_usage(user_id, limit: int = 1000) -> list:
+    """Per-feature call count, p50/p95 latency and average tokens over the user's recent calls."""
+    flush()
+    by_feature = {}
+    for r in _recent_records(user_id, limit):
+        by_feature.setdefault(r.get("feature", "unknown"), []).append(r)
+    rows = []
+    for feature, recs in sorted(by_feature.items()):
+        latencies = [r["latency_ms"] for r in recs if r.get("latency_ms") is not None]
+        tokens = [(r.get("prompt_tokens") or 0) + (r.get("completion_tokens") or 0)
+                  for r in recs if r.get("cache") != "coalesced"]
+        rows.append({
+            "feature": feature,
+            "calls": len(recs),
+            "errors": sum(1 for r in recs if r.get("error")),
+            "coalesced": sum(1 for r in recs if r.get("cache") == "coalesced"),
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "avg_tokens": round(sum(tokens) / len(tokens)) if tokens else 0,
+            "total_tokens": sum(tokens),
+        })
+    return rows
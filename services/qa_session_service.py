@@ -0,0 +1,229 @@
+# services/qa_session_service.py
+"""
+Conversational Q&A over one note. A qa_sessions document per (user, note) holds everything
+a follow-up needs, so resuming a conversation is one read and never goes back to db.queries:
+
+    {"_id": "<user_id>:<note_id>", "user_id", "note_id", "summary", "turns": [{"q", "a"}],
+     "turn_count", "compacted", "updated_at", "expires_at"}
+
+The last QA_WINDOW_TURNS turns are sent verbatim; once QA_COMPACT_BATCH more have piled up,
+the oldest are folded into `summary` by the light model. The conversation part of the
+prompt therefore stays bounded however long the session runs. Compaction is best-effort:
+if it fails the turns stay in the window and the next ask tries again.
+
+ask() and aask() only differ in how they call Groq and Mongo; the steps between those
+calls are the pure functions below.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+load_dotenv()
+
+from pymongo.errors import DuplicateKeyError
+
+from database.db import db
+from services.groq_utils import call_chat_with_fallback, acall_chat_with_fallback, extract_message_content
+from services.token_budget import plan_prompt, estimate_tokens, estimate_messages_tokens
+
+logger = logging.getLogger(__name__)
+
+MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+COMPACT_MODEL = os.getenv("QA_COMPACT_MODEL", "llama-3.1-8b-instant")
+QA_WINDOW_TURNS = int(os.getenv("QA_WINDOW_TURNS", "6"))
+QA_COMPACT_BATCH = int(os.getenv("QA_COMPACT_BATCH", "2"))
+QA_SUMMARY_MAX_WORDS = int(os.getenv("QA_SUMMARY_MAX_WORDS", "200"))
+QA_SESSION_TTL_DAYS = float(os.getenv("QA_SESSION_TTL_DAYS", "30"))
+
+
+def session_key(user_id, note_id) -> str:
+    return f"{user_id}:{note_id}"
+
+
+def _empty(user_id, note_id) -> dict:
+    return {"_id": session_key(user_id, note_id), "user_id": user_id, "note_id": note_id,
+            "summary": "", "turns": [], "turn_count": 0, "compacted": 0}
+
+
+_indexes_ready = False
+
+
+def ensure_indexes() -> None:
+    global _indexes_ready
+    db.qa_sessions.create_index("user_id", name="qa_session_user")
+    db.qa_sessions.create_index("expires_at", expireAfterSeconds=0, name="qa_session_ttl")
+    _indexes_ready = True
+
+
+def get_session(user_id, note_id) -> dict:
+    return db.qa_sessions.find_one({"_id": session_key(user_id, note_id)}) or _empty(user_id, note_id)
+
+
+def reset_session(user_id, note_id) -> None:
+    db.qa_sessions.delete_one({"_id": session_key(user_id, note_id)})
+
+
+def delete_note_qa_sessions(note_id) -> None:
+    db.qa_sessions.delete_many({"note_id": note_id})
+
+
+def delete_user_qa_sessions(user_id) -> None:
+    db.qa_sessions.delete_many({"user_id": user_id})
+
+
+def qa_session_request(session: dict, context: str, question: str):
+    """(plan, messages): the note (condensed to what is left after the conversation), summary, window, question."""
+    history = []
+    for turn in session["turns"]:
+        history += [{"role": "user", "content": turn["q"]}, {"role": "assistant", "content": turn["a"]}]
+    earlier = f"\n\nEarlier in this conversation (summary):\n{session['summary']}" if session["summary"] else ""
+    reserve = estimate_messages_tokens(history) + estimate_tokens(earlier) + estimate_tokens(question)
+    plan = plan_prompt(context, "qa", MODEL, reserve=reserve)
+    system = (
+        "You are an academic assistant answering a series of questions about the note below. Use the note "
+        "and the conversation so far to answer concisely and without inventing facts.\n\n"
+        f"Note:\n{plan.text}{earlier}"
+    )
+    return plan, [{"role": "system", "content": system}, *history, {"role": "user", "content": question}]
+
+
+def _compact_request(summary: str, turns: list):
+    transcript = "\n".join(f"Q: {t['q']}\nA: {t['a']}" for t in turns)
+    instructions = (
+        f"Update the running summary of a Q&A conversation about a note. Keep the facts established, "
+        f"what the user asked about and any open threads; drop pleasantries. At most {QA_SUMMARY_MAX_WORDS} "
+        "words. Return only the summary.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n"
+    )
+    # only the transcript may be condensed; the instructions and current summary are reserved in full
+    plan = plan_prompt(transcript, "qa_compact", COMPACT_MODEL, reserve=estimate_tokens(instructions))
+    return plan, [{"role": "user", "content": instructions + plan.text}]
+
+
+def _no_question() -> dict:
+    return {"answer": "Error: No question supplied.", "turns": [], "summary": "", "turn_count": 0,
+            "prompt_tokens": 0, "compacted": 0}
+
+
+def _advance(session: dict, question: str, answer: str):
+    """New turn window plus the turns that have to be folded into the summary (possibly none)."""
+    turns = session["turns"] + [{"q": question, "a": answer}]
+    overflow = len(turns) - QA_WINDOW_TURNS
+    if overflow < QA_COMPACT_BATCH:
+        return turns, []
+    return turns[overflow:], turns[:overflow]
+
+
+def _fold(session: dict, turns: list, old: list, new_summary):
+    """
+    (turns, summary, folded) once compaction of `old` returned `new_summary` (None when the call
+    failed). An empty or failed compaction folds nothing: the old summary and turns are kept.
+    """
+    if not old:
+        return turns, session["summary"], 0
+    if new_summary and new_summary.strip():
+        return turns, new_summary.strip(), len(old)
+    logger.warning("qa_session: compaction of %s failed; keeping %d turns for the next ask",
+                   session["_id"], len(old) + len(turns))
+    return old + turns, session["summary"], 0
+
+
+def _save_ops(session: dict, turns: list, summary: str, folded: int):
+    """
+    (filter, update, upsert) for an optimistic write: it only applies if nobody else added a
+    turn since `session` was read. On a conflict the caller falls back to _append_op.
+    """
+    now = datetime.utcnow()
+    update = {"$set": {"user_id": session["user_id"], "note_id": session["note_id"], "summary": summary,
+                       "turns": turns, "updated_at": now,
+                       "expires_at": now + timedelta(days=QA_SESSION_TTL_DAYS)},
+              "$inc": {"turn_count": 1, "compacted": folded}}
+    return {"_id": session["_id"], "turn_count": session["turn_count"]}, update, session["turn_count"] == 0
+
+
+def _append_op(session: dict, question: str, answer: str):
+    """
+    Fallback write when a concurrent ask (second tab) or a "New conversation" won the race:
+    push the turn onto whatever is stored now, recreating the session if it was reset.
+    The next ask compacts.
+    """
+    now = datetime.utcnow()
+    return {"_id": session["_id"]}, {
+        "$push": {"turns": {"q": question, "a": answer}},
+        "$inc": {"turn_count": 1},
+        "$set": {"user_id": session["user_id"], "note_id": session["note_id"], "updated_at": now,
+                 "expires_at": now + timedelta(days=QA_SESSION_TTL_DAYS)},
+        "$setOnInsert": {"summary": "", "compacted": 0},
+    }
+
+
+def _result(session, turns, summary, answer, messages, folded) -> dict:
+    return {"answer": answer, "turns": turns, "summary": summary, "turn_count": session["turn_count"] + 1,
+            "prompt_tokens": estimate_messages_tokens(messages), "compacted": folded}
+
+
+def ask(user_id, note_id, context: str, question: str) -> dict:
+    """
+    Answer a follow-up in the (user, note) conversation and persist it. Returns
+    {"answer", "turns", "summary", "turn_count", "prompt_tokens", "compacted"}.
+    """
+    if not question or not question.strip():
+        return _no_question()
+    session = get_session(user_id, note_id)
+    plan, messages = qa_session_request(session, context, question)
+    answer = extract_message_content(call_chat_with_fallback(messages, model=plan.model, task=plan.task))
+
+    turns, old = _advance(session, question, answer)
+    new_summary = None
+    if old:
+        c_plan, c_messages = _compact_request(session["summary"], old)
+        try:
+            new_summary = extract_message_content(call_chat_with_fallback(c_messages, model=c_plan.model,
+                                                                          task=c_plan.task))
+        except Exception:
+            # the answer is already paid for; _fold keeps the turns and the next ask retries
+            logger.debug("qa_session: compaction call failed", exc_info=True)
+    turns, summary, folded = _fold(session, turns, old, new_summary)
+    flt, update, upsert = _save_ops(session, turns, summary, folded)
+    if not _indexes_ready:
+        ensure_indexes()
+    try:
+        saved = db.qa_sessions.update_one(flt, update, upsert=upsert).matched_count or upsert
+    except DuplicateKeyError:
+        saved = False
+    if not saved:
+        logger.info("qa_session: concurrent update of %s, appending turn only", session["_id"])
+        db.qa_sessions.update_one(*_append_op(session, question, answer), upsert=True)
+    return _result(session, turns, summary, answer, messages, folded)
+
+
+async def aask(adb, user_id, note_id, context: str, question: str) -> dict:
+    """ask() for the HTTP API: same prompt and storage, through the async client and driver."""
+    if not question or not question.strip():
+        return _no_question()
+    session = await adb.qa_sessions.find_one({"_id": session_key(user_id, note_id)}) or _empty(user_id, note_id)
+    plan, messages = qa_session_request(session, context, question)
+    answer = extract_message_content(await acall_chat_with_fallback(messages, model=plan.model, task=plan.task))
+
+    turns, old = _advance(session, question, answer)
+    new_summary = None
+    if old:
+        c_plan, c_messages = _compact_request(session["summary"], old)
+        try:
+            new_summary = extract_message_content(await acall_chat_with_fallback(c_messages, model=c_plan.model,
+                                                                                 task=c_plan.task))
+        except Exception:
+            logger.debug("qa_session: compaction call failed", exc_info=True)
+    turns, summary, folded = _fold(session, turns, old, new_summary)
+    flt, update, upsert = _save_ops(session, turns, summary, folded)
+    if not _indexes_ready:
+        await asyncio.to_thread(ensure_indexes)
+    try:
+        saved = (await adb.qa_sessions.update_one(flt, update, upsert=upsert)).matched_count or upsert
+    except DuplicateKeyError:
+        saved = False
+    if not saved:
+        logger.info("qa_session: concurrent update of %s, appending turn only", session["_id"])
+        await adb.qa_sessions.update_one(*_append_op(session, question, answer), upsert=True)
+    return _result(session, turns, summary, answer, messages, folded)
@@ -0,0 +1,168 @@
+# services/section_service.py
+"""
+Section-parallel processing for long documents (IEEE review / auto-format).
+
+The document is split on its own headings (utils.file_utils.segment_sections), each section
+is sent as its own prompt on a bounded thread pool, and results are cached in
+db.section_cache by a hash of (task, prompt version, model, heading, text), so re-submitting
+a revised draft only pays for the sections that changed. A cheap final pass over the
+outline (headings + short excerpts of the results) checks cross-section consistency.
+"""
+import os
+import hashlib
+import logging
+import contextvars
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+load_dotenv()
+
+from pymongo import UpdateOne
+
+from database.db import db
+from services.groq_utils import call_chat_with_fallback, extract_message_content
+from services.token_budget import estimate_tokens, plan_prompt
+from utils.file_utils import segment_sections
+
+logger = logging.getLogger(__name__)
+
+MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+MERGE_MODEL = os.getenv("SECTION_MERGE_MODEL", "llama-3.1-8b-instant")
+SECTION_WORKERS = int(os.getenv("SECTION_WORKERS", "4"))
+# documents shorter than this go through the single-prompt path
+SECTION_PARALLEL_MIN_TOKENS = int(os.getenv("SECTION_PARALLEL_MIN_TOKENS", "3000"))
+# sections are merged up to / split down to roughly this size
+SECTION_MAX_TOKENS = int(os.getenv("SECTION_MAX_TOKENS", "2500"))
+SECTION_MIN_TOKENS = int(os.getenv("SECTION_MIN_TOKENS", "150"))
+SECTION_CACHE_TTL_DAYS = float(os.getenv("SECTION_CACHE_TTL_DAYS", "30"))
+
+_pool = ThreadPoolExecutor(max_workers=SECTION_WORKERS, thread_name_prefix="sections")
+
+
+def _split_long(section: dict) -> list:
+    """Break a section over SECTION_MAX_TOKENS into paragraph-aligned parts."""
+    if estimate_tokens(section["text"]) <= SECTION_MAX_TOKENS:
+        return [section]
+    parts, current, size = [], [], 0
+    for para in section["text"].split("\n\n"):
+        n = estimate_tokens(para)
+        if current and size + n > SECTION_MAX_TOKENS:
+            parts.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(para)
+        size += n
+    if current:
+        parts.append("\n\n".join(current))
+    return [{"heading": section["heading"] if i == 0 else f"{section['heading']} (cont.)".strip(), "text": p}
+            for i, p in enumerate(parts)]
+
+
+def _fold(sections: list) -> dict:
+    """Join consecutive sections into one, keeping the inner headings as text."""
+    parts = [sections[0]["text"]] + [f"{s['heading']}\n{s['text']}".strip() for s in sections[1:]]
+    return {"heading": sections[0]["heading"], "text": "\n\n".join(p for p in parts if p)}
+
+
+def _size_sections(segments: list) -> list:
+    merged, pending = [], []
+    for s in segments:
+        pending.append(s)
+        folded = _fold(pending)
+        if estimate_tokens(folded["text"]) >= SECTION_MIN_TOKENS:
+            merged.append(folded)
+            pending = []
+    if pending:
+        merged = merged[:-1] + [_fold(merged[-1:] + pending)]
+    return [part for s in merged for part in _split_long(s)]
+
+
+def split_sections(text: str) -> list:
+    """
+    [{"heading", "text"}] sized for one prompt each: tiny sections (a lone heading, the
+    title block) are folded into the next one, oversized ones are split by paragraph.
+    """
+    return _size_sections(segment_sections(text))
+
+
+def sections_for(text: str):
+    """
+    split_sections(text) for a document long enough to go section by section (and with
+    headings to split on), else None for the single-prompt path. Segments the text once.
+    """
+    if estimate_tokens(text) < SECTION_PARALLEL_MIN_TOKENS:
+        return None
+    segments = segment_sections(text)
+    if len(segments) < 2:
+        return None
+    return _size_sections(segments)
+
+
+def _cache_key(task: str, version: str, model: str, section: dict) -> str:
+    raw = "\x1f".join([task, version, model, section["heading"], section["text"]])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+_indexes_ready = False
+
+
+def ensure_indexes() -> None:
+    global _indexes_ready
+    db.section_cache.create_index("expires_at", expireAfterSeconds=0, name="section_cache_ttl")
+    _indexes_ready = True
+
+
+def run_sections(sections: list, task: str, build_prompt, version: str = "1") -> list:
+    """
+    Run build_prompt(section, plan_text) -> prompt for every section concurrently (at most
+    SECTION_WORKERS at once) and return [{"heading", "result", "cached"}] in document order.
+    Bump `version` when the prompt changes so old cached results are not reused.
+    """
+    plans = [plan_prompt(s["text"], task, MODEL) for s in sections]
+    keys = [_cache_key(task, version, p.model, s) for s, p in zip(sections, plans)]
+    cached = {d["_id"]: d["result"] for d in db.section_cache.find({"_id": {"$in": keys}}, {"result": 1})}
+
+    def run_one(section, plan):
+        prompt = build_prompt(section, plan.text)
+        resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=plan.model, task=plan.task)
+        return extract_message_content(resp)
+
+    # each task runs in its own copy of the caller's context, so the calls are still
+    # attributed to the current user and profile (services.llm_metrics, utils.profiling)
+    futures = {i: _pool.submit(contextvars.copy_context().run, run_one, s, p)
+               for i, (s, p) in enumerate(zip(sections, plans)) if keys[i] not in cached}
+    results, fresh = [], []
+    for i, section in enumerate(sections):
+        if i in futures:
+            result = futures[i].result()
+            fresh.append(UpdateOne({"_id": keys[i]}, {"$set": {
+                "task": task, "result": result, "created_at": datetime.utcnow(),
+                "expires_at": datetime.utcnow() + timedelta(days=SECTION_CACHE_TTL_DAYS)}}, upsert=True))
+        else:
+            result = cached[keys[i]]
+        results.append({"heading": section["heading"], "result": result, "cached": i not in futures})
+    if fresh:
+        try:
+            if not _indexes_ready:
+                ensure_indexes()
+            db.section_cache.bulk_write(fresh, ordered=False)
+        except Exception as e:
+            logger.warning("section_service: could not cache %d section results: %s", len(fresh), e)
+    logger.info("section_service: task=%s %d sections, %d from cache", task, len(sections),
+                len(sections) - len(futures))
+    return results
+
+
+def consistency_pass(results: list, goal: str) -> str:
+    """Cheap final check over the outline only: heading order/numbering, missing IEEE sections, terminology."""
+    outline = "\n".join(f"- {r['heading'] or '(untitled)'}: {r['result'][:300]}" for r in results)
+    instructions = (
+        f"These are per-section results of an IEEE {goal} of one document, in document order. "
+        "List only cross-section problems: missing or misordered IEEE sections (Abstract, Introduction, "
+        "Methodology, Results, Conclusion, References), inconsistent numbering or terminology, and "
+        "contradictions between sections. Return a short bullet list, or 'No consistency issues.'\n\n"
+    )
+    # only the outline may be condensed; the instructions are reserved in full
+    plan = plan_prompt(outline, "ieee_merge", MERGE_MODEL, reserve=estimate_tokens(instructions))
+    resp = call_chat_with_fallback([{"role": "user", "content": instructions + plan.text}],
+                                   model=plan.model, task=plan.task)
+    return extract_message_content(resp)
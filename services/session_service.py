@@ -0,0 +1,127 @@
+# services/session_service.py
+import os
+import hmac
+import time
+import base64
+import hashlib
+import secrets
+import threading
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+load_dotenv()
+
+from database.db import db
+
+# Token: "<session id>.<expiry unix ts>.<HMAC-SHA256 of both>". The signature and expiry are
+# checked without touching Mongo; db.sessions (keyed by a hash of the id, so a database
+# read can't be replayed as a token) holds the profile and lets a session be revoked.
+SESSION_TTL_HOURS = float(os.getenv("SESSION_TTL_HOURS", "168"))
+# how long a process may keep using a session it has read: a revocation made by another
+# app/API process takes effect there within this many seconds (0 = read Mongo every time)
+SESSION_CACHE_SECONDS = float(os.getenv("SESSION_CACHE_SECONDS", "5"))
+# browser cookie app.py keeps the token in (never the URL)
+SESSION_COOKIE = os.getenv("SESSION_COOKIE", "notes_session")
+_secret = os.getenv("SESSION_SECRET")
+if not _secret:
+    # a per-process random key would make every other app/API process reject the tokens
+    raise RuntimeError("SESSION_SECRET is not set; add a long random value to .env")
+SESSION_SECRET = _secret.encode("utf-8")
+
+_cache_lock = threading.Lock()
+# session key -> (profile, cached_until); saves the sessions read on reruns and API calls
+_cache = {}
+_indexes_ready = False
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(SESSION_SECRET, payload.encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def _session_key(session_id: str) -> str:
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+
+
+def ensure_indexes() -> None:
+    global _indexes_ready
+    db.sessions.create_index("expires_at", expireAfterSeconds=0, name="session_ttl")
+    db.sessions.create_index("user_id", name="session_user")
+    _indexes_ready = True
+
+
+def create_session(profile: dict) -> str:
+    """Store a session for a logged-in user's public profile and return its signed token."""
+    if not _indexes_ready:
+        ensure_indexes()
+    session_id = secrets.token_urlsafe(24)
+    expires_at = datetime.utcnow() + timedelta(hours=SESSION_TTL_HOURS)
+    expiry = int(time.time() + SESSION_TTL_HOURS * 3600)
+    db.sessions.insert_one({"_id": _session_key(session_id), "user_id": profile["_id"], "profile": profile,
+                            "created_at": datetime.utcnow(), "expires_at": expires_at})
+    payload = f"{session_id}.{expiry}"
+    return f"{payload}.{_sign(payload)}"
+
+
+def _parse(token: str):
+    """Session key for a well-signed, unexpired token, else None. No database access."""
+    try:
+        session_id, expiry, signature = (token or "").split(".")
+        expiry = int(expiry)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(f"{session_id}.{expiry}")):
+        return None
+    if expiry < time.time():
+        return None
+    return _session_key(session_id)
+
+
+def resume_session(token: str):
+    """Profile for a valid token (reconnect / new tab), or None. Never runs bcrypt."""
+    key = _parse(token)
+    if key is None:
+        return None
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[1] > now:
+            return dict(hit[0])
+        _cache.pop(key, None)
+    session = db.sessions.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}}, {"profile": 1})
+    if not session:
+        return None
+    if SESSION_CACHE_SECONDS > 0:
+        with _cache_lock:
+            if len(_cache) > 10000:
+                _cache.clear()
+            _cache[key] = (session["profile"], now + SESSION_CACHE_SECONDS)
+    return dict(session["profile"])
+
+
+def revoke_session(token: str) -> None:
+    key = _parse(token)
+    if key is None:
+        return
+    with _cache_lock:
+        _cache.pop(key, None)
+    db.sessions.delete_one({"_id": key})
+
+
+def revoke_user_sessions(user_id, keep_token: str | None = None) -> int:
+    """Log the user out everywhere (optionally except the current session), e.g. after a password change."""
+    keep = _parse(keep_token) if keep_token else None
+    flt = {"user_id": user_id}
+    if keep:
+        flt["_id"] = {"$ne": keep}
+    with _cache_lock:
+        for key in [k for k, (profile, _) in _cache.items() if profile.get("_id") == user_id and k != keep]:
+            del _cache[key]
+    return db.sessions.delete_many(flt).deleted_count
+
+
+def update_session_profiles(user_id, fields: dict) -> None:
+    """Keep stored profiles in step after a profile edit."""
+    db.sessions.update_many({"user_id": user_id}, {"$set": {f"profile.{k}": v for k, v in fields.items()}})
+    with _cache_lock:
+        for key in [k for k, (profile, _) in _cache.items() if profile.get("_id") == user_id]:
+            del _cache[key]
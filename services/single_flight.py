@@ -0,0 +1,108 @@
+# services/single_flight.py
+"""
+Single-flight de-duplication of identical concurrent work (not a cache: a key is only
+shared while its call is in flight, and forgotten as soon as it finishes).
+
+    resp = do(key, lambda: client.chat.completions.create(...))          # threads
+    resp = await ado(key, lambda: async_client.chat.completions.create(...))  # asyncio
+
+The first caller for a key runs the work; callers arriving with the same key before it
+finishes wait and receive the same result (or exception). Threads and coroutines share
+one table, so a Streamlit rerun and an API request for the same prompt are coalesced too.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+
+_lock = threading.Lock()
+# key -> (Future, loop of an async leader or None)
+_in_flight = {}
+_stats = {"leaders": 0, "coalesced": 0}
+_tasks = set()  # strong refs to shared async calls until they finish
+
+
+def make_key(*parts) -> str:
+    """Stable hash of JSON-serializable request parts (model, messages, options)."""
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _join(key, loop=None):
+    """Returns (future, is_leader)."""
+    with _lock:
+        entry = _in_flight.get(key)
+        if entry is not None:
+            _stats["coalesced"] += 1
+            return entry[0], False
+        fut = Future()
+        _in_flight[key] = (fut, loop)
+        _stats["leaders"] += 1
+        return fut, True
+
+
+def _finish(key, fut, result=None, exc=None):
+    with _lock:
+        _in_flight.pop(key, None)
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def do(key: str, fn):
+    """
+    Run fn() once for concurrent callers with the same key. Returns (result, coalesced).
+    A blocking call made on an event loop thread never waits for a leader running on that
+    same loop (it would deadlock); it runs fn() itself instead.
+    """
+    with _lock:
+        entry = _in_flight.get(key)
+    if entry is not None and entry[1] is not None and entry[1] is _running_loop():
+        return fn(), False
+    fut, leader = _join(key)
+    if not leader:
+        return fut.result(), True
+    try:
+        result = fn()
+    except BaseException as e:
+        _finish(key, fut, exc=e)
+        raise
+    _finish(key, fut, result)
+    return result, False
+
+
+async def ado(key: str, coro_fn):
+    """
+    Async twin of do(): coro_fn() is awaited once for concurrent callers with the same key.
+    The shared call runs as its own task, so a caller that is cancelled (e.g. a request
+    timeout) stops waiting without cancelling it for the others.
+    """
+    fut, leader = _join(key, _running_loop())
+    if leader:
+        task = asyncio.ensure_future(coro_fn())
+        _tasks.add(task)
+
+        def done(t):
+            _tasks.discard(t)
+            if t.cancelled():
+                _finish(key, fut, exc=asyncio.CancelledError())
+            elif t.exception() is not None:
+                _finish(key, fut, exc=t.exception())
+            else:
+                _finish(key, fut, t.result())
+        task.add_done_callback(done)
+    return await asyncio.shield(asyncio.wrap_future(fut)), not leader
+
+
+def stats() -> dict:
+    with _lock:
+        return dict(_stats, in_flight=len(_in_flight))
@@ -0,0 +1,94 @@
+# services/stats_service.py
+from datetime import datetime
+from pymongo import UpdateOne
+
+from database.db import db
+
+# user_stats document (one per user, _id = user_id):
+#   {"notes": int, "queries": int, "recent": [{"type", "desc", "created_at"}, ...], "updated_at": datetime,
+#    "reconciled": True once the counters have been rebuilt from notes/queries}
+# The write paths only $inc/$push, so a user whose first counted write came before any
+# reconcile (e.g. an account older than the counters) has a partial document until then.
+RECENT_ACTIVITY_LIMIT = 8
+
+
+def _activity_summary(record: dict) -> dict:
+    desc = record.get("question") or record.get("note_type") or record.get("type") or ""
+    return {"type": record.get("type", "action"), "desc": desc[:120], "created_at": record.get("created_at")}
+
+
+def record_notes_added(user_id, n: int = 1) -> None:
+    db.user_stats.update_one({"_id": user_id}, {"$inc": {"notes": n}, "$set": {"updated_at": datetime.utcnow()}},
+                             upsert=True)
+
+
+def record_notes_deleted(user_id, n: int = 1) -> None:
+    if n:
+        record_notes_added(user_id, -n)
+
+
+def record_queries_removed(user_id, n: int) -> None:
+    if n:
+        db.user_stats.update_one({"_id": user_id}, {"$inc": {"queries": -n}})
+
+
+def record_activity(records: list) -> None:
+    """Count a batch of logged activity records and push them onto each user's bounded recent list."""
+    by_user = {}
+    for r in records:
+        by_user.setdefault(r.get("user_id"), []).append(r)
+    ops = []
+    for user_id, recs in by_user.items():
+        if user_id is None:
+            continue
+        recs.sort(key=lambda r: r.get("created_at") or datetime.min)
+        ops.append(UpdateOne(
+            {"_id": user_id},
+            {"$inc": {"queries": len(recs)},
+             "$push": {"recent": {"$each": [_activity_summary(r) for r in recs], "$slice": -RECENT_ACTIVITY_LIMIT}},
+             "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True,
+        ))
+    if ops:
+        db.user_stats.bulk_write(ops, ordered=False)
+
+
+def get_user_stats(user_id) -> dict:
+    """
+    O(1) read of the materialized counters; recent activity is returned newest first. A
+    document that was never reconciled (missing, or only holding increments) is rebuilt once.
+    """
+    stats = db.user_stats.find_one({"_id": user_id})
+    if not (stats or {}).get("reconciled"):
+        reconcile_user_stats(user_id)
+        stats = db.user_stats.find_one({"_id": user_id}) or {}
+    return {"notes": max(stats.get("notes", 0), 0), "queries": max(stats.get("queries", 0), 0),
+            "recent": list(reversed(stats.get("recent", [])))}
+
+
+def delete_user_stats(user_id) -> None:
+    db.user_stats.delete_one({"_id": user_id})
+
+
+def reconcile_user_stats(user_id=None) -> int:
+    """Recompute counters and recent activity from notes/queries to repair drift. Returns users fixed."""
+    if user_id is not None:
+        users = [user_id]
+    else:
+        users = set(db.notes.distinct("user_id")) | set(db.queries.distinct("user_id")) | set(db.user_stats.distinct("_id"))
+    repaired = 0
+    for uid in users:
+        recent = list(db.queries.find({"user_id": uid}, {"question": 1, "note_type": 1, "type": 1, "created_at": 1})
+                      .sort("created_at", -1).limit(RECENT_ACTIVITY_LIMIT))
+        fresh = {
+            "notes": db.notes.count_documents({"user_id": uid}),
+            "queries": db.queries.count_documents({"user_id": uid}),
+            "recent": [_activity_summary(r) for r in reversed(recent)],
+        }
+        current = db.user_stats.find_one({"_id": uid}) or {}
+        drifted = any(current.get(k) != v for k, v in fresh.items())
+        if drifted or not current.get("reconciled"):
+            db.user_stats.update_one({"_id": uid}, {"$set": dict(fresh, reconciled=True, updated_at=datetime.utcnow())},
+                                     upsert=True)
+            repaired += drifted
+    return repaired
@@ -1,12 +1,41 @@
 # services/study_service.py
 import os
 import re
+import json
+import logging
+import contextvars
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 
+from database.db import db
+from models.note_model import note_content_hash
 from services.groq_utils import call_chat_with_fallback, extract_message_content
+from services.token_budget import plan_prompt
+
+logger = logging.getLogger(__name__)
 
 MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+STUDY_PRECOMPUTE_WORKERS = int(os.getenv("STUDY_PRECOMPUTE_WORKERS", "2"))
+DEFAULT_NUM_CARDS = 8
+DEFAULT_NUM_QUESTIONS = 8
+
+_executor = ThreadPoolExecutor(max_workers=STUDY_PRECOMPUTE_WORKERS, thread_name_prefix="study-precompute")
+
+
+def _parse_json_array(raw: str):
+    """Return the first JSON array in the model output (code fences allowed), or None."""
+    if not raw:
+        return None
+    start, end = raw.find("["), raw.rfind("]")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(raw[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, list) else None
 
 
 def _parse_flashcards_from_text(raw: str):
@@ -39,29 +68,138 @@ def _parse_flashcards_from_text(raw: str):
     return qa
 
 
-def generate_flashcards(text: str, num_cards: int = 5):
+def _flashcards(text: str, num_cards: int):
+    """(cards, parsed): parsed is False for the error and raw-text fallbacks, which are never cached."""
     if not text.strip():
-        return [{"error": "Empty text provided"}]
+        return [{"error": "Empty text provided"}], False
+    plan = plan_prompt(text, "flashcards", MODEL)
     prompt = (
         f"Create {num_cards} concise flashcards (question and short answer pairs) "
-        f"from the academic text below. Number them.\n\n{text}"
+        f"from the academic text below. Respond with only a JSON array of objects with "
+        f'"question" and "answer" keys.\n\n{plan.text}'
     )
-    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=MODEL)
+    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=plan.model, task=plan.task)
     raw = extract_message_content(resp)
-    qa = _parse_flashcards_from_text(raw)
+    data = _parse_json_array(raw)
+    if data:
+        qa = [{"question": str(c["question"]).strip(), "answer": str(c["answer"]).strip()}
+              for c in data if isinstance(c, dict) and c.get("question") and c.get("answer")]
+    else:
+        # model ignored the JSON instruction: fall back to the Q:/A: text parser
+        qa = _parse_flashcards_from_text(raw)
     if qa:
-        return qa[:num_cards]
-    return [{"question": "Main idea", "answer": raw.strip()}] if raw else [{"error": "Could not generate flashcards"}]
+        return qa[:num_cards], True
+    if raw:
+        return [{"question": "Main idea", "answer": raw.strip()}], False
+    return [{"error": "Could not generate flashcards"}], False
 
 
-def generate_practice_questions(text: str, num_questions: int = 5):
+def generate_flashcards(text: str, num_cards: int = 5):
+    return _flashcards(text, num_cards)[0]
+
+
+def _practice_questions(text: str, num_questions: int):
+    """(questions, parsed), as _flashcards."""
     if not text.strip():
-        return ["Error: Empty text provided"]
+        return ["Error: Empty text provided"], False
+    plan = plan_prompt(text, "practice_questions", MODEL)
     prompt = (
         f"Generate {num_questions} open-ended practice questions based on the following academic text. "
-        f"Do not include answers.\n\n{text}"
+        f"Do not include answers. Respond with only a JSON array of question strings.\n\n{plan.text}"
     )
-    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=MODEL)
+    resp = call_chat_with_fallback([{"role": "user", "content": prompt}], model=plan.model, task=plan.task)
     raw = extract_message_content(resp)
-    lines = [re.sub(r'^\d+[\).\s-]*', '', l).strip() for l in raw.splitlines() if l.strip()]
-    return lines[:num_questions] if lines else [raw]
+    data = _parse_json_array(raw)
+    if data:
+        lines = [str(q).strip() for q in data if str(q).strip()]
+    else:
+        lines = [re.sub(r'^\d+[\).\s-]*', '', l).strip() for l in raw.splitlines() if l.strip()]
+    lines = [l for l in lines if l]
+    return (lines[:num_questions], True) if lines else ([raw], False)
+
+
+def generate_practice_questions(text: str, num_questions: int = 5):
+    return _practice_questions(text, num_questions)[0]
+
+
+def get_cached_study_artifacts(note: dict, num_cards: int = DEFAULT_NUM_CARDS,
+                               num_questions: int = DEFAULT_NUM_QUESTIONS) -> dict:
+    """
+    Flashcards/practice questions stored on the note for its current content, or None per kind.
+    Artifacts generated for an older version of the content are ignored.
+    """
+    study = note.get("study") or {}
+    current = note.get("content_hash") or note_content_hash(note.get("content", ""))
+    if study.get("hash") != current:
+        return {"flashcards": None, "practice_questions": None}
+    return {"flashcards": (study.get("flashcards") or {}).get(str(num_cards)),
+            "practice_questions": (study.get("practice_questions") or {}).get(str(num_questions))}
+
+
+def _store(note: dict, kind: str, count: int, items) -> None:
+    h = note.get("content_hash") or note_content_hash(note.get("content", ""))
+    existing = note.get("study") or {}
+    if existing.get("hash") != h:
+        # first artifact for this content version replaces everything cached for the old one
+        db.notes.update_one({"_id": note["_id"]}, {"$set": {
+            "content_hash": h,
+            "study": {"hash": h, kind: {str(count): items}, "generated_at": datetime.utcnow()},
+        }})
+    else:
+        db.notes.update_one({"_id": note["_id"], "study.hash": h},
+                            {"$set": {f"study.{kind}.{count}": items, "study.generated_at": datetime.utcnow()}})
+
+
+def get_or_generate_flashcards(note: dict, num_cards: int = DEFAULT_NUM_CARDS, regenerate: bool = False):
+    """
+    Cached flashcards for the note, else generated ones; only properly parsed cards are stored.
+    `regenerate` skips the cache (and replaces it when the new cards parse).
+    """
+    cached = None if regenerate else get_cached_study_artifacts(note, num_cards=num_cards)["flashcards"]
+    if cached:
+        return cached
+    cards, parsed = _flashcards(note["content"], num_cards)
+    if parsed:
+        _store(note, "flashcards", num_cards, cards)
+    return cards
+
+
+def get_or_generate_practice_questions(note: dict, num_questions: int = DEFAULT_NUM_QUESTIONS,
+                                       regenerate: bool = False):
+    """As get_or_generate_flashcards, for practice questions."""
+    cached = None if regenerate else get_cached_study_artifacts(note, num_questions=num_questions)["practice_questions"]
+    if cached:
+        return cached
+    qs, parsed = _practice_questions(note["content"], num_questions)
+    if parsed:
+        _store(note, "practice_questions", num_questions, qs)
+    return qs
+
+
+def precompute_study_artifacts(note_id, num_cards: int = DEFAULT_NUM_CARDS,
+                               num_questions: int = DEFAULT_NUM_QUESTIONS) -> None:
+    note = db.notes.find_one({"_id": note_id})
+    if not note or not (note.get("content") or "").strip():
+        return
+    get_or_generate_flashcards(note, num_cards)
+    note = db.notes.find_one({"_id": note_id})
+    get_or_generate_practice_questions(note, num_questions)
+
+
+def schedule_study_precompute(note_id, num_cards: int = DEFAULT_NUM_CARDS,
+                              num_questions: int = DEFAULT_NUM_QUESTIONS):
+    """
+    Generate and store study artifacts in the background after an upload. The work runs in
+    a copy of the caller's context, so its LLM calls are attributed to the uploading user.
+    """
+    def run():
+        try:
+            precompute_study_artifacts(note_id, num_cards, num_questions)
+        except Exception:
+            logger.exception("study precompute failed for note %s", note_id)
+    return _executor.submit(contextvars.copy_context().run, run)
+
+
+def invalidate_study_artifacts(note_id) -> None:
+    """Call after changing a note's content outside create_note()."""
+    db.notes.update_one({"_id": note_id}, {"$unset": {"study": "", "content_hash": ""}})
@@ -1,22 +1,204 @@
 # services/tag_service.py
-from pymongo import MongoClient
-import os
-from dotenv import load_dotenv
-from typing import List
+import re
+from typing import List, Iterable
+from bson import ObjectId
+from pymongo import UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
 
-load_dotenv()
-MONGODB_URI = os.getenv("MONGODB_URI")
-DB_NAME = "research_notes"
+from database.db import db
 
-client = MongoClient(MONGODB_URI)
-db = client[DB_NAME]
+# tag_facets document (one per user and tag): {"user_id", "tag", "count"}
+# Counts are kept in step with notes.tags by every function here that changes tags, so the
+# tag list and autocomplete never scan notes. rebuild_tag_facets() repairs drift.
+SUGGEST_LIMIT = 10
 
 
-def add_tags_to_note(note_id, tags: List[str]):
-    """Attach tags to a note"""
-    db.notes.update_one({"_id": note_id}, {"$set": {"tags": tags}})
+def as_user_id(user_id):
+    """Notes store the users' ObjectId; accept its string form too (API, query params)."""
+    if isinstance(user_id, str) and ObjectId.is_valid(user_id):
+        return ObjectId(user_id)
+    return user_id
 
 
-def get_notes_by_tag(user_id: str, tag: str):
+def normalize_tag(tag: str) -> str:
+    return re.sub(r"\s+", " ", (tag or "").strip()).lower()
+
+
+def normalize_tags(tags: Iterable[str]) -> List[str]:
+    """Normalized, de-duplicated tags in their original order."""
+    seen = []
+    for t in tags or []:
+        t = normalize_tag(t)
+        if t and t not in seen:
+            seen.append(t)
+    return seen
+
+
+def _write_facets(ops: list) -> None:
+    try:
+        db.tag_facets.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # two first uses of a tag raced on the unique (user_id, tag) upsert; the losing
+        # upserts are retried once and now match the winner's document
+        errors = e.details.get("writeErrors", [])
+        if not errors or any(err.get("code") != 11000 for err in errors):
+            raise
+        db.tag_facets.bulk_write([ops[err["index"]] for err in errors], ordered=False)
+
+
+def _bump_facets(user_id, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+    ops = [UpdateOne({"user_id": user_id, "tag": t}, {"$inc": {"count": 1}}, upsert=True) for t in added]
+    ops += [UpdateOne({"user_id": user_id, "tag": t}, {"$inc": {"count": -1}}) for t in removed]
+    if ops:
+        _write_facets(ops)
+    if removed:
+        db.tag_facets.delete_many({"user_id": user_id, "tag": {"$in": list(removed)}, "count": {"$lte": 0}})
+
+
+def set_note_tags(note_id, user_id, tags: List[str]) -> List[str]:
+    """Replace the note's tags (the edit box in View Notes); facet counts move by the difference."""
+    user_id = as_user_id(user_id)
+    tags = normalize_tags(tags)
+    note = db.notes.find_one_and_update({"_id": note_id, "user_id": user_id}, {"$set": {"tags": tags}},
+                                        projection={"tags": 1})
+    if note is None:
+        return []
+    old = normalize_tags(note.get("tags", []))
+    _bump_facets(user_id, [t for t in tags if t not in old], [t for t in old if t not in tags])
+    return tags
+
+
+def add_tags_to_note(note_id, tags: List[str], user_id=None) -> List[str]:
+    """Attach tags to a note, keeping the ones it already has. Returns the tags that were new."""
+    tags = normalize_tags(tags)
+    flt = {"_id": note_id}
+    if user_id is not None:
+        flt["user_id"] = as_user_id(user_id)
+    note = db.notes.find_one_and_update(flt, {"$addToSet": {"tags": {"$each": tags}}},
+                                        projection={"tags": 1, "user_id": 1})
+    if note is None:
+        return []
+    added = [t for t in tags if t not in note.get("tags", [])]
+    _bump_facets(note.get("user_id"), added)
+    return added
+
+
+def remove_tags_from_note(note_id, tags: List[str], user_id=None) -> List[str]:
+    tags = normalize_tags(tags)
+    flt = {"_id": note_id}
+    if user_id is not None:
+        flt["user_id"] = as_user_id(user_id)
+    note = db.notes.find_one_and_update(flt, {"$pull": {"tags": {"$in": tags}}},
+                                        projection={"tags": 1, "user_id": 1})
+    if note is None:
+        return []
+    removed = [t for t in tags if t in note.get("tags", [])]
+    _bump_facets(note.get("user_id"), removed=removed)
+    return removed
+
+
+def record_note_tags_deleted(user_id, tags: List[str]) -> None:
+    """Call after deleting a note so its tags stop being counted."""
+    _bump_facets(as_user_id(user_id), removed=normalize_tags(tags))
+
+
+def delete_user_tags(user_id) -> None:
+    db.tag_facets.delete_many({"user_id": as_user_id(user_id)})
+
+
+def get_tag_facets(user_id, limit: int = 0) -> List[dict]:
+    """[{"tag", "count"}] most used first."""
+    cursor = db.tag_facets.find({"user_id": as_user_id(user_id), "count": {"$gt": 0}}, {"_id": 0, "tag": 1, "count": 1})
+    cursor = cursor.sort([("count", DESCENDING), ("tag", ASCENDING)])
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+
+def suggest_tags(user_id, prefix: str, limit: int = SUGGEST_LIMIT) -> List[dict]:
+    """Prefix autocomplete over the user's tags; the anchored regex is served by the (user_id, tag) index."""
+    prefix = normalize_tag(prefix)
+    flt = {"user_id": as_user_id(user_id), "count": {"$gt": 0}}
+    if prefix:
+        flt["tag"] = {"$regex": "^" + re.escape(prefix)}
+    return list(db.tag_facets.find(flt, {"_id": 0, "tag": 1, "count": 1})
+                .sort([("count", DESCENDING), ("tag", ASCENDING)]).limit(limit))
+
+
+def tag_query(user_id, all_of: List[str] = (), any_of: List[str] = (), none_of: List[str] = ()) -> dict:
+    """Mongo filter for notes having every tag in all_of, at least one of any_of and none of none_of."""
+    tags = {}
+    if all_of:
+        tags["$all"] = normalize_tags(all_of)
+    if any_of:
+        tags["$in"] = normalize_tags(any_of)
+    if none_of:
+        tags["$nin"] = normalize_tags(none_of)
+    flt = {"user_id": as_user_id(user_id)}
+    if tags:
+        flt["tags"] = tags
+    return flt
+
+
+def parse_tag_query(query: str) -> dict:
+    """
+    "ml nlp -draft" -> all_of ml, nlp; none_of draft. "ml OR nlp" / "ml | nlp" -> any_of.
+    Terms are separated by commas or spaces; use quotes for tags containing spaces.
+    """
+    all_of, any_of, none_of = [], [], []
+    terms = [a or b for a, b in re.findall(r'"([^"]+)"|([^\s,]+)', query or "")]
+    or_mode = any(t.upper() == "OR" or t == "|" for t in terms)
+    for t in terms:
+        if t.upper() in ("AND", "OR") or t == "|":
+            continue
+        if t.upper().startswith("NOT:") or t.startswith("-"):
+            none_of.append(t[4:] if t.upper().startswith("NOT:") else t[1:])
+        elif or_mode:
+            any_of.append(t)
+        else:
+            all_of.append(t)
+    return {"all_of": all_of, "any_of": any_of, "none_of": none_of}
+
+
+def find_notes_by_tags(user_id, all_of: List[str] = (), any_of: List[str] = (), none_of: List[str] = (),
+                       projection=None, limit: int = 0) -> List[dict]:
+    cursor = db.notes.find(tag_query(user_id, all_of, any_of, none_of), projection).sort("created_at", DESCENDING)
+    if limit:
+        cursor = cursor.limit(limit)
+    return list(cursor)
+
+
+def get_notes_by_tag(user_id, tag: str):
     """Fetch notes that contain a specific tag"""
-    return list(db.notes.find({"user_id": user_id, "tags": {"$in": [tag]}}))
+    return find_notes_by_tags(user_id, all_of=[tag])
+
+
+def ensure_indexes() -> None:
+    # multikey: one index entry per tag, so $all/$in/$nin on tags stay index-bounded per user
+    db.notes.create_index([("user_id", ASCENDING), ("tags", ASCENDING)], name="user_tags")
+    db.tag_facets.create_index([("user_id", ASCENDING), ("tag", ASCENDING)], unique=True, name="user_tag")
+    db.tag_facets.create_index([("user_id", ASCENDING), ("count", DESCENDING)], name="user_tag_count")
+
+
+def rebuild_tag_facets(user_id=None) -> int:
+    """
+    Recount facets from notes (repair, or first run on existing data); note tags are
+    normalized on the way. Notes keep the user_id type they were stored with; facets are
+    keyed by as_user_id(). Returns the number of facets written.
+    """
+    match = {"tags.0": {"$exists": True}}
+    if user_id is not None:
+        uid = as_user_id(user_id)
+        match["user_id"] = {"$in": [uid, str(uid)]} if isinstance(uid, ObjectId) else uid
+    counts = {}
+    for note in db.notes.find(match, {"user_id": 1, "tags": 1}):
+        tags = normalize_tags(note.get("tags", []))
+        if tags != note.get("tags"):
+            db.notes.update_one({"_id": note["_id"]}, {"$set": {"tags": tags}})
+        for t in tags:
+            key = (as_user_id(note["user_id"]), t)
+            counts[key] = counts.get(key, 0) + 1
+    db.tag_facets.delete_many({"user_id": as_user_id(user_id)} if user_id is not None else {})
+    if counts:
+        db.tag_facets.insert_many([{"user_id": u, "tag": t, "count": n} for (u, t), n in counts.items()])
+    return len(counts)
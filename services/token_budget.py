@@ -0,0 +1,174 @@
+# services/token_budget.py
+import os
+import re
+import logging
+from dataclasses import dataclass
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+
+# Context window (tokens) and price per million tokens (USD) for the models we route between.
+# Both share Groq's 128K window, so routing is by task class and cost, not by size.
+# GROQ_MAX_REQUEST_TOKENS caps every model, e.g. to stay inside a free-tier tokens-per-minute limit.
+MODEL_REGISTRY = {
+    "llama-3.3-70b-versatile": {"context_window": 131072, "input_cost": 0.59, "output_cost": 0.79},
+    "llama-3.1-8b-instant": {"context_window": 131072, "input_cost": 0.05, "output_cost": 0.08},
+}
+
+# Tokens reserved for the answer, and whether the task may be routed to another model.
+# With GROQ_ROUTE_LIGHT_TASKS=1, "light" tasks run on the cheapest registered model that fits;
+# by default (and always for "heavy" tasks) the requested model is used and the text condensed.
+ROUTE_LIGHT_TASKS = os.getenv("GROQ_ROUTE_LIGHT_TASKS", "0").strip().lower() in ("1", "true", "yes", "on")
+TASKS = {
+    "summary": {"output_tokens": 512, "class": "light"},
+    "qa": {"output_tokens": 512, "class": "light"},
+    "flashcards": {"output_tokens": 1024, "class": "light"},
+    "practice_questions": {"output_tokens": 768, "class": "light"},
+    "grammar": {"output_tokens": 1024, "class": "heavy"},
+    "ieee_review": {"output_tokens": 1536, "class": "heavy"},
+    "ieee_format": {"output_tokens": 4096, "class": "heavy"},
+    "writing": {"output_tokens": 1536, "class": "heavy"},
+    "ieee_merge": {"output_tokens": 512, "class": "light"},
+    "qa_compact": {"output_tokens": 384, "class": "light"},
+}
+DEFAULT_TASK = {"output_tokens": 1024, "class": "heavy"}
+
+# Instructions wrapped around the user's text by the prompt builders.
+PROMPT_OVERHEAD_TOKENS = 256
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap local token estimate (no tokenizer download).
+    Takes the larger of the chars/4 rule and ~1.3 tokens per word/punctuation mark,
+    which keeps code, tables and non-English text from being under-counted.
+    """
+    if not text:
+        return 0
+    by_chars = len(text) / CHARS_PER_TOKEN
+    by_words = len(_WORD_RE.findall(text)) * 1.3
+    return int(max(by_chars, by_words)) + 1
+
+
+def estimate_messages_tokens(messages) -> int:
+    # ~4 tokens of chat framing per message
+    return sum(estimate_tokens(m.get("content") or "") + 4 for m in messages)
+
+
+def get_model_info(model: str) -> dict:
+    info = dict(MODEL_REGISTRY.get(model, {"context_window": 8192, "input_cost": 0.0, "output_cost": 0.0}))
+    cap = os.getenv("GROQ_MAX_REQUEST_TOKENS")
+    if cap:
+        info["context_window"] = min(info["context_window"], int(cap))
+    return info
+
+
+def input_budget(model: str, task: str, reserve: int = 0) -> int:
+    """Tokens available for the source text once output, instructions and `reserve` are set aside."""
+    out = TASKS.get(task, DEFAULT_TASK)["output_tokens"]
+    return get_model_info(model)["context_window"] - out - PROMPT_OVERHEAD_TOKENS - reserve
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    info = get_model_info(model)
+    return (input_tokens * info["input_cost"] + output_tokens * info["output_cost"]) / 1_000_000
+
+
+def condense_text(text: str, max_tokens: int) -> str:
+    """
+    Shrink text to roughly max_tokens by keeping whole paragraphs from the start (~70%)
+    and the end (~30%) of the document, where abstracts/introductions and conclusions live.
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    paragraphs = [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+    head_budget = int(max_tokens * 0.7)
+    tail_budget = max_tokens - head_budget
+
+    head, used = [], 0
+    for p in paragraphs:
+        t = estimate_tokens(p)
+        if used + t > head_budget:
+            break
+        head.append(p)
+        used += t
+    tail, used = [], 0
+    for p in reversed(paragraphs[len(head):]):
+        t = estimate_tokens(p)
+        if used + t > tail_budget:
+            break
+        tail.insert(0, p)
+        used += t
+
+    if not head and not tail:
+        # one huge paragraph (typical of raw PDF text): fall back to characters
+        tokens_per_char = estimate_tokens(text) / len(text)
+        chars = int(max_tokens / tokens_per_char)
+        if chars <= 128:
+            # too small for a head, the marker and a tail
+            return text[:chars]
+        chars -= 64  # the marker
+        head_chars = int(chars * 0.7)
+        return f"{text[:head_chars]}\n\n[... truncated ...]\n\n{text[len(text) - (chars - head_chars):]}"
+    omitted = len(paragraphs) - len(head) - len(tail)
+    return "\n\n".join(head + [f"[... {omitted} paragraphs omitted ...]"] + tail)
+
+
+@dataclass
+class PromptPlan:
+    model: str
+    text: str
+    task: str
+    input_tokens: int
+    action: str  # "direct", "routed" or "condensed"
+
+
+def plan_prompt(text: str, task: str, model: str | None = None, reserve: int = 0) -> PromptPlan:
+    """
+    Pick the model for a request and make the source text fit its context window.
+    With GROQ_ROUTE_LIGHT_TASKS=1, light tasks go to the cheapest registered model whose
+    window fits; otherwise (and for heavy tasks) the requested model is used. Text that
+    fits no candidate is condensed for the first one.
+    """
+    preferred = model or DEFAULT_MODEL
+    tokens = estimate_tokens(text)
+    task_class = TASKS.get(task, DEFAULT_TASK)["class"]
+
+    candidates = [preferred]
+    if task_class == "light" and ROUTE_LIGHT_TASKS:
+        candidates = sorted(MODEL_REGISTRY, key=lambda m: get_model_info(m)["input_cost"])
+        if preferred not in MODEL_REGISTRY:
+            candidates.append(preferred)
+
+    for m in candidates:
+        if tokens <= input_budget(m, task, reserve):
+            action = "direct" if m == preferred else "routed"
+            if action == "routed":
+                logger.info("token_budget: task=%s routed %s -> %s (%d tokens)", task, preferred, m, tokens)
+            return PromptPlan(m, text, task, tokens, action)
+
+    target = candidates[0]
+    condensed = condense_text(text, input_budget(target, task, reserve))
+    new_tokens = estimate_tokens(condensed)
+    logger.info("token_budget: task=%s condensed %d -> %d tokens for %s", task, tokens, new_tokens, target)
+    return PromptPlan(target, condensed, task, new_tokens, "condensed")
+
+
+def log_usage(task: str | None, model: str, predicted_tokens: int, resp) -> None:
+    """Log predicted vs. actual prompt tokens (from resp.usage when the API returns it)."""
+    usage = getattr(resp, "usage", None)
+    actual_in = getattr(usage, "prompt_tokens", None) if usage is not None else None
+    actual_out = getattr(usage, "completion_tokens", None) if usage is not None else None
+    cost = estimate_cost(model, actual_in or predicted_tokens, actual_out or 0)
+    logger.info(
+        "llm_usage task=%s model=%s predicted_in=%d actual_in=%s actual_out=%s est_cost_usd=%.6f",
+        task or "-", model, predicted_tokens, actual_in, actual_out, cost,
+    )
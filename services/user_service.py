@@ -1,18 +1,74 @@
+import os
+import re
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from database.db import db
 from datetime import datetime
+from dotenv import load_dotenv
+load_dotenv()
+
+# bcrypt cost factor for new hashes; stored hashes below it are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so hashing on these workers doesn't stall other sessions;
+# the pool size also caps how many cores concurrent logins can occupy
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))
+
+_bcrypt_pool = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_dummy_hash = None
+
+PROFILE_FIELDS = ("name", "email", "created_at")
+
+
+def public_profile(user: dict) -> dict:
+    """The user fields the app keeps in session state and sessions; never the password hash."""
+    return {"_id": user["_id"], **{k: user.get(k) for k in PROFILE_FIELDS}}
+
+
+def _rounds(hashed: bytes) -> int:
+    m = re.match(rb"\$2[abxy]?\$(\d+)\$", hashed)
+    return int(m.group(1)) if m else 0
+
+
+def hash_password(password: str, rounds: int | None = None) -> bytes:
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+    return _bcrypt_pool.submit(bcrypt.hashpw, password.encode("utf-8"), salt).result()
+
+
+def verify_password(password: str, hashed: bytes) -> bool:
+    return _bcrypt_pool.submit(bcrypt.checkpw, password.encode("utf-8"), hashed).result()
+
 
 def register_user(name, email, password):
     users = db.users
-    if users.find_one({"email": email}):
+    if users.find_one({"email": email}, {"_id": 1}):
         return False, "User already exists"
-    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+    hashed = hash_password(password)
     user = {"name": name, "email": email, "password": hashed, "created_at": datetime.utcnow()}
     users.insert_one(user)
     return True, "Registration successful"
 
+
 def login_user(email, password):
-    user = db.users.find_one({"email": email})
-    if user and bcrypt.checkpw(password.encode("utf-8"), user["password"]):
-        return True, user
-    return False, "Invalid email or password"
+    """Returns (True, public_profile) or (False, message). Verification runs on the bcrypt pool."""
+    global _dummy_hash
+    user = db.users.find_one({"email": email}, {"password": 1, **{k: 1 for k in PROFILE_FIELDS}})
+    if not user:
+        # same bcrypt cost as a real check, so response time doesn't reveal which emails exist
+        if _dummy_hash is None:
+            _dummy_hash = hash_password("dummy-password")
+        verify_password(password, _dummy_hash)
+        return False, "Invalid email or password"
+    if not verify_password(password, user["password"]):
+        return False, "Invalid email or password"
+    if _rounds(user["password"]) < BCRYPT_ROUNDS:
+        db.users.update_one({"_id": user["_id"]}, {"$set": {"password": hash_password(password)}})
+    return True, public_profile(user)
+
+
+def update_profile(user_id, name, email, new_password=None) -> dict:
+    """Update name/email (and the password when given); returns the changed profile fields."""
+    update_data = {"name": name, "email": email}
+    if new_password:
+        update_data["password"] = hash_password(new_password)
+    db.users.update_one({"_id": user_id}, {"$set": update_data})
+    return {"name": name, "email": email}
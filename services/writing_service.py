@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from services.groq_utils import call_chat_with_fallback, extract_message_content
+from services.token_budget import plan_prompt, estimate_tokens
 
 MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
 
@@ -27,48 +28,38 @@ def _build_section_prompt(section: str, text: str, requirements: str | None = No
     )
 
 
-def generate_abstract(text: str, max_words: int = 200, requirements: str | None = None) -> str:
-    if not text.strip():
-        return "Error: No source text provided for abstract generation."
-    req = (requirements + f" Limit to approximately {max_words} words.") if requirements else f"Limit to approximately {max_words} words."
-    prompt = _build_section_prompt("Abstract", text, req)
+def _call_section(section: str, text: str, requirements: str | None = None) -> str:
+    plan = plan_prompt(text, "writing", MODEL, reserve=estimate_tokens(SYSTEM_IEEE + (requirements or "")))
+    prompt = _build_section_prompt(section, plan.text, requirements)
     resp = call_chat_with_fallback(
         [{"role": "system", "content": SYSTEM_IEEE}, {"role": "user", "content": prompt}],
-        model=MODEL
+        model=plan.model, task=plan.task
     )
     return extract_message_content(resp)
 
 
+def generate_abstract(text: str, max_words: int = 200, requirements: str | None = None) -> str:
+    if not text.strip():
+        return "Error: No source text provided for abstract generation."
+    req = (requirements + f" Limit to approximately {max_words} words.") if requirements else f"Limit to approximately {max_words} words."
+    return _call_section("Abstract", text, req)
+
+
 def generate_introduction(text: str, max_paragraphs: int = 3, requirements: str | None = None) -> str:
     if not text.strip():
         return "Error: No source text provided for introduction generation."
     req = (requirements + f" Use up to {max_paragraphs} paragraphs.") if requirements else f"Use up to {max_paragraphs} paragraphs."
-    prompt = _build_section_prompt("Introduction", text, req)
-    resp = call_chat_with_fallback(
-        [{"role": "system", "content": SYSTEM_IEEE}, {"role": "user", "content": prompt}],
-        model=MODEL
-    )
-    return extract_message_content(resp)
+    return _call_section("Introduction", text, req)
 
 
 def generate_conclusion(text: str, max_sentences: int = 6, requirements: str | None = None) -> str:
     if not text.strip():
         return "Error: No source text provided for conclusion generation."
     req = (requirements + f" Keep it within {max_sentences} sentences.") if requirements else f"Keep it within {max_sentences} sentences."
-    prompt = _build_section_prompt("Conclusion", text, req)
-    resp = call_chat_with_fallback(
-        [{"role": "system", "content": SYSTEM_IEEE}, {"role": "user", "content": prompt}],
-        model=MODEL
-    )
-    return extract_message_content(resp)
+    return _call_section("Conclusion", text, req)
 
 
 def generate_custom_section(title: str, text: str, constraints: str | None = None) -> str:
     if not text.strip():
         return f"Error: No source text provided for {title} generation."
-    prompt = _build_section_prompt(title, text, constraints)
-    resp = call_chat_with_fallback(
-        [{"role": "system", "content": SYSTEM_IEEE}, {"role": "user", "content": prompt}],
-        model=MODEL
-    )
-    return extract_message_content(resp)
+    return _call_section(title, text, constraints)
@@ -0,0 +1,6 @@
+import os
+
+# modules read these at import time; the tests never reach Groq or Mongo
+os.environ.setdefault("SESSION_SECRET", "test-session-secret")
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("LLM_METRICS_SINK", "off")
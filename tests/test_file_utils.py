@@ -0,0 +1,59 @@
+import io
+
+from utils.file_utils import clean_pages, clean_text, extract_text_from_txt
+
+
+def _pages(*pages):
+    return "\f".join(pages)
+
+
+def test_page_numbers_dropped_only_at_page_edges():
+    table = "Table 2: Results\nEpoch\nLoss\n10\n0.42\n20\n0.31\nBody text follows here."
+    text = clean_text(_pages("First page.\n" + table + "\n1", "Second page.\n2", "Third page.\n3"))
+    lines = text.splitlines()
+    assert lines[:6] == ["First page.", "Table 2: Results", "Epoch", "Loss", "10", "0.42"]
+    assert "20" in lines and "0.31" in lines
+    assert "1" not in lines and "2" not in lines and "3" not in lines
+
+
+def test_numeric_lines_inside_a_page_are_kept():
+    page = "Header line\nYear\n2019\n2020\n2021\nvalue\n42\nclosing sentence.\nPage 4 of 9"
+    text = clean_text(page)
+    for value in ("2019", "2020", "2021", "42"):
+        assert value in text.splitlines()
+    assert "Page 4 of 9" not in text
+
+
+def test_hyphenated_word_is_joined_across_lines():
+    # the rejoined word moves onto the next line
+    assert clean_text("the optimi-\nzation step") == "the\noptimization step"
+
+
+def test_hyphen_kept_before_capital_or_digit():
+    assert clean_text("a Non-\nLinear model") == "a\nNon-Linear model"
+    assert clean_text("during COVID-\n19 lockdowns") == "during\nCOVID-19 lockdowns"
+
+
+def test_compound_hyphen_is_kept():
+    assert clean_text("a state-\nof-the-art model") == "a\nstate-of-the-art model"
+    assert clean_text("uses self-\nattention layers") == "uses\nself-attention layers"
+
+
+def test_hyphen_carried_across_page_break():
+    pages = ["Some text about regu-", "larization methods."]
+    assert "\n".join(p for p in clean_pages(pages) if p) == "Some text about\nregularization methods."
+
+
+def test_hyphen_kept_before_paragraph_break():
+    assert clean_text("More text with a trail-\n\nnext para.") == "More text with a trail-\n\nnext para."
+    assert clean_text("trail-\n\nnext para.") == "trail-\n\nnext para."
+
+
+def test_txt_is_left_uncleaned_by_default():
+    raw = "Line one\n\n\n\n42\nhyphen-\nated\fnext page"
+    assert extract_text_from_txt(io.BytesIO(raw.encode("utf-8"))) == raw
+
+
+def test_txt_cleaning_is_opt_in():
+    raw = "word-\nbreak\n\n\n\nend"
+    assert extract_text_from_txt(io.BytesIO(raw.encode("utf-8")), clean=True) == "wordbreak\n\nend"
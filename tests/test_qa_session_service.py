@@ -0,0 +1,86 @@
+import pytest
+
+import services.qa_session_service as qa
+
+
+def _session(turns=0, summary="", turn_count=None):
+    s = qa._empty("u1", "n1")
+    s["turns"] = [{"q": f"q{i}", "a": f"a{i}"} for i in range(turns)]
+    s["summary"] = summary
+    s["turn_count"] = turns if turn_count is None else turn_count
+    return s
+
+
+@pytest.fixture(autouse=True)
+def window(monkeypatch):
+    monkeypatch.setattr(qa, "QA_WINDOW_TURNS", 4)
+    monkeypatch.setattr(qa, "QA_COMPACT_BATCH", 2)
+
+
+def test_window_grows_until_a_batch_overflows():
+    turns, old = qa._advance(_session(4), "q4", "a4")
+    assert len(turns) == 5 and old == []
+    turns, old = qa._advance(_session(5), "q5", "a5")
+    assert [t["q"] for t in old] == ["q0", "q1"]
+    assert [t["q"] for t in turns] == ["q2", "q3", "q4", "q5"]
+
+
+def test_fold_uses_the_new_summary():
+    session = _session(5, summary="old")
+    turns, old = qa._advance(session, "q5", "a5")
+    assert qa._fold(session, turns, old, "  new summary ") == (turns, "new summary", 2)
+
+
+@pytest.mark.parametrize("new_summary", [None, "", "   "])
+def test_failed_compaction_keeps_summary_and_turns(new_summary):
+    session = _session(5, summary="old")
+    turns, old = qa._advance(session, "q5", "a5")
+    kept, summary, folded = qa._fold(session, turns, old, new_summary)
+    assert summary == "old" and folded == 0
+    assert [t["q"] for t in kept] == ["q0", "q1", "q2", "q3", "q4", "q5"]
+    # the next ask folds the backlog
+    session = dict(session, turns=kept)
+    turns, old = qa._advance(session, "q6", "a6")
+    assert len(old) == 3 and len(turns) == 4
+
+
+def test_fold_without_overflow_is_a_no_op():
+    session = _session(1, summary="s")
+    turns, old = qa._advance(session, "q1", "a1")
+    assert qa._fold(session, turns, old, None) == (turns, "s", 0)
+
+
+def test_request_sends_summary_window_and_question():
+    session = _session(2, summary="we discussed the method")
+    plan, messages = qa.qa_session_request(session, "The note text.", "And the results?")
+    assert messages[0]["role"] == "system"
+    assert "The note text." in messages[0]["content"]
+    assert "we discussed the method" in messages[0]["content"]
+    assert [m["role"] for m in messages[1:]] == ["user", "assistant", "user", "assistant", "user"]
+    assert messages[-1]["content"] == "And the results?"
+
+
+def test_compaction_condenses_only_the_transcript(monkeypatch):
+    monkeypatch.setenv("GROQ_MAX_REQUEST_TOKENS", "2000")
+    summary = "running summary " * 100
+    turns = [{"q": f"question {i} " * 50, "a": f"answer {i} " * 200} for i in range(4)]
+    plan, messages = qa._compact_request(summary, turns)
+    prompt = messages[0]["content"]
+    assert plan.action == "condensed"
+    assert prompt.startswith("Update the running summary")
+    assert f"Current summary:\n{summary}\n\nNew turns:\nQ: question 0" in prompt
+
+
+def test_optimistic_save_is_conditional_on_turn_count():
+    session = _session(3)
+    flt, update, upsert = qa._save_ops(session, session["turns"], "", 0)
+    assert flt == {"_id": "u1:n1", "turn_count": 3} and upsert is False
+    assert qa._save_ops(_session(0), [], "", 0)[2] is True
+
+
+def test_append_fallback_recreates_a_reset_session():
+    flt, update = qa._append_op(_session(3), "q", "a")
+    assert flt == {"_id": "u1:n1"}
+    assert update["$push"] == {"turns": {"q": "q", "a": "a"}}
+    assert update["$set"]["user_id"] == "u1" and update["$set"]["note_id"] == "n1"
+    assert update["$setOnInsert"] == {"summary": "", "compacted": 0}
@@ -0,0 +1,39 @@
+import time
+
+import services.session_service as sessions
+
+
+def _token(session_id="abc", expiry=None):
+    payload = f"{session_id}.{int(expiry if expiry is not None else time.time() + 3600)}"
+    return f"{payload}.{sessions._sign(payload)}"
+
+
+def test_valid_token_maps_to_session_key():
+    assert sessions._parse(_token("abc")) == sessions._session_key("abc")
+
+
+def test_tampered_token_is_rejected():
+    session_id, expiry, signature = _token("abc").split(".")
+    assert sessions._parse(f"other.{expiry}.{signature}") is None
+    assert sessions._parse(f"{session_id}.{int(expiry) + 60}.{signature}") is None
+    assert sessions._parse(f"{session_id}.{expiry}.{signature[:-2]}xx") is None
+
+
+def test_expired_token_is_rejected():
+    assert sessions._parse(_token("abc", expiry=time.time() - 1)) is None
+
+
+def test_token_signed_with_another_secret_is_rejected(monkeypatch):
+    token = _token("abc")
+    monkeypatch.setattr(sessions, "SESSION_SECRET", b"a-different-secret")
+    assert sessions._parse(token) is None
+
+
+def test_malformed_tokens_are_rejected():
+    for token in ("", None, "abc", "a.b", "a.notanumber.sig", "a.1.2.3"):
+        assert sessions._parse(token) is None
+
+
+def test_session_key_does_not_reveal_the_id():
+    key = sessions._session_key("abc")
+    assert "abc" not in key and len(key) == 64
@@ -0,0 +1,69 @@
+import pytest
+
+import services.token_budget as tb
+from services.token_budget import condense_text, estimate_tokens, plan_prompt
+
+
+def test_estimate_tokens_counts_words_and_chars():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a b c d") >= 5
+    assert estimate_tokens("x" * 400) == 101
+
+
+def test_condense_keeps_text_within_budget():
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 40 for i in range(50))
+    out = condense_text(text, 500)
+    assert estimate_tokens(out) <= 520
+    assert out.startswith("Paragraph 0") and "Paragraph 49" in out
+    assert "paragraphs omitted" in out
+
+
+def test_condense_returns_text_that_already_fits():
+    assert condense_text("short text", 100) == "short text"
+
+
+@pytest.mark.parametrize("budget", [0, -5])
+def test_condense_with_no_budget_is_empty(budget):
+    assert condense_text("word " * 1000, budget) == ""
+
+
+@pytest.mark.parametrize("budget", [1, 10, 32, 40])
+def test_condense_single_paragraph_small_budget_never_returns_whole_text(budget):
+    text = "x" * 20000
+    out = condense_text(text, budget)
+    assert len(out) < len(text)
+    assert estimate_tokens(out) <= budget + 1
+
+
+def test_condense_single_paragraph_keeps_head_and_tail():
+    text = "A" * 10000 + "Z" * 10000
+    out = condense_text(text, 1000)
+    assert out.startswith("A") and out.endswith("Z")
+    assert "[... truncated ...]" in out
+    assert estimate_tokens(out) <= 1000
+
+
+def test_light_task_routes_to_cheapest_model(monkeypatch):
+    monkeypatch.setattr(tb, "ROUTE_LIGHT_TASKS", True)
+    plan = plan_prompt("a short note", "summary", "llama-3.3-70b-versatile")
+    assert (plan.model, plan.action) == ("llama-3.1-8b-instant", "routed")
+
+
+def test_heavy_task_stays_on_requested_model(monkeypatch):
+    monkeypatch.setattr(tb, "ROUTE_LIGHT_TASKS", True)
+    plan = plan_prompt("a short note", "ieee_review", "llama-3.3-70b-versatile")
+    assert (plan.model, plan.action) == ("llama-3.3-70b-versatile", "direct")
+
+
+def test_routing_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(tb, "ROUTE_LIGHT_TASKS", False)
+    plan = plan_prompt("a short note", "qa", "llama-3.3-70b-versatile")
+    assert (plan.model, plan.action) == ("llama-3.3-70b-versatile", "direct")
+
+
+def test_oversized_text_is_condensed(monkeypatch):
+    monkeypatch.setenv("GROQ_MAX_REQUEST_TOKENS", "2000")
+    text = "\n\n".join("sentence " * 50 for _ in range(200))
+    plan = plan_prompt(text, "ieee_review", "llama-3.3-70b-versatile")
+    assert plan.action == "condensed"
+    assert plan.input_tokens <= tb.input_budget(plan.model, "ieee_review")
@@ -0,0 +1,87 @@
+import io
+
+import pytest
+
+import utils.upload_utils as uploads
+from benchmarks.corpus import make_pdf, research_text
+from utils.upload_utils import UploadRejected, check_size, open_for_parsing, inspect_pdf
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_MB", 1)
+    monkeypatch.setattr(uploads, "UPLOAD_SPOOL_MB", 0.25)
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_BYTES", 64 * 1024)
+
+
+class _Stream:
+    """A non-seekable stream without a file descriptor (e.g. a zip member)."""
+
+    def __init__(self, data):
+        self._f = io.BytesIO(data)
+
+    def read(self, n=-1):
+        return self._f.read(n)
+
+
+def test_check_size(limits):
+    check_size(None)
+    check_size(MB)
+    with pytest.raises(UploadRejected):
+        check_size(MB + 1)
+
+
+def test_declared_size_is_rejected_before_reading(limits):
+    upload = io.BytesIO(b"x")
+    upload.size = 2 * MB
+    with pytest.raises(UploadRejected):
+        with open_for_parsing(upload):
+            pass
+
+
+def test_in_memory_upload_is_parsed_in_place(limits):
+    upload = io.BytesIO(b"hello")
+    with open_for_parsing(upload) as f:
+        assert f is upload and f.read() == b"hello"
+
+
+def test_oversized_in_memory_upload_is_rejected(limits):
+    with pytest.raises(UploadRejected):
+        with open_for_parsing(io.BytesIO(b"x" * (MB + 1))):
+            pass
+
+
+def test_stream_is_spooled_and_memory_mapped(limits):
+    data = b"y" * (MB // 2)
+    with open_for_parsing(_Stream(data)) as f:
+        assert not isinstance(f, io.BytesIO)
+        assert f[:3] == b"yyy" and len(f) == len(data)
+
+
+def test_small_stream_stays_in_memory(limits):
+    with open_for_parsing(_Stream(b"small")) as f:
+        assert f.read() == b"small"
+
+
+def test_stream_over_the_limit_stops_while_copying(limits):
+    with pytest.raises(UploadRejected):
+        with open_for_parsing(_Stream(b"z" * (MB + 1))):
+            pass
+
+
+def test_file_on_disk_is_memory_mapped(limits, tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"on disk")
+    with open(path, "rb") as src, open_for_parsing(src) as f:
+        assert f[:] == b"on disk"
+
+
+def test_pdf_page_limit(monkeypatch):
+    pdf = io.BytesIO(make_pdf(research_text(60, seed=1), title="Paper"))
+    info = inspect_pdf(pdf)
+    assert info["pages"] > 1 and info["title"] == "Paper"
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_PAGES", info["pages"] - 1)
+    with pytest.raises(UploadRejected):
+        inspect_pdf(pdf)
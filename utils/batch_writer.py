@@ -0,0 +1,84 @@
+# utils/batch_writer.py
+import atexit
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    Queue records in memory and hand them to `flush_fn(batch)` from a background thread,
+    whenever `max_batch` records are pending or `interval` seconds have passed.
+    Pending records are flushed at interpreter exit. A failing flush is logged, counted in
+    `failed`, kept in `last_error` and passed to `on_error(exc, batch)` (logged if none is
+    given); it never raises into the caller of `add()`.
+    """
+
+    def __init__(self, flush_fn, max_batch: int = 50, interval: float = 2.0, on_error=None, name: str = "batch-writer"):
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.interval = interval
+        self.on_error = on_error
+        self.name = name
+        self.written = 0
+        self.failed = 0
+        self.last_error = None
+        self._queue = queue.Queue()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(self, record) -> None:
+        self._queue.put(record)
+        if self._queue.qsize() >= self.max_batch:
+            self._wake.set()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> int:
+        """Write everything queued so far; returns the number of records written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                try:
+                    self.flush_fn(batch)
+                    written += len(batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    self.last_error = e
+                    if not self.on_error:
+                        logger.error("%s: failed to write %d records: %s", self.name, len(batch), e)
+                    else:
+                        try:
+                            self.on_error(e, batch)
+                        except Exception:
+                            logger.exception("%s: on_error hook failed", self.name)
+
+    def close(self) -> None:
+        if self._stopped:
+            return
+        self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
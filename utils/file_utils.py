@@ -1,23 +1,49 @@
+import io
+import os
+import re
+import mmap
+import codecs
 import pdfplumber
 import pytesseract
 from PIL import Image
 from PyPDF2 import PdfReader
 
-def extract_text_from_pdf(file):
+from utils.profiling import traced
+
+TEXT_CHUNK_BYTES = 1 << 20
+
+
+def _pdf_page_texts(pdf, max_pages=None):
+    for i, page in enumerate(pdf.pages):
+        if max_pages and i >= max_pages:
+            break
+        text = page.extract_text() or ""
+        # drop the page's cached layout objects; pdfplumber otherwise keeps every page's
+        page.close()
+        yield text
+
+@traced("extract")
+def extract_text_from_pdf(file, clean=True, max_pages=None):
     text = ""
     try:
         with pdfplumber.open(file) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() or ""
+            pages = _pdf_page_texts(pdf, max_pages)
+            if clean:
+                text = "\n".join(p for p in clean_pages(pages) if p)
+            else:
+                text = "".join(pages)
     except Exception:
         text = ""
     return text.strip()
 
-def extract_text_with_ocr(file):
+@traced("extract")
+def extract_text_with_ocr(file, max_pages=None):
     text = ""
     try:
         reader = PdfReader(file)
-        for page in reader.pages:
+        for i, page in enumerate(reader.pages):
+            if max_pages and i >= max_pages:
+                break
             x_object = page.get("/Resources").get("/XObject")
             if x_object:
                 for obj in x_object:
@@ -30,5 +56,242 @@ def extract_text_with_ocr(file):
         text = ""
     return text.strip()
 
-def extract_text_from_txt(file):
-    return file.read().decode("utf-8", errors="ignore")
+
+def _iter_text_pages(file, chunk_size=TEXT_CHUNK_BYTES):
+    """
+    Decode a binary file chunk by chunk and yield its pages (split on form feeds, as
+    clean_text does), so the raw bytes are never held next to the decoded text.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts = []
+    while True:
+        chunk = file.read(chunk_size)
+        *complete, rest = decoder.decode(chunk, final=not chunk).split("\f")
+        for piece in complete:
+            parts.append(piece)
+            yield "".join(parts)
+            parts = []
+        parts.append(rest)
+        if not chunk:
+            break
+    yield "".join(parts)
+
+def _decode_all(file, chunk_size=TEXT_CHUNK_BYTES):
+    """
+    The whole file as text. Buffers the parsers already hold (BytesIO uploads, memory-mapped
+    files) are decoded in place, so the only new copy is the str itself; other streams are
+    decoded chunk by chunk.
+    """
+    if isinstance(file, (io.BytesIO, mmap.mmap)):
+        start = file.tell()
+        with (file.getbuffer() if isinstance(file, io.BytesIO) else memoryview(file)) as buf, buf[start:] as rest:
+            return codecs.utf_8_decode(rest, "ignore", True)[0]
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    parts = []
+    while True:
+        chunk = file.read(chunk_size)
+        parts.append(decoder.decode(chunk, final=not chunk))
+        if not chunk:
+            return "".join(parts)
+
+@traced("extract")
+def extract_text_from_txt(file, clean=False):
+    # plain text is kept as written by default: it has no running headers or layout breaks,
+    # and its numeric lines and hyphens are usually meaningful
+    if not clean:
+        return _decode_all(file)
+    cleaned = "\n".join(p for p in clean_pages(_iter_text_pages(file)) if p)
+    return re.sub(r"\n{3,}", "\n\n", cleaned).strip()
+
+
+def title_from_filename(name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return re.sub(r"[_\-]+", " ", stem).strip() or "Untitled"
+
+
+def extract_file(name, data=None, path=None):
+    """
+    Extract one PDF/TXT (PDF -> OCR fallback, like the upload page), given as bytes or as
+    the path of a file on disk (memory-mapped, never read whole). Top-level and DB-free so
+    it can run in a process pool. Size and page limits are those of utils.upload_utils.
+    Returns {"name", "title", "content", "error"}; the title comes from PDF metadata or the filename.
+    """
+    from utils.upload_utils import open_for_parsing, extract_stream
+    title = title_from_filename(name)
+    try:
+        with (open(path, "rb") if path is not None else io.BytesIO(data)) as src, open_for_parsing(src) as f:
+            extracted = extract_stream(name, f)
+        content = extracted["content"]
+        title = extracted["title"] or title
+    except Exception as e:
+        return {"name": name, "title": title, "content": "", "error": f"{type(e).__name__}: {e}"}
+    if not content.strip():
+        return {"name": name, "title": title, "content": "", "error": "no text could be extracted"}
+    return {"name": name, "title": title, "content": content, "error": None}
+
+
+# --- Text cleaning -------------------------------------------------------------
+# Raw pdfplumber output repeats running headers/footers and page numbers on every page,
+# splits words across lines with hyphens and carries ragged whitespace; all of it is
+# sent to the LLM on every call. These steps run page by page as the PDF is read.
+
+_PAGE_NUMBER_RE = re.compile(r"^\s*(?:page\s*)?[-–]?\s*\d{1,4}\s*[-–]?(?:\s*(?:of|/)\s*\d{1,4})?\s*$", re.I)
+_HYPHEN_END_RE = re.compile(r"(\w)[-­]$")
+# first halves of hyphenated compounds ("state-of-the-art", "self-attention"): the hyphen stays
+_COMPOUND_PREFIXES = frozenset((
+    "anti", "co", "cross", "data", "end", "fine", "full", "high", "large", "long", "low", "multi", "non",
+    "open", "post", "pre", "quasi", "real", "re", "self", "semi", "short", "small", "state", "sub", "well",
+))
+_SPACES_RE = re.compile(r"[ \t ]+")
+_DIGITS_RE = re.compile(r"\d+")
+_SECTION_NAMES = (
+    "abstract", "introduction", "background", "related work", "literature review", "method", "methods",
+    "methodology", "approach", "system design", "implementation", "experiments", "experimental setup",
+    "evaluation", "results", "discussion", "results and discussion", "conclusion", "conclusions",
+    "future work", "acknowledgment", "acknowledgments", "acknowledgements", "references", "bibliography",
+    "appendix",
+)
+_HEADING_RE = re.compile(
+    r"^(?:(?P<num>(?:\d+(?:\.\d+)*|[IVXLC]+)[.)]?)\s+)?(?P<title>[A-Z][A-Za-z0-9 ,:&/()'-]{1,80})$"
+)
+
+
+def _line_key(line):
+    """Header/footer identity: case-folded with numbers masked, so 'Page 3' matches 'Page 4'."""
+    return _DIGITS_RE.sub("#", line.strip().lower())
+
+
+def _learn_boundary_lines(pages, edge_lines=2, min_share=0.5):
+    """Keys of lines that appear in the first/last `edge_lines` lines of at least min_share of pages."""
+    if len(pages) < 3:
+        return set()
+    counts = {}
+    for lines in pages:
+        edges = {_line_key(l) for l in lines[:edge_lines] + lines[-edge_lines:] if l.strip()}
+        for key in edges:
+            counts[key] = counts.get(key, 0) + 1
+    threshold = max(2, int(len(pages) * min_share))
+    return {key for key, n in counts.items() if n >= threshold}
+
+
+def _join_hyphenated(fragment, line):
+    """
+    "optimi-" + "zation" -> "optimization". The hyphen stays when the next line does not start
+    lowercase ("Non-" + "Linear", "COVID-" + "19") or the word is a compound ("state-" +
+    "of-the-art", "self-" + "attention"); a soft hyphen is always dropped.
+    """
+    if fragment.endswith("\u00ad"):
+        return fragment[:-1] + line
+    word = fragment[:-1].rsplit("-", 1)[-1].lower()
+    next_word = line.split(" ", 1)[0]
+    if line[0].islower() and "-" not in next_word and word not in _COMPOUND_PREFIXES:
+        return fragment[:-1] + line
+    return fragment + line
+
+
+def clean_pages(pages, sample_pages=8, edge_lines=2):
+    """
+    Stream cleaned text page by page. The first `sample_pages` pages are buffered to learn
+    the repeated headers/footers; later pages are cleaned as they arrive. Also drops page
+    numbers, joins words hyphenated across line (and page) breaks and normalizes whitespace.
+    """
+    pages = iter(pages)
+    buffered = []
+    for page in pages:
+        buffered.append((page or "").splitlines())
+        if len(buffered) >= sample_pages:
+            break
+    boundary = _learn_boundary_lines(buffered, edge_lines)
+
+    carry = ""
+
+    def clean(lines):
+        nonlocal carry
+        n = len(lines)
+        out = []
+        held = None  # the text before a fragment carried from this page's lines
+        for i, line in enumerate(lines):
+            line = _SPACES_RE.sub(" ", line).strip()
+            if not line:
+                if carry and held is not None:
+                    # a paragraph break, not a line break: put the fragment back as written
+                    if held:
+                        out[-1] = f"{held} {carry}"
+                    else:
+                        out.append(carry)
+                    carry = ""
+                if out and out[-1] != "":
+                    out.append("")
+                continue
+            at_edge = i < edge_lines or i >= n - edge_lines
+            if at_edge and _line_key(line) in boundary:
+                continue
+            if at_edge and _PAGE_NUMBER_RE.match(line):
+                # only a page's first/last lines: a lone number mid-page is table or list data
+                continue
+            if carry:
+                line = _join_hyphenated(carry, line)
+                carry = ""
+            if _HYPHEN_END_RE.search(line):
+                # move the word fragment onto the next text line, which may be on the next page
+                head, _, carry = line.rpartition(" ")
+                held = head
+                if head:
+                    out.append(head)
+                continue
+            out.append(line)
+        return "\n".join(out).strip("\n")
+
+    for lines in buffered:
+        yield clean(lines)
+    for page in pages:
+        yield clean((page or "").splitlines())
+    if carry:
+        yield carry
+
+
+def clean_text(text):
+    """Clean already-extracted text; form feeds are treated as page breaks."""
+    if not text:
+        return ""
+    cleaned = "\n".join(p for p in clean_pages(text.split("\f")) if p)
+    return re.sub(r"\n{3,}", "\n\n", cleaned).strip()
+
+
+def is_heading(line):
+    line = line.strip()
+    if not line or len(line) > 80 or line.endswith((".", ",", ";")):
+        return False
+    m = _HEADING_RE.match(line)
+    if not m:
+        return False
+    title = m.group("title").strip()
+    if title.lower().rstrip(":") in _SECTION_NAMES:
+        return True
+    words = title.split()
+    if len(words) > 8:
+        return False
+    if title.isupper():
+        return True
+    # numbered title-case headings: "3.2 Training Setup", "IV. Experimental Results"
+    capitalized = sum(1 for w in words if w[0].isupper() or len(w) <= 3)
+    return bool(m.group("num")) and capitalized == len(words)
+
+
+def segment_sections(text):
+    """
+    Split a document into [{"heading", "text"}] on detected section headings. Text before
+    the first heading is returned under heading "" (title block, author list, ...).
+    """
+    sections = [{"heading": "", "lines": []}]
+    for line in text.splitlines():
+        if is_heading(line):
+            sections.append({"heading": line.strip(), "lines": []})
+        else:
+            sections[-1]["lines"].append(line)
+    result = []
+    for s in sections:
+        body = "\n".join(s["lines"]).strip()
+        if s["heading"] or body:
+            result.append({"heading": s["heading"], "text": body})
+    return result
@@ -0,0 +1,323 @@
+# utils/profiling.py
+"""
+Opt-in per-rerun profiling for app.py.
+
+    APP_PROFILE=1                   timing spans for every rerun
+    APP_PROFILE=cprofile,memory     plus cProfile and tracemalloc capture ("all" = both)
+    ?profile=1, ?profile=cprofile   the same for one browser tab, only with APP_PROFILE_ALLOW_QUERY=1
+
+app.py opens a PageProfile for the selected menu page; inside it, span()/traced() record
+nested timings (service entry points, Groq calls, extraction, LanguageTool) and Mongo
+commands arrive through the MongoSpans command listener. Time in the page not covered by
+any span is reported as Streamlit rendering / app code. Each profiled rerun is written to
+APP_PROFILE_DIR as <stamp>-<page>.folded (collapsed stacks for flamegraph.pl/speedscope),
+.prof (pstats, for snakeviz) when cProfile is on, and .json (the breakdown).
+
+When no profile is active every hook is one ContextVar lookup. Work handed to thread
+pools (section workers, bcrypt) is not followed: it shows up as the time of the span that
+waited for it.
+"""
+import os
+import re
+import json
+import time
+import cProfile
+import functools
+import threading
+import tracemalloc
+import contextvars
+from datetime import datetime
+
+from pymongo import monitoring
+
+PROFILE_MODE = os.getenv("APP_PROFILE", "")
+# ?profile= lets any visitor turn on cProfile/tracemalloc and write files; off unless allowed
+PROFILE_ALLOW_QUERY = os.getenv("APP_PROFILE_ALLOW_QUERY", "").strip().lower() in ("1", "true", "yes", "on")
+PROFILE_DIR = os.getenv("APP_PROFILE_DIR", "profiles")
+# profiled reruns kept on disk (oldest removed first)
+PROFILE_KEEP = int(os.getenv("APP_PROFILE_KEEP", "50"))
+PROFILE_TOP_ALLOCATIONS = 10
+
+_current = contextvars.ContextVar("page_profile", default=None)
+# tracemalloc is process-wide: traced while at least one profiled rerun asks for it
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+
+def parse_mode(value) -> set:
+    """"1"/"on"/"spans" -> {"spans"}; "cprofile" and "memory" (or "all") add the heavier captures."""
+    parts = {p for p in re.split(r"[,\s]+", str(value or "").strip().lower()) if p}
+    if not parts or parts <= {"0", "off", "false", "no"}:
+        return set()
+    if "all" in parts:
+        parts |= {"cprofile", "memory"}
+    return {"spans"} | (parts & {"cprofile", "memory"})
+
+
+class _Span:
+    __slots__ = ("name", "category", "ms", "mem_kb", "children")
+
+    def __init__(self, name, category):
+        self.name, self.category = name, category
+        self.ms, self.mem_kb = 0.0, None
+        self.children = []
+
+    def self_ms(self) -> float:
+        return max(self.ms - sum(c.ms for c in self.children), 0.0)
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _SpanContext:
+    __slots__ = ("profile", "span", "start", "mem")
+
+    def __init__(self, profile, name, category):
+        self.profile = profile
+        self.span = _Span(name, category)
+
+    def __enter__(self):
+        self.profile.stack[-1].children.append(self.span)
+        self.profile.stack.append(self.span)
+        self.mem = tracemalloc.get_traced_memory()[0] if self.profile.memory else None
+        self.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, *exc):
+        self.span.ms = (time.perf_counter() - self.start) * 1000
+        if self.mem is not None:
+            self.span.mem_kb = (tracemalloc.get_traced_memory()[0] - self.mem) / 1024
+        self.profile.stack.pop()
+        return False
+
+
+def span(name: str, category: str = "app"):
+    """`with span("parse", "extract"):` times the block when this rerun is profiled."""
+    profile = _current.get()
+    if profile is None:
+        return _NO_SPAN
+    return _SpanContext(profile, name, category)
+
+
+def traced(category: str, name: str | None = None):
+    """Decorator form of span(); the label defaults to module.function."""
+    def wrap(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return fn(*args, **kwargs)
+            with _SpanContext(profile, label, category):
+                return fn(*args, **kwargs)
+        inner.__traced__ = True
+        return inner
+    return wrap
+
+
+def instrument(namespace: dict, prefixes=("services.", "database.", "utils."), category: str = "service") -> None:
+    """Wrap the functions imported into `namespace` (a module's globals()) from our own packages."""
+    for key, value in list(namespace.items()):
+        if (callable(value) and getattr(value, "__module__", "").startswith(prefixes)
+                and type(value).__name__ == "function" and not getattr(value, "__traced__", False)):
+            namespace[key] = traced(category)(value)
+
+
+class MongoSpans(monitoring.CommandListener):
+    """pymongo command listener (database/db.py) adding one span per command to the active profile."""
+
+    def started(self, event):
+        profile = _current.get()
+        if profile is not None:
+            target = event.command.get(event.command_name)
+            profile.mongo_targets[event.request_id] = target if isinstance(target, str) else event.database_name
+
+    def succeeded(self, event):
+        profile = _current.get()
+        if profile is not None:
+            target = profile.mongo_targets.pop(event.request_id, event.database_name)
+            profile.add(f"{event.command_name} {target}", "mongo", event.duration_micros / 1000)
+
+    def failed(self, event):
+        self.succeeded(event)
+
+
+class PageProfile:
+    def __init__(self, page: str, modes: set):
+        self.page, self.modes = page, modes
+        self.root = _Span(page, "page")
+        self.stack = [self.root]
+        self.memory = "memory" in modes
+        self.cprofile = None
+        self.peak_kb = None
+        self.top_allocations = []
+        self.files = []
+        self.mongo_targets = {}
+        self.ended = False
+        self.start = time.perf_counter()
+
+    def add(self, name: str, category: str, ms: float) -> None:
+        """A finished leaf span measured elsewhere (Mongo reports its own durations)."""
+        leaf = _Span(name, category)
+        leaf.ms = ms
+        self.stack[-1].children.append(leaf)
+
+    def _walk(self, node=None, path=()):
+        node = node or self.root
+        path = path + (node.name if node is self.root else f"{node.category}:{node.name}",)
+        yield node, path
+        for child in node.children:
+            yield from self._walk(child, path)
+
+    def by_category(self) -> list:
+        """Self time per category; the page's own self time is Streamlit rendering and app code."""
+        totals = {}
+        for node, _ in self._walk():
+            category = "streamlit/app" if node is self.root else node.category
+            calls, ms = totals.get(category, (0, 0.0))
+            totals[category] = (calls + (node is not self.root), ms + node.self_ms())
+        rows = [{"category": c, "calls": n, "self_ms": round(ms, 1),
+                 "share": f"{ms / self.root.ms:.0%}" if self.root.ms else "-"} for c, (n, ms) in totals.items()]
+        return sorted(rows, key=lambda r: -r["self_ms"])
+
+    def by_span(self) -> list:
+        """Spans aggregated by their path from the page, slowest first."""
+        agg = {}
+        for node, path in self._walk():
+            if node is self.root:
+                continue
+            row = agg.setdefault(path, {"span": " > ".join(path[1:]), "calls": 0, "total_ms": 0.0,
+                                        "self_ms": 0.0, "mem_kb": None})
+            row["calls"] += 1
+            row["total_ms"] += node.ms
+            row["self_ms"] += node.self_ms()
+            if node.mem_kb is not None:
+                row["mem_kb"] = (row["mem_kb"] or 0) + node.mem_kb
+        rows = sorted(agg.values(), key=lambda r: -r["total_ms"])
+        for r in rows:
+            r["total_ms"], r["self_ms"] = round(r["total_ms"], 1), round(r["self_ms"], 1)
+            if r["mem_kb"] is not None:
+                r["mem_kb"] = round(r["mem_kb"], 1)
+        return rows
+
+    def folded(self) -> list:
+        """Collapsed stacks ("page;service:x;mongo:find 1234", self time in microseconds)."""
+        stacks = {}
+        for node, path in self._walk():
+            us = int(node.self_ms() * 1000)
+            if us:
+                key = ";".join(p.replace(";", ",") for p in path)
+                stacks[key] = stacks.get(key, 0) + us
+        return [f"{k} {v}" for k, v in stacks.items()]
+
+    @property
+    def total_ms(self) -> float:
+        return self.root.ms
+
+
+def _start_tracemalloc() -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        _tracemalloc_users += 1
+
+
+def _stop_tracemalloc() -> None:
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0:
+            tracemalloc.stop()
+
+
+def begin_page(page: str, query_value=None):
+    """
+    Start profiling this rerun if APP_PROFILE (or, when allowed, ?profile=) asks for it; returns
+    the PageProfile or None. The caller must end_page() it in a finally block.
+    """
+    stale = _current.get()
+    if stale is not None:
+        # a rerun on this thread that never reached end_page: close it so nothing keeps running
+        end_page(stale)
+    modes = parse_mode(PROFILE_MODE) | (parse_mode(query_value) if PROFILE_ALLOW_QUERY else set())
+    if not modes:
+        return None
+    profile = PageProfile(page, modes)
+    if profile.memory:
+        _start_tracemalloc()
+    if "cprofile" in modes:
+        profile.cprofile = cProfile.Profile()
+        try:
+            profile.cprofile.enable()
+        except ValueError:
+            # another profiler is already active on this thread
+            profile.cprofile = None
+    _current.set(profile)
+    profile.start = time.perf_counter()
+    return profile
+
+
+def end_page(profile):
+    """Stop the captures, fill in totals and write the dump files. Safe to call with None or twice."""
+    if profile is None or profile.ended:
+        return profile
+    profile.ended = True
+    profile.root.ms = (time.perf_counter() - profile.start) * 1000
+    if _current.get() is profile:
+        _current.set(None)
+    if profile.cprofile is not None:
+        profile.cprofile.disable()
+    if profile.memory:
+        current, peak = tracemalloc.get_traced_memory()
+        profile.peak_kb = round(peak / 1024, 1)
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+        profile.top_allocations = [{"site": str(s.traceback[0]), "kb": round(s.size / 1024, 1), "blocks": s.count}
+                                   for s in stats]
+        _stop_tracemalloc()
+        profile.memory = False
+    _dump(profile)
+    return profile
+
+
+def _dump(profile) -> None:
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        slug = re.sub(r"[^a-z0-9]+", "-", profile.page.lower()).strip("-") or "page"
+        stem = os.path.join(PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S-%f}-{slug}")
+        with open(stem + ".folded", "w", encoding="utf-8") as f:
+            f.write("\n".join(profile.folded()) + "\n")
+        profile.files.append(stem + ".folded")
+        if profile.cprofile is not None:
+            profile.cprofile.dump_stats(stem + ".prof")
+            profile.files.append(stem + ".prof")
+        with open(stem + ".json", "w", encoding="utf-8") as f:
+            json.dump({"page": profile.page, "total_ms": round(profile.total_ms, 1),
+                       "categories": profile.by_category(), "spans": profile.by_span(),
+                       "peak_kb": profile.peak_kb, "top_allocations": profile.top_allocations}, f, indent=2)
+        profile.files.append(stem + ".json")
+        _rotate()
+    except OSError:
+        # a read-only or full disk must not break the page being profiled
+        pass
+
+
+def _rotate() -> None:
+    stems = sorted({os.path.splitext(n)[0] for n in os.listdir(PROFILE_DIR)
+                    if n.endswith((".folded", ".prof", ".json"))})
+    for stem in stems[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        for ext in (".folded", ".prof", ".json"):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, stem + ext))
+            except FileNotFoundError:
+                pass
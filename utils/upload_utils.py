@@ -0,0 +1,156 @@
+# utils/upload_utils.py
+"""
+Memory-bounded ingestion of uploaded / imported PDF and TXT files.
+
+Every file is size-checked before a parser sees it: up front when the size is known
+(Streamlit uploads, files on disk, zip members), otherwise while it is copied in
+UPLOAD_CHUNK_BYTES chunks. Streams are spooled to a temporary file once they pass
+UPLOAD_SPOOL_MB, and files on disk are read through a read-only memory map, so the
+parsers page data in from the page cache instead of holding another copy on the heap.
+Uploads that are already in memory (Streamlit's UploadedFile) are parsed in place.
+PDFs over UPLOAD_MAX_PAGES are rejected from the page tree's count before any page is
+parsed. TXT files are decoded straight from that buffer (utils.file_utils.extract_text_from_txt).
+"""
+import io
+import os
+import mmap
+import tempfile
+from contextlib import contextmanager
+from dotenv import load_dotenv
+load_dotenv()
+
+from PyPDF2 import PdfReader
+
+from utils.file_utils import extract_text_from_pdf, extract_text_with_ocr, extract_text_from_txt
+
+UPLOAD_MAX_MB = float(os.getenv("UPLOAD_MAX_MB", "50"))
+UPLOAD_MAX_PAGES = int(os.getenv("UPLOAD_MAX_PAGES", "500"))
+UPLOAD_SPOOL_MB = float(os.getenv("UPLOAD_SPOOL_MB", "2"))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+UPLOAD_CHUNK_BYTES = 1 << 20
+
+_MB = 1024 * 1024
+
+
+class UploadRejected(ValueError):
+    """The file is over a configured size or page limit; the message is meant for the user."""
+
+
+def within_limit(size) -> bool:
+    return size is None or size <= UPLOAD_MAX_MB * _MB
+
+
+def check_size(size) -> None:
+    if not within_limit(size):
+        raise UploadRejected(f"File is {size / _MB:.1f} MB; the limit is {UPLOAD_MAX_MB:g} MB.")
+
+
+def is_pdf(name: str, upload=None) -> bool:
+    return (name or "").lower().endswith(".pdf") or getattr(upload, "type", None) == "application/pdf"
+
+
+def _fileno(f):
+    try:
+        return f.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _spool(src):
+    """Copy a stream into memory or, past UPLOAD_SPOOL_MB, a temporary file; stops at the size limit."""
+    buf, total = io.BytesIO(), 0
+    while True:
+        chunk = src.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        check_size(total)
+        if isinstance(buf, io.BytesIO) and total > UPLOAD_SPOOL_MB * _MB:
+            disk = tempfile.TemporaryFile(dir=UPLOAD_TMP_DIR)
+            disk.write(buf.getbuffer())
+            buf.close()
+            buf = disk
+        buf.write(chunk)
+    buf.seek(0)
+    return buf
+
+
+@contextmanager
+def _mapped(fileno):
+    size = os.fstat(fileno).st_size
+    check_size(size)
+    if size == 0:
+        # mmap cannot map an empty file
+        yield io.BytesIO(b"")
+        return
+    view = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    try:
+        yield view
+    finally:
+        view.close()
+
+
+@contextmanager
+def open_for_parsing(src):
+    """
+    Seekable binary view of `src` (Streamlit upload, open file, zip member or any stream)
+    for the extractors, within UPLOAD_MAX_MB. Closes what it creates; `src` stays open.
+    """
+    check_size(getattr(src, "size", None))
+    fileno = _fileno(src)
+    if fileno is not None:
+        with _mapped(fileno) as view:
+            yield view
+    elif isinstance(src, io.BytesIO):
+        check_size(src.seek(0, io.SEEK_END))
+        src.seek(0)
+        yield src
+    else:
+        spooled = _spool(src)
+        try:
+            fileno = _fileno(spooled)
+            if fileno is None:
+                yield spooled
+            else:
+                with _mapped(fileno) as view:
+                    yield view
+        finally:
+            spooled.close()
+
+
+def inspect_pdf(f) -> dict:
+    """{"pages", "title"} from the trailer and page tree only; raises UploadRejected over UPLOAD_MAX_PAGES."""
+    pages, title = 0, None
+    try:
+        reader = PdfReader(f)
+        pages = len(reader.pages)
+        meta_title = (reader.metadata or {}).get("/Title")
+        if meta_title and str(meta_title).strip():
+            title = str(meta_title).strip()
+    except Exception:
+        # unreadable here; the extractors meet the same file and report it their way
+        pass
+    finally:
+        f.seek(0)
+    if pages > UPLOAD_MAX_PAGES:
+        raise UploadRejected(f"PDF has {pages} pages; the limit is {UPLOAD_MAX_PAGES}.")
+    return {"pages": pages, "title": title}
+
+
+def extract_stream(name: str, f, upload=None) -> dict:
+    """Text (PDF -> OCR fallback) and PDF title of a file opened with open_for_parsing."""
+    if not is_pdf(name, upload):
+        return {"content": extract_text_from_txt(f), "title": None}
+    info = inspect_pdf(f)
+    content = extract_text_from_pdf(f, max_pages=UPLOAD_MAX_PAGES)
+    if not content:
+        f.seek(0)
+        content = extract_text_with_ocr(f, max_pages=UPLOAD_MAX_PAGES)
+    return {"content": content, "title": info["title"]}
+
+
+def extract_upload(upload, name: str | None = None) -> str:
+    """Text of an uploaded PDF/TXT. Raises UploadRejected when it is over the size or page limit."""
+    name = name or getattr(upload, "name", "") or ""
+    with open_for_parsing(upload) as f:
+        return extract_stream(name, f, upload)["content"]